@@ -0,0 +1,76 @@
+import os
+
+import dj_database_url
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+from django.db import connections
+
+import pytest
+
+from benchmarks import generator
+
+# size of the generated repository and registry:
+# NORTH_BENCH_SCALE=10 is a project with 100 versions and 1000 tables
+SCALE = int(os.environ.get('NORTH_BENCH_SCALE', 1))
+
+
+def run_sql(sql):
+    config = dj_database_url.config()
+    conn = psycopg2.connect(
+        user=config['USER'],
+        host=config['HOST'],
+        port=config['PORT'],
+        password=config['PASSWORD'],
+        database='postgres')
+    conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+    cur = conn.cursor()
+    cur.execute(sql)
+    conn.close()
+
+
+@pytest.fixture(scope='session')
+def migrations_root(tmpdir_factory):
+    root = tmpdir_factory.mktemp('sql')
+    versions = generator.generate_migrations_root(
+        str(root), nb_versions=10 * SCALE, nb_files=10,
+        nb_rows=100 * SCALE, nb_fixtures=1000 * SCALE)
+    return str(root), versions[-1]
+
+
+@pytest.fixture(scope='session')
+def bench_models():
+    return generator.generate_models(50 * SCALE)
+
+
+@pytest.fixture
+def north_settings(settings, migrations_root):
+    root, target_version = migrations_root
+    settings.NORTH_MIGRATIONS_ROOT = root
+    settings.NORTH_TARGET_VERSION = target_version
+    return settings
+
+
+@pytest.fixture
+def bench_db(north_settings, django_db_blocker):
+    """
+    An empty database, with the alias 'bench'.
+    Call the returned function to recreate it.
+    """
+    north_settings.DATABASES['bench'] = dj_database_url.config()
+    north_settings.DATABASES['bench']['NAME'] = 'north_bench'
+
+    def recreate():
+        for conn in connections.all():
+            conn.close()
+        run_sql('DROP DATABASE IF EXISTS north_bench')
+        run_sql('CREATE DATABASE north_bench')
+
+    recreate()
+    with django_db_blocker.unblock():
+        yield recreate
+
+    for conn in connections.all():
+        conn.close()
+    run_sql('DROP DATABASE north_bench')
+    del north_settings.DATABASES['bench']
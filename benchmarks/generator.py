@@ -0,0 +1,147 @@
+"""
+Generate synthetic migration repositories and model registries,
+to benchmark django-north on big projects.
+"""
+import os
+import shutil
+
+from django.apps import apps
+from django.db import models
+
+project_root = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'tests', 'north_project',
+    'sql')
+
+base_version = '0.1'
+
+version_tpl = """BEGIN;
+
+INSERT INTO sql_version(version_num) VALUES ('{version}');
+
+COMMIT;
+"""
+
+ddl_tpl = """BEGIN;
+
+CREATE TABLE "{table}" (
+    "id" serial NOT NULL PRIMARY KEY,
+    "name" varchar(100) NOT NULL,
+    "value" integer NOT NULL DEFAULT 0
+);
+CREATE INDEX "{table}_name" ON "{table}" ("name");
+
+COMMIT;
+"""
+
+dml_tpl = """BEGIN;
+
+INSERT INTO "{table}" ("name", "value")
+SELECT 'row ' || i, 0 FROM generate_series(1, {rows}) AS i;
+
+COMMIT;
+"""
+
+manual_tpl = """BEGIN;
+
+--meta-psql:do-until-0
+
+with to_update as (
+    SELECT id FROM "{table}" WHERE value = 0 LIMIT {chunk}
+)
+UPDATE "{table}" SET value = 1 WHERE id IN (SELECT id FROM to_update);
+
+--meta-psql:done
+
+COMMIT;
+"""
+
+fixtures_tpl = """
+CREATE TABLE IF NOT EXISTS "bench_fixture" (
+    "id" serial NOT NULL PRIMARY KEY,
+    "name" varchar(100) NOT NULL
+);
+
+INSERT INTO "bench_fixture" ("name")
+SELECT 'fixture ' || i FROM generate_series(1, {rows}) AS i;
+"""
+
+
+def get_versions(nb_versions):
+    return ['1.{}'.format(i) for i in range(nb_versions)]
+
+
+def generate_migrations_root(root, nb_versions=10, nb_files=10,
+                             nb_manual_files=1, nb_rows=100,
+                             nb_fixtures=1000):
+    """
+    Generate a migration repository in root:
+    - the schema and fixtures of the test project, in version 0.1,
+      the fixtures with nb_fixtures extra rows
+    - nb_versions versions, each one with a version dml,
+      nb_files ddl files (a new table), nb_files dml files
+      (nb_rows rows in the new table), and nb_manual_files manual files
+    Return the list of the generated versions.
+    """
+    for folder in ('schemas', 'fixtures'):
+        os.makedirs(os.path.join(root, folder))
+    shutil.copy(
+        os.path.join(project_root, 'schemas', 'schema_0.1.sql'),
+        os.path.join(root, 'schemas'))
+    shutil.copy(
+        os.path.join(project_root, 'fixtures', 'fixtures_0.1.sql'),
+        os.path.join(root, 'fixtures'))
+    with open(os.path.join(root, 'fixtures', 'fixtures_0.1.sql'), 'a') as f:
+        f.write(fixtures_tpl.format(rows=nb_fixtures))
+    os.makedirs(os.path.join(root, base_version))
+
+    versions = get_versions(nb_versions)
+    for version in versions:
+        version_root = os.path.join(root, version)
+        os.makedirs(os.path.join(version_root, 'manual'))
+
+        def write(name, content, folder=version_root):
+            with open(os.path.join(folder, name), 'w') as f:
+                f.write(content)
+
+        write('{}-0-version-dml.sql'.format(version),
+              version_tpl.format(version=version))
+        for i in range(nb_files):
+            table = 'bench_{}_{}'.format(version.replace('.', '_'), i)
+            write('{}-{:04d}-1-ddl.sql'.format(version, i),
+                  ddl_tpl.format(table=table))
+            write('{}-{:04d}-2-dml.sql'.format(version, i),
+                  dml_tpl.format(table=table, rows=nb_rows))
+            if i < nb_manual_files:
+                write('{}-{:04d}-3-dml.sql'.format(version, i),
+                      manual_tpl.format(table=table, chunk=nb_rows // 3 + 1),
+                      folder=os.path.join(version_root, 'manual'))
+    return versions
+
+
+def generate_models(nb_models, app_label='north_app', nb_fields=10):
+    """
+    Register nb_models models in the given app, each one with nb_fields
+    fields and a foreign key to the previous model.
+    """
+    generated = []
+    for i in range(nb_models):
+        name = 'BenchModel{}'.format(i)
+        if name.lower() in apps.all_models[app_label]:
+            generated.append(apps.get_model(app_label, name))
+            continue
+        attrs = {
+            '__module__': 'tests.north_app.models',
+            'Meta': type('Meta', (), {
+                'app_label': app_label,
+                'unique_together': [('field_0', 'field_1')],
+                'permissions': [('custom_{}'.format(i), 'Custom')],
+            }),
+        }
+        for j in range(nb_fields):
+            attrs['field_{}'.format(j)] = models.CharField(
+                max_length=100, db_index=(j == 0))
+        if generated:
+            attrs['previous'] = models.ForeignKey(
+                generated[-1], on_delete=models.CASCADE)
+        generated.append(type(name, (models.Model,), attrs))
+    return generated
@@ -0,0 +1,27 @@
+from django.core.management import call_command
+
+
+def test_showfixtures(benchmark, bench_db, bench_models):
+    call_command('migrate', '--database', 'bench')
+
+    benchmark(
+        call_command, 'showfixtures', '--unknown-contenttypes',
+        '--database', 'bench')
+
+
+def test_sqlall(benchmark, bench_db, bench_models):
+    benchmark(call_command, 'sqlall', 'north_app', '--database', 'bench')
+
+
+def test_sqlall_all(benchmark, bench_models):
+    benchmark(call_command, 'sqlall', '--all')
+
+
+def test_sqlall_all_jobs(benchmark, bench_models):
+    benchmark(call_command, 'sqlall', '--all', '--jobs', '4')
+
+
+def test_showdrift(benchmark, bench_db, bench_models):
+    call_command('migrate', '--database', 'bench')
+
+    benchmark(call_command, 'showdrift', '--database', 'bench')
@@ -0,0 +1,44 @@
+from django.core.management import call_command
+from django.db import connections
+
+
+def test_migrate_from_scratch(benchmark, bench_db):
+    benchmark.pedantic(
+        call_command, args=('migrate', '--database', 'bench'),
+        setup=bench_db, rounds=3)
+
+
+def test_migrate_noop(benchmark, bench_db):
+    call_command('migrate', '--database', 'bench')
+
+    benchmark(call_command, 'migrate', '--database', 'bench')
+
+
+def test_showmigrations(benchmark, bench_db):
+    call_command('migrate', '--database', 'bench')
+
+    benchmark(call_command, 'showmigrations', '--database', 'bench')
+
+
+def test_flush(benchmark, bench_db):
+    call_command('migrate', '--database', 'bench')
+
+    # as done by TransactionTestCase
+    benchmark(
+        call_command, 'flush', database='bench', interactive=False,
+        verbosity=0, reset_sequences=False)
+
+
+def test_test_db_bootstrap(benchmark, bench_db):
+    creation = connections['bench'].creation
+
+    def setup():
+        bench_db()
+        return (), {'verbosity': 0, 'autoclobber': True, 'serialize': False}
+
+    def teardown():
+        creation.destroy_test_db('north_bench', verbosity=0)
+
+    benchmark.pedantic(
+        lambda **kwargs: (creation.create_test_db(**kwargs), teardown()),
+        setup=setup, rounds=3)
@@ -1,6 +1,30 @@
 # -*- coding: utf-8 -*-
-import pkg_resources
+import sys
 
+default_app_config = 'django_north.apps.NorthConfig'
 
-#: Module version, as defined in PEP-0396.
-__version__ = pkg_resources.get_distribution(__package__).version
+
+def get_version():
+    """
+    Return the version of the installed distribution
+    """
+    try:
+        from importlib.metadata import version
+    except ImportError:  # python < 3.8
+        from pkg_resources import get_distribution
+        return get_distribution(__package__).version
+    return version(__package__)
+
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        #: Module version, as defined in PEP-0396, read on first access.
+        if name == '__version__':
+            global __version__
+            __version__ = get_version()
+            return __version__
+        raise AttributeError(
+            "module {!r} has no attribute {!r}".format(__name__, name))
+else:  # no module __getattr__ (PEP 562)
+    #: Module version, as defined in PEP-0396.
+    __version__ = get_version()
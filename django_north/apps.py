@@ -0,0 +1,16 @@
+from django.apps import AppConfig
+from django.conf import settings
+from django.core import checks
+
+
+class NorthConfig(AppConfig):
+    name = 'django_north'
+    verbose_name = 'Django North'
+
+    def ready(self):
+        from django_north.checks import check_database
+
+        # deploy checks, also run at startup if NORTH_STARTUP_CHECKS is set
+        checks.register(
+            check_database, 'north',
+            deploy=not getattr(settings, 'NORTH_STARTUP_CHECKS', False))
@@ -0,0 +1,156 @@
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.db import connections
+from django.db import DatabaseError
+from django.db import DEFAULT_DB_ALIAS
+
+# the checks are registered at startup: the management modules (septentrion,
+# the contenttypes and permissions models) are imported when the checks run
+
+
+def get_cache_key(alias):
+    return 'django_north.checks.{}.{}'.format(
+        alias, getattr(settings, 'NORTH_TARGET_VERSION', None))
+
+
+def get_cache():
+    return caches[getattr(settings, 'NORTH_CHECKS_CACHE', 'default')]
+
+
+def clear_checks_cache(alias=DEFAULT_DB_ALIAS):
+    """
+    Forget the cached results of the checks of a database,
+    when its state changes (migrate, flush)
+    """
+    if getattr(settings, 'NORTH_CHECKS_TIMEOUT', 0):
+        get_cache().delete(get_cache_key(alias))
+
+
+def check_version(connection):
+    """
+    Check that the DB version matches the target version
+    """
+    from django_north.management import migrations
+
+    target_version = getattr(settings, 'NORTH_TARGET_VERSION', None)
+    if target_version is None:
+        return [checks.Error(
+            "The NORTH_TARGET_VERSION setting is not set.",
+            id='north.E001',
+        )]
+    current_version = migrations.get_current_version(connection)
+    if current_version is None:
+        return [checks.Warning(
+            "Schema not inited on database '{}'.".format(connection.alias),
+            hint="Run 'python manage.py migrate' to init it.",
+            id='north.W002',
+        )]
+    if current_version != target_version:
+        return [checks.Warning(
+            "Database '{}' is in version {}, target version is {}.".format(
+                connection.alias, current_version, target_version),
+            id='north.W006',
+        )]
+    return []
+
+
+def check_migrations(connection):
+    """
+    Check that all the migrations are applied
+    """
+    from django_north.management import migrations
+
+    unapplied_migrations = migrations.get_unapplied_migrations(connection)
+    if not unapplied_migrations:
+        return []
+    return [checks.Warning(
+        "You have {} unapplied migration(s) on database '{}'.".format(
+            len(unapplied_migrations), connection.alias),
+        hint="Run 'python manage.py migrate' to apply them.",
+        id='north.W003',
+    )]
+
+
+def check_fixtures(connection):
+    """
+    Check that no contenttype or permission is missing.
+    If NORTH_FIXTURES_MANIFEST is set, the expected fixtures are read from
+    the manifest instead of the models.
+    """
+    from django_north.management import fixtures
+
+    manifest_path = getattr(settings, 'NORTH_FIXTURES_MANIFEST', None)
+    if manifest_path:
+        try:
+            manifest = fixtures.read_fixtures_manifest(manifest_path)
+        except (IOError, ValueError) as e:
+            return [checks.Warning(
+                "Unable to read the fixtures manifest: {}".format(e),
+                hint="Run 'python manage.py fixturesmanifest' to write it.",
+                id='north.W005',
+            )]
+        missing_contenttypes, missing_permissions = \
+            fixtures.get_manifest_missing_fixtures(
+                manifest, using=connection.alias)
+        missing = missing_contenttypes + missing_permissions
+    else:
+        diff = fixtures.get_fixtures_diff(using=connection.alias)
+        missing = diff.missing_contenttypes + diff.missing_permissions
+    if not missing:
+        return []
+    return [checks.Warning(
+        "You have {} missing fixture(s) on database '{}'.".format(
+            len(missing), connection.alias),
+        hint="Run 'python manage.py showfixtures' to list them.",
+        id='north.W004',
+    )]
+
+
+def run_checks(connection):
+    """
+    Return the messages of the checks, and whether they can be cached:
+    the connection errors are not
+    """
+    from django_north.management import migrations
+
+    try:
+        messages = check_version(connection)
+        if not messages:
+            if getattr(settings, 'NORTH_MANAGE_DB', False) is True:
+                messages += check_migrations(connection)
+            messages += check_fixtures(connection)
+    except DatabaseError as e:
+        return [checks.Warning(
+            "Unable to check database '{}': {}".format(connection.alias, e),
+            id='north.W001',
+        )], False
+    except migrations.DBException as e:
+        # no version found by the current version detector
+        messages = [checks.Error(
+            "Unable to get the version of database '{}': {}".format(
+                connection.alias, e),
+            id='north.E002',
+        )]
+    return messages, True
+
+
+def check_database(app_configs=None, databases=None, **kwargs):
+    """
+    Check the state of the databases managed by north.
+    The results are cached for NORTH_CHECKS_TIMEOUT seconds, or until
+    the next migrate or flush.
+    """
+    timeout = getattr(settings, 'NORTH_CHECKS_TIMEOUT', 0)
+    cache = get_cache()
+
+    messages = []
+    for alias in databases or [DEFAULT_DB_ALIAS]:
+        key = get_cache_key(alias)
+        cached = cache.get(key) if timeout else None
+        if cached is None:
+            cached, cacheable = run_checks(connections[alias])
+            if timeout and cacheable:
+                cache.set(key, cached, timeout)
+        messages += cached
+    return messages
@@ -1,43 +1,100 @@
+from types import MappingProxyType
+
 from django.conf import settings
+from django.core.signals import setting_changed
+from django.utils.functional import cached_property
 
+# septentrion setting name: django setting name
+SETTINGS_MAPPING = {
+    "migrations_root": "NORTH_MIGRATIONS_ROOT",
+    "target_version": "NORTH_TARGET_VERSION",
+    "schema_template": "NORTH_SCHEMA_TPL",
+    "schema_version": "NORTH_SCHEMA_VERSION",
+    "fixtures_template": "NORTH_FIXTURES_TPL",
+    "before_schema_file": "NORTH_BEFORE_SCHEMA_FILES",
+    "after_schema_file": "NORTH_AFTER_SCHEMA_FILES",
+    "non_transactional_keyword": "NORTH_NON_TRANSACTIONAL_KEYWORDS",
+}
 
-def septentrion_settings(connection):
+# septentrion setting name: django connection setting name
+CONNECTION_MAPPING = {
+    "dbname": "NAME",
+    "host": "HOST",
+    "port": "PORT",
+    "username": "USER",
+    "password": "PASSWORD",
+}
+
+_settings_cache = {}
+
+
+class NorthSettings(object):
+    """
+    The north configuration for a DB connection.
+    Built once, see get_north_settings.
+    """
+
+    def __init__(self, connection_params):
+        settings_dict = {}
+        for septentrion_name, django_name in SETTINGS_MAPPING.items():
+            try:
+                settings_dict[septentrion_name] = getattr(
+                    settings, django_name)
+            except AttributeError:
+                pass
+
+        settings_dict.update({
+            # Settings from Django's DB connection
+            key: value for key, value in connection_params if value})
+
+        settings_dict.update({
+            # Static settings
+            "table": "django_migrations",
+            "version_column": "app",
+            "name_column": "name",
+            "applied_at_column": "applied",
+            "create_table": False,
+        })
+        self.septentrion = MappingProxyType(settings_dict)
+
+    @cached_property
+    def non_transactional_keywords(self):
+        return tuple(getattr(
+            settings, 'NORTH_NON_TRANSACTIONAL_KEYWORDS',
+            ['CONCURRENTLY', 'ALTER TYPE', 'VACUUM']))
 
-    settings_dict = {}
-    mapping = {
-        "migrations_root": "NORTH_MIGRATIONS_ROOT",
-        "target_version": "NORTH_TARGET_VERSION",
-        "schema_template": "NORTH_SCHEMA_TPL",
-        "schema_version": "NORTH_SCHEMA_VERSION",
-        "target_version": "NORTH_TARGET_VERSION",
-        "fixtures_template": "NORTH_FIXTURES_TPL",
-        "before_schema_file": "NORTH_BEFORE_SCHEMA_FILES",
-        "after_schema_file": "NORTH_AFTER_SCHEMA_FILES",
-        "non_transactional_keyword": "NORTH_NON_TRANSACTIONAL_KEYWORDS",
-        "target_version": "NORTH_TARGET_VERSION",
-    }
-
-    for septentrion_name, django_name in mapping.items():
-        try:
-            settings_dict[septentrion_name] = getattr(settings, django_name)
-        except AttributeError:
-            pass
-
-    settings_dict.update({key: value for key, value in {
-        # Settings from Django's DB connection
-        "dbname": connection.settings_dict["NAME"],
-        "host": connection.settings_dict["HOST"],
-        "port": connection.settings_dict["PORT"],
-        "username": connection.settings_dict["USER"],
-        "password": connection.settings_dict["PASSWORD"],
-    }.items() if value})
-
-    settings_dict.update({
-        # Static settings
-        "table": "django_migrations",
-        "version_column": "app",
-        "name_column": "name",
-        "applied_at_column": "applied",
-        "create_table": False,
-    })
-    return settings_dict
+    @cached_property
+    def protected_tables(self):
+        return tuple(getattr(
+            settings, 'NORTH_PROTECTED_TABLES',
+            ['django_migrations', 'sql_version', 'north_version_ledger',
+             'north_migrations_archive', 'north_migrate_fingerprint']))
+
+
+def get_north_settings(connection):
+    """
+    Return the north configuration for the connection.
+    Cached until a setting is changed.
+    """
+    connection_params = tuple(
+        (septentrion_name, connection.settings_dict[django_name])
+        for septentrion_name, django_name in CONNECTION_MAPPING.items())
+    key = (connection.alias, connection_params)
+    try:
+        return _settings_cache[key]
+    except KeyError:
+        north_settings = _settings_cache[key] = NorthSettings(
+            connection_params)
+        return north_settings
+
+
+def clear_settings_cache(**kwargs):
+    _settings_cache.clear()
+
+
+setting_changed.connect(
+    clear_settings_cache, dispatch_uid='django_north_clear_settings_cache')
+
+
+def septentrion_settings(connection):
+    return dict(get_north_settings(connection).septentrion)
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import connections
+from django.db import DEFAULT_DB_ALIAS
+
+from django_north.management import migrations
+
+
+class Command(BaseCommand):
+    help = (
+        "Replaces the django_migrations rows of the fully applied versions "
+        "by one row per version.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--before', action='store', dest='before', required=True,
+            help='Compact the versions lower than this version.')
+        parser.add_argument(
+            '--database', action='store', dest='database',
+            default=DEFAULT_DB_ALIAS,
+            help='Nominates a database to compact. '
+                 'Defaults to the "default" database.',
+        )
+
+    def handle(self, *args, **options):
+        if getattr(settings, 'NORTH_MANAGE_DB', False) is not True:
+            raise CommandError(
+                "compacthistory is only available if NORTH_MANAGE_DB is "
+                "enabled.")
+        if not migrations.is_version(options['before']):
+            raise CommandError(
+                "Invalid version: {}".format(options['before']))
+
+        connection = connections[options['database']]
+        compacted = migrations.compact_history(
+            connection, options['before'])
+        if compacted and migrations.is_ledger_enabled():
+            migrations.refresh_ledger(connection)
+
+        if not compacted:
+            return "No version to compact.\n"
+        return "\n".join(
+            "Version {} compacted".format(version) for version in compacted
+        ) + "\n"
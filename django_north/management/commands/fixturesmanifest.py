@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from django_north.management import fixtures
+
+
+class Command(BaseCommand):
+    help = "Writes the manifest of the expected fixtures."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output', nargs='?',
+            default=getattr(settings, 'NORTH_FIXTURES_MANIFEST', None),
+            help='Path of the manifest. Defaults to the '
+                 'NORTH_FIXTURES_MANIFEST setting, or the standard output.')
+
+    def handle(self, *args, **options):
+        manifest = fixtures.get_fixtures_manifest()
+        if options['output'] is None:
+            return fixtures.dump_fixtures_manifest(manifest) + "\n"
+        fixtures.write_fixtures_manifest(manifest, options['output'])
+        return "Fixtures manifest written to {}\n".format(options['output'])
@@ -18,8 +18,12 @@ from django.db import DEFAULT_DB_ALIAS
 from django.db import connections
 from django.db import transaction
 
+from django_north.checks import clear_checks_cache
+from django_north.management.commands import get_north_settings
 from django_north.management.commands import septentrion_settings
+from django_north.management.connection import septentrion_connection
 from django_north.management.migrations import get_current_version
+from django_north.management.prewarm import prewarm_caches
 
 logger = logging.getLogger(__name__)
 
@@ -46,9 +50,7 @@ def sql_flush(style, connection, only_django=False, reset_sequences=True,
     # and a transactional test case flushed the test db,
     # migration data must be kept so the next test run do not try
     # to apply migrations again
-    protected_tables = getattr(
-        settings, 'NORTH_PROTECTED_TABLES',
-        ['django_migrations', 'sql_version'])
+    protected_tables = get_north_settings(connection).protected_tables
     for protected in protected_tables:
         if protected in tables:
             tables.remove(protected)
@@ -186,6 +188,11 @@ Are you sure you want to do this?
 
         # reload fixtures
         connection = connections[database]
-        septentrion.load_fixtures(
-            current_version, **septentrion_settings(connection),
-        )
+        with septentrion_connection(connection):
+            septentrion.load_fixtures(
+                current_version, **septentrion_settings(connection),
+            )
+
+        # reload contenttype and permission caches
+        prewarm_caches(database)
+        clear_checks_cache(database)
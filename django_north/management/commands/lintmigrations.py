@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import connections
+from django.db import DEFAULT_DB_ALIAS
+
+from django_north.management import lint
+from django_north.management.migrations import get_unapplied_migration_paths
+
+
+class Command(BaseCommand):
+    help = (
+        "Lists the statements of the migrations which lock or rewrite "
+        "tables, ranked by expected blocking time.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', metavar='path', nargs='*',
+            help='SQL files to lint. Defaults to the migrations not '
+                 'applied yet on the database.')
+        parser.add_argument(
+            '--database', action='store', dest='database',
+            default=DEFAULT_DB_ALIAS,
+            help='Nominates a database. Defaults to the "default" database.',
+        )
+        parser.add_argument(
+            '--stats', action='store', dest='stats',
+            default=getattr(settings, 'NORTH_LINT_STATS', None),
+            help='Table sizes snapshot, written by --dump-stats, to '
+                 'estimate the blocking time. Defaults to the '
+                 'NORTH_LINT_STATS setting.')
+        parser.add_argument(
+            '--dump-stats', action='store', dest='dump_stats',
+            help='Write a snapshot of the table sizes of the database to '
+                 'this file, and exit.')
+        parser.add_argument(
+            '--server-version', action='store', dest='server_version',
+            type=int,
+            help='PostgreSQL version number of the target server (110000 '
+                 'for 11). Defaults to the version of the database when '
+                 'linting the pending migrations, else to the oldest '
+                 'behaviour.')
+        parser.add_argument(
+            '--throughput', action='store', dest='throughput', type=float,
+            default=100,
+            help='Megabytes scanned per second, to estimate the blocking '
+                 'time (default: 100).')
+        parser.add_argument(
+            "--check", action="store_true", dest="check", default=False,
+            help="Exit with a non-zero status if a statement is reported")
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if options['dump_stats']:
+            lint.write_table_stats(
+                lint.get_table_stats(connection), options['dump_stats'])
+            return "Table stats written to {}\n".format(
+                options['dump_stats'])
+
+        sizes = None
+        if options['stats']:
+            try:
+                sizes = lint.read_table_stats(options['stats'])
+            except (IOError, ValueError) as e:
+                raise CommandError(
+                    "Unable to read the table stats: {}".format(e))
+
+        server_version = options['server_version']
+        if options['paths']:
+            paths = [
+                (os.path.basename(path), path) for path in options['paths']]
+        else:
+            paths = [
+                ('{}/{}'.format(version, name), path)
+                for version, name, path
+                in get_unapplied_migration_paths(connection)
+            ]
+            if server_version is None:
+                connection.ensure_connection()
+                server_version = connection.pg_version
+
+        findings = lint.lint_migrations(
+            paths, sizes=sizes, server_version=server_version,
+            throughput=options['throughput'] * 1024 * 1024)
+        result = [lint.format_finding(finding) for finding in findings]
+
+        if options['check'] and result:
+            self.stdout.write("\n".join(result))
+            raise CommandError("{} finding(s).".format(len(result)))
+        return "\n".join(result) + "\n"
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import contextlib
 import logging
 
 import septentrion
@@ -8,7 +9,14 @@ from django.core.management.base import BaseCommand
 from django.db import connections
 from django.db import DEFAULT_DB_ALIAS
 
+from django_north.checks import clear_checks_cache
+from django_north.management import explain
+from django_north.management import migrations
 from django_north.management.commands import septentrion_settings
+from django_north.management.connection import septentrion_connection
+from django_north.management.lock import migrate_lock
+from django_north.management.progress import report_progress
+from django_north.management.prewarm import prewarm_caches
 
 logger = logging.getLogger(__name__)
 
@@ -32,8 +40,28 @@ class Command(BaseCommand):
             '--run-syncdb', action='store_true', dest='run_syncdb',
             help='Creates tables for apps without migrations.',
         )
+        parser.add_argument(
+            '--explain', action='store_true', dest='explain',
+            help='Do not migrate, print the estimated rows and cost of the '
+                 'pending migrations (EXPLAIN, without ANALYZE).',
+        )
+        parser.add_argument(
+            '--progress', action='store_true', dest='progress',
+            help='Print the progress of the running statements '
+                 '(CREATE INDEX, CLUSTER, VACUUM, lock waits) and of the '
+                 'manual migration loops.',
+        )
+        parser.add_argument(
+            '--progress-interval', action='store', dest='progress_interval',
+            type=float, default=5,
+            help='Seconds between two progress reports (default: 5).',
+        )
 
     def handle(self, *args, **options):
+        if options['explain']:
+            # nothing is written: available even if the DB is not managed
+            return self.explain(connections[options['database']])
+
         if getattr(settings, 'NORTH_MANAGE_DB', False) is not True:
             logger.info('migrate command disabled')
             return
@@ -41,4 +69,48 @@ class Command(BaseCommand):
         self.verbosity = options.get('verbosity')
 
         connection = connections[options['database']]
-        septentrion.migrate(**septentrion_settings(connection))
+        if options['progress']:
+            progress = report_progress(
+                connection, self.stdout.write,
+                interval=options['progress_interval'])
+        else:
+            progress = contextlib.ExitStack()
+        with migrate_lock(connection) as run:
+            if run:
+                with progress, septentrion_connection(
+                        connection, group=True):
+                    septentrion.migrate(**septentrion_settings(connection))
+
+                if migrations.is_ledger_enabled():
+                    migrations.refresh_ledger(connection)
+
+        # reload contenttype and permission caches
+        prewarm_caches(options['database'])
+        clear_checks_cache(options['database'])
+
+    def explain(self, connection):
+        result = []
+        version_rows = version_cost = 0
+        estimates = explain.explain_migrations(connection)
+        for i, estimate in enumerate(estimates):
+            if i == 0 or estimates[i - 1].version != estimate.version:
+                result.append(estimate.version)
+                version_rows = version_cost = 0
+            result.append("  {}: {} row(s), cost {:.2f}".format(
+                estimate.name, estimate.rows, estimate.cost))
+            for table, reltuples, size in estimate.tables:
+                result.append("    DDL on {}: {} row(s), {}".format(
+                    table, 'unknown' if reltuples is None else reltuples,
+                    size))
+            for statement, error in estimate.errors:
+                result.append("    Not explained: {}".format(
+                    error.splitlines()[0]))
+            version_rows += estimate.rows
+            version_cost += estimate.cost
+            if i == len(estimates) - 1 or \
+                    estimates[i + 1].version != estimate.version:
+                result.append("  Total {}: {} row(s), cost {:.2f}".format(
+                    estimate.version, version_rows, version_cost))
+        if not estimates:
+            result.append("No pending migration.")
+        return "\n".join(result) + "\n"
@@ -7,6 +7,7 @@ from django.contrib.staticfiles.management.commands.runserver import \
 from django.db import connection
 from django_north.management import migrations
 from django_north.management.commands import septentrion_settings
+from django_north.management.connection import septentrion_connection
 
 
 class Command(RunserverCommand):
@@ -14,17 +15,20 @@ class Command(RunserverCommand):
             "serves static files.")
 
     def check_migrations(self):
-        try:
-            migration_plan = septentrion.build_migration_plan(
+        with septentrion_connection(connection):
+            try:
+                migration_plan = septentrion.build_migration_plan(
+                    **septentrion_settings(connection)
+                )
+            except migrations.DBException as e:
+                self.stdout.write(self.style.NOTICE("\n{}\n".format(e)))
+                return
+
+            schema_initialized = septentrion.is_schema_initialized(
                 **septentrion_settings(connection)
             )
-        except migrations.DBException as e:
-            self.stdout.write(self.style.NOTICE("\n{}\n".format(e)))
-            return
 
-        if not septentrion.is_schema_initialized(
-            **septentrion_settings(connection)
-        ):
+        if not schema_initialized:
             self.stdout.write(self.style.NOTICE("\nSchema not inited.\n"))
             return
 
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import connections
+from django.db import DatabaseError
+from django.db import DEFAULT_DB_ALIAS
+from django.db import router
+
+from django_north.management import drift
+
+
+class Command(BaseCommand):
+    help = "Displays the differences between the models and the DB schema."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'args', metavar='app_label', nargs='*',
+            help='Application labels to check. Defaults to all the apps.')
+        parser.add_argument(
+            '--database', action='store', dest='database',
+            default=DEFAULT_DB_ALIAS,
+            help='Nominates a database to check. '
+                 'Defaults to the "default" database.',
+        )
+        parser.add_argument(
+            "--check", action="store_true", dest="check", default=False,
+            help="Exit with a non-zero status if the schema has drifted")
+
+    def handle(self, *app_labels, **options):
+        connection = connections[options['database']]
+        models = None
+        if app_labels:
+            models = [
+                model
+                for app_label in app_labels
+                for model in router.get_migratable_models(
+                    apps.get_app_config(app_label), connection.alias,
+                    include_auto_created=True)
+            ]
+
+        try:
+            result = drift.get_schema_drift(connection, models=models)
+        except DatabaseError as e:
+            raise CommandError(
+                "Unable to build the expected schema: {}".format(e))
+
+        if options['check'] and result:
+            self.stdout.write("\n".join(result))
+            raise CommandError("{} difference(s).".format(len(result)))
+        return "\n".join(result) + "\n"
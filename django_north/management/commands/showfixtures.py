@@ -1,10 +1,14 @@
 # -*- coding: utf-8 -*-
-
-from django.apps import apps
+from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import connections
+from django.db import DEFAULT_DB_ALIAS
+from django.db import transaction
 
-from django_north.management import contenttypes
-from django_north.management import permissions
+from django_north.management import fixtures
+from django_north.management.sql import quote_literal
+from django_north.management.sql import values_list
 
 
 class Command(BaseCommand):
@@ -15,58 +19,168 @@ class Command(BaseCommand):
             "--unknown-contenttypes", action="store_true",
             dest="unknown_contenttypes", default=False,
             help="Show unknown contenttypes to be removed")
+        parser.add_argument(
+            '--database', action='store', dest='database',
+            default=DEFAULT_DB_ALIAS,
+            help='Nominates a database to check. '
+                 'Defaults to the "default" database.',
+        )
+        parser.add_argument(
+            "--apply", action="store_true", dest="apply", default=False,
+            help="Create the missing fixtures in the database (and remove "
+                 "the unknown contenttypes with --unknown-contenttypes). "
+                 "Only if the database is managed by north")
+        parser.add_argument(
+            "--format", action="store", dest="format",
+            choices=["statement", "set"], default="statement",
+            help="Output one statement per fixture (statement, default), "
+                 "or one statement per table (set)")
+        parser.add_argument(
+            "--offline", action="store_true", dest="offline", default=False,
+            help="Do not query the database, get the existing fixtures "
+                 "from the SQL files up to the target version")
+        parser.add_argument(
+            "--check", action="store_true", dest="check", default=False,
+            help="Exit with a non-zero status if fixtures are missing")
 
     def handle(self, *args, **options):
-        fixtures = []
+        if options['apply'] and \
+                getattr(settings, 'NORTH_MANAGE_DB', False) is not True:
+            raise CommandError(
+                "--apply is only available if NORTH_MANAGE_DB is enabled.")
+        if options['apply']:
+            for option, value in [
+                    ('--offline', options['offline']),
+                    ('--format set', options['format'] == 'set'),
+                    ('--check', options['check'])]:
+                if value:
+                    raise CommandError(
+                        "--apply and {} are incompatible.".format(option))
+
+        if options['apply']:
+            with transaction.atomic(using=options['database']):
+                diff = fixtures.get_fixtures_diff(using=options['database'])
+                return self.apply(diff, **options)
+
+        if options['offline']:
+            try:
+                diff = fixtures.get_offline_fixtures_diff(
+                    connections[options['database']])
+            except fixtures.FixturesParseError as e:
+                raise CommandError(
+                    "Unable to read the fixtures of the SQL files: "
+                    "{}".format(e))
+        else:
+            diff = fixtures.get_fixtures_diff(using=options['database'])
+
+        if options['format'] == 'set':
+            unknown_contenttypes = self.unknown_contenttypes_set
+            missing_contenttypes = self.missing_contenttypes_set
+            missing_permissions = self.missing_permissions_set
+        else:
+            unknown_contenttypes = self.unknown_contenttypes
+            missing_contenttypes = self.missing_contenttypes
+            missing_permissions = self.missing_permissions
+
+        result = []
         if options['unknown_contenttypes']:
-            fixtures += self.unknown_contenttypes()
-        fixtures += self.missing_contenttypes()
-        fixtures += self.missing_permissions()
+            result += unknown_contenttypes(diff.unknown_contenttypes)
+        result += missing_contenttypes(diff.missing_contenttypes)
+        result += missing_permissions(diff.missing_permissions)
 
-        return "\n".join(fixtures) + "\n"
+        if options['check'] and result:
+            self.stdout.write("\n".join(result))
+            raise CommandError("{} fixture(s) to fix.".format(len(result)))
+        return "\n".join(result) + "\n"
 
-    def unknown_contenttypes(self):
+    def unknown_contenttypes(self, cts):
         """
         Contenttypes to remove
         """
-        cts = []
-        for app_config in apps.get_app_configs():
-            cts += contenttypes.get_unknown_contenttypes_for_app_config(
-                app_config)
         return [
             "DELETE FROM django_content_type "
-            "WHERE app_label = '{}' AND model = '{}';".format(
-                ct.app_label, ct.model)
+            "WHERE app_label = {} AND model = {};".format(
+                quote_literal(ct.app_label), quote_literal(ct.model))
             for ct in cts
         ]
 
-    def missing_contenttypes(self):
+    def missing_contenttypes(self, cts):
         """
         Contenttypes to create
         """
-        cts = []
-        for app_config in apps.get_app_configs():
-            cts += contenttypes.get_missing_contenttypes_for_app_config(
-                app_config)
         return [
             "INSERT INTO django_content_type(app_label, model) "
-            "VALUES('{}', '{}');".format(ct.app_label, ct.model)
+            "VALUES({}, {});".format(
+                quote_literal(ct.app_label), quote_literal(ct.model))
             for ct in cts
         ]
 
-    def missing_permissions(self):
+    def missing_permissions(self, perms):
         """
         Permissions to create
         """
-        perms = []
-        for app_config in apps.get_app_configs():
-            perms += permissions.get_missing_permissions_for_app_config(
-                app_config)
         return [
             "INSERT INTO auth_permission(codename, name, content_type_id) "
-            "VALUES('{}', '{}', (SELECT id FROM django_content_type "
-            "WHERE app_label = '{}' AND model = '{}'));".format(
-                perm.codename, perm.name, perm.content_type.app_label,
-                perm.content_type.model)
+            "VALUES({}, {}, (SELECT id FROM django_content_type "
+            "WHERE app_label = {} AND model = {}));".format(
+                quote_literal(perm.codename), quote_literal(perm.name),
+                quote_literal(perm.content_type.app_label),
+                quote_literal(perm.content_type.model))
             for perm in perms
         ]
+
+    def unknown_contenttypes_set(self, cts):
+        """
+        Contenttypes to remove, in one statement
+        """
+        if not cts:
+            return []
+        return [
+            "DELETE FROM django_content_type "
+            "WHERE (app_label, model) IN (VALUES\n{});".format(
+                values_list((ct.app_label, ct.model) for ct in cts))
+        ]
+
+    def missing_contenttypes_set(self, cts):
+        """
+        Contenttypes to create, in one statement
+        """
+        if not cts:
+            return []
+        return [
+            "INSERT INTO django_content_type(app_label, model) "
+            "VALUES\n{};".format(
+                values_list((ct.app_label, ct.model) for ct in cts))
+        ]
+
+    def missing_permissions_set(self, perms):
+        """
+        Permissions to create, in one statement
+        """
+        if not perms:
+            return []
+        return [
+            "INSERT INTO auth_permission(codename, name, content_type_id)\n"
+            "SELECT v.codename, v.name, ct.id FROM (VALUES\n{}\n"
+            ") AS v(codename, name, app_label, model)\n"
+            "JOIN django_content_type ct "
+            "ON ct.app_label = v.app_label AND ct.model = v.model;".format(
+                values_list(
+                    (perm.codename, perm.name, perm.content_type.app_label,
+                     perm.content_type.model)
+                    for perm in perms))
+        ]
+
+    def apply(self, diff, **options):
+        """
+        Create the missing fixtures
+        """
+        removed, created_cts, created_perms = fixtures.apply_fixtures_diff(
+            diff, using=options['database'],
+            remove_unknown=options['unknown_contenttypes'])
+        result = []
+        if options['unknown_contenttypes']:
+            result.append("{} contenttype(s) removed".format(removed))
+        result.append("{} contenttype(s) created".format(created_cts))
+        result.append("{} permission(s) created".format(created_perms))
+        return "\n".join(result) + "\n"
@@ -9,6 +9,7 @@ from django.db import connections
 from django.db import DEFAULT_DB_ALIAS
 
 from django_north.management.commands import septentrion_settings
+from django_north.management.connection import septentrion_connection
 
 logger = logging.getLogger(__name__)
 
@@ -31,4 +32,5 @@ class Command(BaseCommand):
 
         connection = connections[options['database']]
 
-        septentrion.show_migrations(**septentrion_settings(connection),)
+        with septentrion_connection(connection):
+            septentrion.show_migrations(**septentrion_settings(connection))
@@ -1,11 +1,23 @@
 from __future__ import unicode_literals
 
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+
+import django
+from django.apps import apps
+from django.conf import settings
 from django.core.management.base import AppCommand
 from django.core.management.base import CommandError
 from django.db import DEFAULT_DB_ALIAS, connections
 from django.db import router
 from django.utils.version import get_docs_version
 
+# bump it when the generated SQL changes
+SQLALL_CACHE_VERSION = 1
+
 
 def sql_create_model(editor, model):
     """
@@ -72,9 +84,7 @@ def sql_create_model(editor, model):
     return output
 
 
-def sql_create(app_config, style, connection):
-    "Returns a list of the CREATE TABLE SQL statements for the given app."
-
+def check_engine(connection):
     if connection.settings_dict['ENGINE'] == 'django.db.backends.dummy':
         # This must be the "dummy" database backend, which means the user
         # hasn't set ENGINE for the database.
@@ -86,32 +96,234 @@ def sql_create(app_config, style, connection):
             "#databases" % get_docs_version()
         )
 
-    # Get installed models, so we generate REFERENCES right.
-    # We trim models from the current app so that the sqlreset command does not
-    # generate invalid SQL (leaving models out of known_models is harmless, so
-    # we can be conservative).
-    final_output = []
-    output = []
 
-    for model in router.get_migratable_models(
-            app_config, connection.alias, include_auto_created=True):
-        with connection.schema_editor() as editor:
-            output += sql_create_model(editor, model)
-            final_output.extend(editor.deferred_sql)
+def sql_create_models(model_groups, connection):
+    """
+    Returns, for each group of models, the CREATE TABLE SQL statements and
+    the deferred SQL statements (foreign keys, indexes, ...), with a single
+    schema editor.
+    """
+    results = []
+    # collect_sql and no atomic block: the editor does not need
+    # to query the database
+    with connection.schema_editor(collect_sql=True, atomic=False) as editor:
+        for models in model_groups:
+            output = []
+            for model in models:
+                output += sql_create_model(editor, model)
+            if not get_docs_version().startswith('1'):
+                # Content of deferred_sql are Statement objects which need to
+                # be converted as str
+                final_output = [
+                    str(statement) for statement in editor.deferred_sql]
+            else:
+                final_output = list(editor.deferred_sql)
             editor.deferred_sql = []
-    if not get_docs_version().startswith('1'):
-        # Content of final_output are Statement objects which need to be
-        # converted as str
-        final_output = [str(statement) for statement in final_output]
+            results.append((output, final_output))
+    return results
+
+
+def sql_create_labels(alias, label_groups):
+    """
+    Same as sql_create_models, for groups of model labels.
+    Used by the worker processes of generate_sql.
+    """
+    model_groups = [
+        [apps.get_model(label) for label in labels]
+        for labels in label_groups
+    ]
+    return sql_create_models(model_groups, connections[alias])
+
+
+def get_app_models(connection, app_configs=None):
+    """
+    Returns the migratable models of each app (all the installed apps
+    by default), as a list of (app_label, models), in the apps order
+    """
+    if app_configs is None:
+        app_configs = apps.get_app_configs()
+    return [
+        (app_config.label, router.get_migratable_models(
+            app_config, connection.alias, include_auto_created=True))
+        for app_config in app_configs
+        if app_config.models_module is not None
+    ]
+
+
+def get_all_models(connection):
+    """
+    Returns the models of all the installed apps, in the apps order
+    """
+    return [
+        model
+        for app_label, models in get_app_models(connection)
+        for model in models
+    ]
+
+
+def split_groups(model_groups, jobs):
+    """
+    Split the groups of models in at most jobs contiguous chunks,
+    with about the same number of models
+    """
+    total = sum(len(models) for models in model_groups)
+    chunks = [[]]
+    count = 0
+    for models in model_groups:
+        if count >= total / jobs * len(chunks) and len(chunks) < jobs:
+            chunks.append([])
+        chunks[-1].append(models)
+        count += len(models)
+    return [chunk for chunk in chunks if chunk]
+
+
+def generate_sql(model_groups, connection, jobs=1):
+    """
+    Same as sql_create_models. With jobs > 1, the groups of models are
+    split between jobs worker processes.
+    """
+    chunks = split_groups(model_groups, jobs)
+    if not chunks:
+        return []
+    if len(chunks) < 2:
+        return sql_create_models(model_groups, connection)
+
+    # forked workers inherit the loaded apps registry
+    with multiprocessing.get_context('fork').Pool(len(chunks)) as pool:
+        chunk_results = pool.starmap(sql_create_labels, [
+            (connection.alias,
+             [[model._meta.label for model in models] for models in chunk])
+            for chunk in chunks
+        ])
+    return [result for results in chunk_results for result in results]
+
+
+def get_model_state(model, connection):
+    """
+    Returns the parts of a model which are used to generate its SQL
+    statements
+    """
+    opts = model._meta
+    fields = []
+    for field in opts.local_fields:
+        remote_field = field.remote_field
+        target = None
+        if remote_field and field.db_constraint:
+            target = (
+                field.target_field.model._meta.db_table,
+                field.target_field.column)
+        fields.append((
+            field.__class__.__module__, field.__class__.__name__,
+            field.name, field.column,
+            field.db_parameters(connection=connection),
+            field.db_type_suffix(connection=connection),
+            field.null, field.unique, field.primary_key, field.db_index,
+            field.db_tablespace, target,
+        ))
+    return (
+        opts.label, opts.db_table, opts.db_tablespace, fields,
+        [list(fields) for fields in opts.unique_together],
+        [list(fields) for fields in opts.index_together],
+        [index.deconstruct() for index in opts.indexes],
+    )
+
+
+def get_cache_key(app_label, models, connection):
+    """
+    Returns the cache key of the SQL statements of an app: a hash of
+    the state of its models, of the database backend and of the
+    Django version
+    """
+    state = [
+        SQLALL_CACHE_VERSION, django.get_version(), connection.vendor,
+        connection.settings_dict['ENGINE'],
+        [get_model_state(model, connection) for model in models],
+    ]
+    digest = hashlib.sha256(
+        json.dumps(state, sort_keys=True, default=repr).encode('utf8'))
+    return '{}-{}'.format(app_label, digest.hexdigest())
+
+
+def read_cache(cache_dir, key):
+    path = os.path.join(cache_dir, key + '.json')
+    try:
+        with io.open(path, 'r', encoding='utf8') as f:
+            output, final_output = json.load(f)
+    except (IOError, ValueError):
+        return None
+    return output, final_output
+
+
+def write_cache(cache_dir, key, result):
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    path = os.path.join(cache_dir, key + '.json')
+    # write then rename, so a concurrent run never reads a partial file
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with io.open(tmp_path, 'w', encoding='utf8') as f:
+        f.write(json.dumps(list(result)))
+    os.rename(tmp_path, path)
+
+
+def generate_sql_cached(app_models, connection, jobs=1, cache_dir=None):
+    """
+    Returns the CREATE TABLE SQL statements and the deferred SQL statements
+    of each app of app_models ([(app_label, models)]).
+    With a cache_dir, the statements of each app are cached on disk, and
+    only the apps whose models changed are generated.
+    """
+    if cache_dir is None:
+        return generate_sql(
+            [models for app_label, models in app_models], connection, jobs)
+
+    keys = [
+        get_cache_key(app_label, models, connection)
+        for app_label, models in app_models
+    ]
+    results = [read_cache(cache_dir, key) for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+    generated = generate_sql(
+        [app_models[i][1] for i in missing], connection, jobs)
+    for i, result in zip(missing, generated):
+        write_cache(cache_dir, keys[i], result)
+        results[i] = result
+    return results
+
+
+def sql_create_all(connection, jobs=1, cache_dir=None):
+    """
+    Returns the CREATE TABLE SQL statements of all the installed apps,
+    followed by their deferred SQL statements.
+    """
+    check_engine(connection)
+
+    results = generate_sql_cached(
+        get_app_models(connection), connection, jobs=jobs,
+        cache_dir=cache_dir)
+    output = []
+    final_output = []
+    for app_output, app_final_output in results:
+        output += app_output
+        final_output += app_final_output
+    return output + final_output
+
+
+def sql_create(app_config, style, connection, cache_dir=None):
+    "Returns a list of the CREATE TABLE SQL statements for the given app."
+    check_engine(connection)
+
+    [(output, final_output)] = generate_sql_cached(
+        get_app_models(connection, [app_config]), connection,
+        cache_dir=cache_dir)
     return output + final_output
 
 
-def sql_all(app_config, style, connection):
+def sql_all(app_config, style, connection, cache_dir=None):
     """
     Returns a list of CREATE TABLE SQL, initial-data inserts,
     and CREATE INDEX SQL for the given module.
     """
-    return sql_create(app_config, style, connection)
+    return sql_create(app_config, style, connection, cache_dir=cache_dir)
 
 
 class Command(AppCommand):
@@ -119,18 +331,51 @@ class Command(AppCommand):
             "statements for the given model module name(s).")
 
     output_transaction = True
+    # app labels are optional with --all
+    missing_args_message = None
 
     def add_arguments(self, parser):
-        super(Command, self).add_arguments(parser)
+        parser.add_argument(
+            'args', metavar='app_label', nargs='*',
+            help='One or more application label.')
         parser.add_argument(
             '--database',
             default=DEFAULT_DB_ALIAS,
             help='Nominates a database to print the SQL for. Defaults to the '
                  '"default" database.')
+        parser.add_argument(
+            '--all', action='store_true', dest='all', default=False,
+            help='Print the SQL statements of all the installed apps: '
+                 'the tables, then the foreign keys and indexes.')
+        parser.add_argument(
+            '--jobs', type=int, dest='jobs', default=1,
+            help='With --all, number of processes used to generate '
+                 'the SQL statements. Defaults to 1.')
+        parser.add_argument(
+            '--cache-dir', dest='cache_dir',
+            default=getattr(settings, 'NORTH_SQLALL_CACHE_DIR', None),
+            help='Directory used to cache the SQL statements of each app. '
+                 'Defaults to the NORTH_SQLALL_CACHE_DIR setting.')
+
+    def handle(self, *app_labels, **options):
+        if options['all']:
+            if app_labels:
+                raise CommandError(
+                    "--all can not be used with application labels.")
+            connection = connections[options['database']]
+            return '\n'.join(sql_create_all(
+                connection, jobs=options['jobs'],
+                cache_dir=options['cache_dir']))
+        if not app_labels:
+            raise CommandError(
+                "Enter at least one application label, or use --all.")
+        return super(Command, self).handle(*app_labels, **options)
 
     def handle_app_config(self, app_config, **options):
         if app_config.models_module is None:
             return
         connection = connections[options['database']]
-        statements = sql_all(app_config, self.style, connection)
+        statements = sql_all(
+            app_config, self.style, connection,
+            cache_dir=options['cache_dir'])
         return '\n'.join(statements)
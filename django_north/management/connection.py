@@ -0,0 +1,399 @@
+import io
+import logging
+import os
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db import transaction
+
+from septentrion import core
+from septentrion import db
+from septentrion import migration
+from septentrion import runner
+
+from django_north.management import sql
+from django_north.management.commands import get_north_settings
+from django_north.management.migrations import ARCHIVED_MIGRATIONS
+from django_north.management.migrations import COMPACTED_MIGRATION
+from django_north.management.migrations import expand_compacted_migrations
+from django_north.management.restore import schema_dumps
+
+logger = logging.getLogger(__name__)
+
+# connection OPTIONS understood by libpq, and the matching env variables
+LIBPQ_ENVIRON = {
+    'sslmode': 'PGSSLMODE',
+    'sslrootcert': 'PGSSLROOTCERT',
+    'sslcert': 'PGSSLCERT',
+    'sslkey': 'PGSSLKEY',
+    'sslcrl': 'PGSSLCRL',
+    'connect_timeout': 'PGCONNECT_TIMEOUT',
+    'application_name': 'PGAPPNAME',
+    'options': 'PGOPTIONS',
+    'passfile': 'PGPASSFILE',
+    'service': 'PGSERVICE',
+    'target_session_attrs': 'PGTARGETSESSIONATTRS',
+}
+
+# first words of the transaction statements: a grouped file may only
+# start with BEGIN and end with COMMIT
+TRANSACTION_KEYWORDS = (
+    'BEGIN', 'START', 'COMMIT', 'END', 'ROLLBACK', 'ABORT', 'SAVEPOINT',
+    'RELEASE',
+)
+
+GROUP_RECORD = """
+INSERT INTO django_migrations (app, name, applied)
+SELECT %s, name, now() FROM unnest(%s::varchar[]) AS name;
+"""
+
+# consecutive migration files of a version, run in one transaction
+MigrationGroup = namedtuple(
+    'MigrationGroup', ['version', 'names', 'paths', 'scripts'])
+
+
+def get_libpq_environ(connection):
+    """
+    Return the libpq env variables for the OPTIONS of a Django connection
+    """
+    options = connection.settings_dict.get('OPTIONS', {})
+    return {
+        env_name: str(options[name])
+        for name, env_name in LIBPQ_ENVIRON.items()
+        if options.get(name) is not None
+    }
+
+
+def can_reuse_connection(connection):
+    """
+    The Django connection can be used by septentrion if it is not
+    in a transaction: septentrion expects an autocommit connection.
+    """
+    if getattr(settings, 'NORTH_REUSE_CONNECTION', False) is not True:
+        return False
+    return (
+        connection.settings_dict['AUTOCOMMIT'] and
+        not connection.in_atomic_block)
+
+
+def has_keyword(words, keyword):
+    """
+    Return True if the keyword (one or more words) is in the upper cased
+    words of a statement
+    """
+    keyword = keyword.upper().split()
+    return any(
+        words[index:index + len(keyword)] == keyword
+        for index in range(len(words)))
+
+
+def classify_statements(statements, keywords):
+    """
+    Return how SQL statements can be run:
+    'psql' if they have psql meta commands or a manual migration loop,
+    'statements' if they have a non transactional keyword or a COPY FROM
+    STDIN: they are run one by one,
+    'simple' if they can be run in a single execute call.
+    The keywords are searched in the statements words: a keyword in a
+    comment, a string or a quoted identifier does not count.
+    """
+    kind = 'simple'
+    for statement in statements:
+        if statement.kind == 'meta' or any(
+                '--meta-psql:' in comment
+                for comment in statement.comments):
+            return 'psql'
+        if kind == 'statements':
+            continue
+        words = [
+            token.value for token in statement.tokens
+            if token.kind == 'word']
+        if statement.kind == 'copy' or any(
+                has_keyword(words, keyword) for keyword in keywords):
+            kind = 'statements'
+    return kind
+
+
+def classify_script(path, keywords):
+    """
+    Return how a SQL file can be run, see classify_statements
+    """
+    with io.open(path, 'r', encoding='utf8') as f:
+        return classify_statements(sql.iter_statements(f), keywords)
+
+
+def is_simple_script(path, keywords):
+    """
+    Return True if the SQL file can be run in a single execute call:
+    no psql meta commands, no manual migration loop,
+    no non transactional keyword.
+    """
+    return classify_script(path, keywords) == 'simple'
+
+
+def run_script(connection, path):
+    """
+    Run a SQL file on the Django connection
+    """
+    with io.open(path, 'r', encoding='utf8') as f:
+        script = f.read()
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(script)
+        except Exception as e:
+            # leave the transaction opened by the file, if any
+            cursor.execute('ROLLBACK')
+            raise runner.SQLRunnerException(
+                "Error during migration: {}".format(e)) from e
+
+
+def run_statement(cursor, statement):
+    if statement.kind == 'copy':
+        cursor.copy_expert(statement.text, io.StringIO(statement.data))
+    else:
+        cursor.execute(statement.text)
+
+
+def run_statements(connection, path):
+    """
+    Run a SQL file on the Django connection, statement by statement,
+    reading it lazily, as psql does: the non transactional statements
+    (CREATE INDEX CONCURRENTLY, VACUUM...) run in autocommit.
+    """
+    with io.open(path, 'r', encoding='utf8') as f, \
+            connection.cursor() as cursor:
+        for statement in sql.iter_statements(f):
+            if not statement.tokens:
+                continue
+            try:
+                run_statement(cursor, statement)
+            except Exception as e:
+                # leave the transaction opened by the file, if any
+                cursor.execute('ROLLBACK')
+                raise runner.SQLRunnerException(
+                    "Error during migration: {}".format(e)) from e
+
+
+@contextmanager
+def patch_environ(environ):
+    old_environ = {name: os.environ.get(name) for name in environ}
+    os.environ.update(environ)
+    try:
+        yield
+    finally:
+        for name, value in old_environ.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+@contextmanager
+def compacted_migrations():
+    """
+    Make septentrion consider the archived migrations of the compacted
+    versions as applied
+    """
+    original_get_applied_migrations = db.get_applied_migrations
+
+    def get_applied_migrations(settings, version):
+        names = original_get_applied_migrations(
+            settings=settings, version=version)
+        if COMPACTED_MIGRATION not in names:
+            return names
+        with db.Query(
+                settings=settings, query=ARCHIVED_MIGRATIONS,
+                args=(version.original_string,)) as cursor:
+            archived = [row[0] for row in cursor]
+        return expand_compacted_migrations(names, archived)
+
+    db.get_applied_migrations = get_applied_migrations
+    try:
+        yield
+    finally:
+        db.get_applied_migrations = original_get_applied_migrations
+
+
+def is_grouping_enabled():
+    return getattr(settings, 'NORTH_GROUP_MIGRATIONS', False) is True
+
+
+def get_group_script(path, keywords):
+    """
+    Return the SQL of a migration file without its BEGIN and COMMIT, to
+    run it in a group, None if the file can not be grouped: psql meta
+    commands, non transactional keywords, or other transaction statements
+    """
+    with io.open(path, 'r', encoding='utf8') as f:
+        statements = list(sql.iter_statements(f))
+    if classify_statements(statements, keywords) != 'simple':
+        return None
+
+    statements = [statement for statement in statements if statement.tokens]
+    if statements and statements[0].tokens[0].value in ('BEGIN', 'START'):
+        statements = statements[1:]
+    if statements and statements[-1].tokens[0].value in ('COMMIT', 'END'):
+        statements = statements[:-1]
+    if any(statement.tokens[0].value in TRANSACTION_KEYWORDS
+           for statement in statements):
+        return None
+    return '\n'.join(statement.text for statement in statements)
+
+
+def group_migration_plan(version, plan, keywords):
+    """
+    Replace the consecutive unapplied, non manual files of a version plan
+    which can run in a transaction by MigrationGroup entries
+    """
+    grouped = []
+    pending = []
+
+    def flush():
+        if len(pending) > 1:
+            names, paths, scripts = zip(*[
+                (mig, path, script)
+                for (mig, applied, path, is_manual), script in pending])
+            title = '{} (+{} grouped)'.format(names[0], len(names) - 1)
+            grouped.append((
+                title, False,
+                MigrationGroup(version, names, paths, scripts), False))
+        else:
+            grouped.extend(entry for entry, script in pending)
+        del pending[:]
+
+    for entry in plan:
+        mig, applied, path, is_manual = entry
+        script = None
+        if not applied and not is_manual:
+            script = get_group_script(str(path), keywords)
+        if script is None:
+            flush()
+            grouped.append(entry)
+        else:
+            pending.append((entry, script))
+    flush()
+    return grouped
+
+
+def run_group(connection, group):
+    """
+    Run the files of a group in one transaction, and record them in one
+    insert. Return False if the group failed and was rolled back.
+    """
+    try:
+        with transaction.atomic(using=connection.alias), \
+                connection.cursor() as cursor:
+            cursor.execute('\n'.join(group.scripts))
+            cursor.execute(GROUP_RECORD, [
+                group.version.original_string, list(group.names)])
+    except DatabaseError as e:
+        logger.warning(
+            'Grouped migrations %s failed, running them one by one: %s',
+            ', '.join(group.names), e)
+        return False
+    return True
+
+
+@contextmanager
+def grouped_migrations(connection, keywords):
+    """
+    Make septentrion run the consecutive transactional files of a version
+    in one transaction, with one insert in django_migrations.
+    If a group fails, its files are run and recorded one by one.
+    """
+    original_build_migration_plan = core.build_migration_plan
+    original_write_migration = db.write_migration
+    original_run_script = migration.run_script
+
+    # (version, title) of the groups, recorded by _run_script
+    groups = set()
+
+    def build_migration_plan(settings, schema_version):
+        for plan in original_build_migration_plan(
+                settings=settings, schema_version=schema_version):
+            version_plan = group_migration_plan(
+                plan['version'], plan['plan'], keywords)
+            groups.update(
+                (plan['version'].original_string, mig)
+                for mig, applied, path, is_manual in version_plan
+                if isinstance(path, MigrationGroup))
+            yield {'version': plan['version'], 'plan': version_plan}
+
+    def _run_script(settings, path):
+        if not isinstance(path, MigrationGroup):
+            return original_run_script(settings=settings, path=path)
+        if run_group(connection, path):
+            return
+        for name, script_path in zip(path.names, path.paths):
+            run_script(connection, str(script_path))
+            original_write_migration(
+                settings=settings, version=path.version, name=name)
+
+    def write_migration(settings, version, name):
+        if (version.original_string, name) in groups:
+            return
+        original_write_migration(
+            settings=settings, version=version, name=name)
+
+    core.build_migration_plan = build_migration_plan
+    db.write_migration = write_migration
+    migration.run_script = _run_script
+    try:
+        yield
+    finally:
+        core.build_migration_plan = original_build_migration_plan
+        db.write_migration = original_write_migration
+        migration.run_script = original_run_script
+
+
+@contextmanager
+def septentrion_connection(connection, group=False):
+    """
+    Make septentrion use the Django connection for its queries, and for
+    the SQL files without psql meta commands: in a single execute call,
+    or statement by statement.
+    The other SQL files are still run with psql, which gets the connection
+    OPTIONS (sslmode, connect_timeout...) from the environment.
+    A new DB is initialized from the pg_dump archive of the schema, if
+    there is one, see schema_dumps.
+    With group (set by migrate only: the plan of showmigrations is
+    unchanged) and NORTH_GROUP_MIGRATIONS, the consecutive transactional
+    files of a version are run in one transaction, see grouped_migrations.
+    """
+    with patch_environ(get_libpq_environ(connection)), \
+            compacted_migrations(), schema_dumps():
+        if not can_reuse_connection(connection):
+            yield
+            return
+
+        original_get_connection = db.get_connection
+        original_run_script = migration.run_script
+
+        @contextmanager
+        def get_connection(settings):
+            connection.ensure_connection()
+            yield connection.connection
+
+        keywords = get_north_settings(connection).non_transactional_keywords
+
+        def _run_script(settings, path):
+            kind = classify_script(path, keywords)
+            if kind == 'psql':
+                return original_run_script(settings=settings, path=path)
+            if kind == 'statements':
+                return run_statements(connection, path)
+            run_script(connection, path)
+
+        db.get_connection = get_connection
+        migration.run_script = _run_script
+        try:
+            if group and is_grouping_enabled():
+                with grouped_migrations(connection, keywords):
+                    yield
+            else:
+                yield
+        finally:
+            db.get_connection = original_get_connection
+            migration.run_script = original_run_script
@@ -0,0 +1,219 @@
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import transaction
+
+from django_north.management import sql
+from django_north.management.commands.sqlall import get_all_models
+from django_north.management.commands.sqlall import sql_create_all
+
+# columns: {name: (type, nullable)}
+# indexes: {(column, ...)}, including the unique indexes and the primary key
+# unique: {(column, ...)}, including the primary key
+# primary_key: (column, ...)
+# foreign_keys: {column: (table, column)}
+Table = namedtuple('Table', [
+    'columns', 'indexes', 'unique', 'primary_key', 'foreign_keys',
+])
+
+TABLES_QUERY = """
+SELECT c.oid, c.relname
+FROM pg_class c
+WHERE c.relkind IN ('r', 'p') AND {}
+"""
+VISIBLE_TABLES = 'pg_table_is_visible(c.oid)'
+TEMPORARY_TABLES = 'c.relnamespace = pg_my_temp_schema()'
+
+
+COLUMNS_QUERY = """
+SELECT a.attrelid, a.attnum, a.attname,
+    format_type(a.atttypid, a.atttypmod), NOT a.attnotnull
+FROM pg_attribute a
+WHERE a.attrelid = ANY(%s::oid[]) AND a.attnum > 0 AND NOT a.attisdropped
+"""
+
+INDEXES_QUERY = """
+SELECT i.indrelid, i.indkey::int2[], i.indisunique, i.indisprimary
+FROM pg_index i
+WHERE i.indrelid = ANY(%s::oid[]) AND i.indpred IS NULL
+"""
+
+FOREIGN_KEYS_QUERY = """
+SELECT c.conrelid, c.conkey, c.confrelid, c.confkey
+FROM pg_constraint c
+WHERE c.conrelid = ANY(%s::oid[]) AND c.contype = 'f'
+"""
+
+
+def get_catalog_snapshot(connection, temporary=False):
+    """
+    Return the tables of the database (the temporary tables of the
+    session with temporary), as {name: Table}.
+    Run one query per catalog table, whatever the number of tables.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(TABLES_QUERY.format(
+            TEMPORARY_TABLES if temporary else VISIBLE_TABLES))
+        names = dict(cursor.fetchall())
+        oids = list(names)
+
+        cursor.execute(COLUMNS_QUERY, [oids])
+        columns = {}
+        tables = {oid: Table({}, set(), set(), (), {}) for oid in names}
+        for oid, attnum, name, db_type, nullable in cursor.fetchall():
+            columns[oid, attnum] = name
+            tables[oid].columns[name] = (db_type, nullable)
+
+        cursor.execute(INDEXES_QUERY, [oids])
+        for oid, attnums, unique, primary in cursor.fetchall():
+            if 0 in attnums:
+                # expression index
+                continue
+            index = tuple(columns[oid, attnum] for attnum in attnums)
+            tables[oid].indexes.add(index)
+            if unique:
+                tables[oid].unique.add(index)
+            if primary:
+                tables[oid] = tables[oid]._replace(primary_key=index)
+
+        cursor.execute(FOREIGN_KEYS_QUERY, [oids])
+        for oid, attnums, foreign_oid, foreign_attnums in cursor.fetchall():
+            if len(attnums) != 1 or foreign_oid not in names:
+                continue
+            tables[oid].foreign_keys[columns[oid, attnums[0]]] = (
+                names[foreign_oid], columns[foreign_oid, foreign_attnums[0]])
+
+    return {names[oid]: table for oid, table in tables.items()}
+
+
+def is_foreign_key(statement):
+    """
+    Return True if a statement of sqlall adds a foreign key constraint
+    """
+    words = [
+        token.value for token in sql.tokenize(statement)
+        if token.kind == 'word']
+    return words[:2] == ['ALTER', 'TABLE'] and any(
+        words[index:index + 2] == ['FOREIGN', 'KEY']
+        for index in range(len(words)))
+
+
+def get_foreign_keys(model):
+    """
+    Return the foreign key constraints of a model, as
+    {column: (table, column)}
+    """
+    return {
+        field.column: (
+            field.target_field.model._meta.db_table,
+            field.target_field.column)
+        for field in model._meta.local_fields
+        if field.remote_field and field.db_constraint
+    }
+
+
+def get_expected_tables(models, connection):
+    """
+    Return the tables expected by the models, as {name: Table}.
+    Run the statements of sqlall (of all the installed apps) in the
+    temporary schema of the session, read them from the catalog, and
+    roll back.
+    The foreign keys are not created, a temporary table can not reference
+    a permanent table (nor a table missing from sqlall, like the table of
+    an unmanaged model): they are read from the models.
+    """
+    statements = [
+        statement for statement in sql_create_all(
+            connection,
+            cache_dir=getattr(settings, 'NORTH_SQLALL_CACHE_DIR', None))
+        if not is_foreign_key(statement)
+    ]
+    with transaction.atomic(using=connection.alias):
+        with connection.cursor() as cursor:
+            # the unqualified tables, sequences and indexes are temporary
+            cursor.execute('SET LOCAL search_path = pg_temp, public')
+            cursor.execute(';\n'.join(statements))
+        tables = get_catalog_snapshot(connection, temporary=True)
+        transaction.set_rollback(True, using=connection.alias)
+
+    expected_tables = {}
+    for model in models:
+        table = tables.get(model._meta.db_table)
+        if table is not None:
+            table.foreign_keys.update(get_foreign_keys(model))
+            expected_tables[model._meta.db_table] = table
+    return expected_tables
+
+
+def format_columns(columns):
+    return '({})'.format(', '.join(columns))
+
+
+def compare_table(name, expected, actual):
+    """
+    Return the differences between the expected and the actual table
+    """
+    drift = []
+    for column, (db_type, nullable) in sorted(expected.columns.items()):
+        if column not in actual.columns:
+            drift.append("{}: missing column {}".format(name, column))
+            continue
+        actual_type, actual_nullable = actual.columns[column]
+        if actual_type != db_type:
+            drift.append("{}.{}: type is {}, expected {}".format(
+                name, column, actual_type, db_type))
+        if actual_nullable != nullable:
+            drift.append("{}.{}: {}, expected {}".format(
+                name, column,
+                'nullable' if actual_nullable else 'not nullable',
+                'nullable' if nullable else 'not nullable'))
+    for column in sorted(set(actual.columns) - set(expected.columns)):
+        drift.append("{}: unknown column {}".format(name, column))
+
+    if expected.primary_key != actual.primary_key:
+        drift.append("{}: primary key is {}, expected {}".format(
+            name, format_columns(actual.primary_key),
+            format_columns(expected.primary_key)))
+    for columns in sorted(expected.unique - actual.unique):
+        drift.append("{}: missing unique constraint on {}".format(
+            name, format_columns(columns)))
+    for columns in sorted(expected.indexes - actual.indexes):
+        drift.append("{}: missing index on {}".format(
+            name, format_columns(columns)))
+
+    for column, target in sorted(expected.foreign_keys.items()):
+        actual_target = actual.foreign_keys.get(column)
+        if actual_target is None:
+            drift.append("{}.{}: missing foreign key to {}.{}".format(
+                name, column, *target))
+        elif actual_target != target:
+            drift.append("{}.{}: foreign key to {}.{}, expected {}.{}".format(
+                name, column, actual_target[0], actual_target[1], *target))
+    return drift
+
+
+def compare_tables(expected_tables, actual_tables):
+    """
+    Return the differences between the expected and the actual tables.
+    The tables which are not expected are ignored.
+    """
+    drift = []
+    for name, expected in sorted(expected_tables.items()):
+        actual = actual_tables.get(name)
+        if actual is None:
+            drift.append("{}: missing table".format(name))
+            continue
+        drift += compare_table(name, expected, actual)
+    return drift
+
+
+def get_schema_drift(connection, models=None):
+    """
+    Return the differences between the models (of all the installed apps
+    by default) and the database schema
+    """
+    if models is None:
+        models = get_all_models(connection)
+    return compare_tables(
+        get_expected_tables(models, connection),
+        get_catalog_snapshot(connection))
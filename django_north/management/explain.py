@@ -0,0 +1,142 @@
+import io
+import json
+from collections import namedtuple
+
+from django.db import DatabaseError
+from django.db import transaction
+
+from django_north.management import sql
+from django_north.management.migrations import get_unapplied_migration_paths
+
+# rows, cost: sum of the EXPLAIN estimations of the DML statements
+# tables: [(table, estimated rows, size)] targeted by DDL statements,
+# estimated rows is None if the table was never analyzed
+# errors: [(statement, error)] for the statements which can not be
+# explained (a table or a column created by a pending DDL migration, ...)
+FileEstimate = namedtuple('FileEstimate', [
+    'version', 'name', 'rows', 'cost', 'tables', 'errors',
+])
+
+DML_KEYWORDS = ('INSERT', 'UPDATE', 'DELETE', 'SELECT', 'WITH')
+DDL_KEYWORDS = (
+    'ALTER', 'CREATE', 'DROP', 'TRUNCATE', 'VACUUM', 'CLUSTER', 'REINDEX',
+    'ANALYZE',
+)
+# keywords between a DDL command and its table name
+SKIPPED_KEYWORDS = (
+    'TABLE', 'IF', 'NOT', 'EXISTS', 'ONLY', 'FULL', 'ANALYZE', 'VERBOSE',
+    'FREEZE', 'CONCURRENTLY',
+)
+
+TABLES_QUERY = """
+SELECT t.name, c.reltuples::bigint,
+    pg_size_pretty(pg_total_relation_size(c.oid))
+FROM unnest(%s::text[]) AS t(name)
+JOIN pg_class c ON c.oid = to_regclass(t.name)
+"""
+
+
+def get_ddl_table(tokens):
+    """
+    Return the table targeted by a DDL statement, None if not found
+    """
+    # the keywords, None for the other tokens
+    words = [
+        token.value if token.kind == 'word' else None for token in tokens]
+    if words[0] == 'CREATE':
+        if 'INDEX' not in words[:4] or 'ON' not in words:
+            # new table, view, function, ...
+            return None
+        index = words.index('ON') + 1
+    elif words[0] in ('ALTER', 'DROP', 'REINDEX'):
+        if words[1:2] != ['TABLE']:
+            return None
+        index = 2
+    else:
+        index = 1
+    while index < len(tokens) and tokens[index].kind == 'word' and \
+            tokens[index].value in SKIPPED_KEYWORDS:
+        index += 1
+    if index >= len(tokens) or \
+            tokens[index].kind not in ('word', 'identifier'):
+        return None
+    names = [tokens[index].value]
+    index += 1
+    while tokens[index:index + 1] == [sql.Token('punctuation', '.')]:
+        names.append(tokens[index + 1].value)
+        index += 2
+    return '.'.join(names).lower()
+
+
+def explain_statement(cursor, statement):
+    """
+    Return the estimated rows and cost of a DML statement
+    """
+    cursor.execute('EXPLAIN (FORMAT JSON) ' + statement)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    plan = plan[0]['Plan']
+    cost = plan['Total Cost']
+    if plan['Node Type'] == 'ModifyTable' and plan.get('Plans'):
+        # INSERT, UPDATE, DELETE: the rows are estimated by the subplan
+        plan = plan['Plans'][0]
+    return plan['Plan Rows'], cost
+
+
+def explain_file(connection, version, name, path):
+    """
+    Estimate the cost of a migration file, without running it
+    """
+    rows = 0
+    cost = 0
+    tables = []
+    errors = []
+    with io.open(str(path), 'r', encoding='utf8') as f, \
+            connection.cursor() as cursor:
+        for statement in sql.iter_statements(f):
+            tokens = statement.tokens
+            statement = statement.text.strip()
+            if not tokens or tokens[0].kind != 'word':
+                continue
+            if tokens[0].value in DML_KEYWORDS:
+                try:
+                    # the errors do not abort the transaction
+                    with transaction.atomic(using=connection.alias):
+                        statement_rows, statement_cost = explain_statement(
+                            cursor, statement)
+                except DatabaseError as e:
+                    errors.append((statement, str(e).strip()))
+                    continue
+                rows += statement_rows
+                cost += statement_cost
+            elif tokens[0].value in DDL_KEYWORDS:
+                table = get_ddl_table(tokens)
+                if table is not None and table not in tables:
+                    tables.append(table)
+
+        if tables:
+            cursor.execute(TABLES_QUERY, [tables])
+            sizes = {
+                table: (reltuples if reltuples >= 0 else None, size)
+                for table, reltuples, size in cursor.fetchall()}
+            # the tables created by a pending migration are unknown
+            tables = [
+                (table,) + sizes[table] for table in tables if table in sizes]
+
+    return FileEstimate(version, name, rows, cost, tables, errors)
+
+
+def explain_migrations(connection):
+    """
+    Estimate the cost of the migrations not applied yet, with EXPLAIN
+    (no ANALYZE) for the DML statements, and the statistics of the tables
+    targeted by DDL statements.
+    Nothing is written: all runs in a transaction which is rolled back.
+    """
+    estimates = []
+    with transaction.atomic(using=connection.alias):
+        for version, name, path in get_unapplied_migration_paths(connection):
+            estimates.append(explain_file(connection, version, name, path))
+        transaction.set_rollback(True, using=connection.alias)
+    return estimates
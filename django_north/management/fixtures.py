@@ -0,0 +1,688 @@
+import io
+import json
+import re
+from collections import namedtuple
+
+from django.apps import apps
+from django.contrib.auth.management import _get_all_permissions
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections
+from django.db import DEFAULT_DB_ALIAS
+from django.db import transaction
+
+from septentrion import configuration
+from septentrion import core
+from septentrion import exceptions
+from septentrion import files
+from septentrion import utils
+
+from django_north.management import sql
+from django_north.management.commands import septentrion_settings
+from django_north.management.contenttypes import \
+    get_known_models_for_app_config
+
+
+MANIFEST_VERSION = 1
+
+# the columns a DELETE of the offline fixtures can filter on,
+# the id column being the id of the contenttype
+DELETE_COLUMNS = {
+    'django_content_type': ('id', {'app_label', 'model', 'id'}),
+    'auth_permission': (
+        'content_type_id',
+        {'app_label', 'model', 'codename', 'content_type_id'}),
+}
+
+# the columns of the INSERTs and COPYs without column names (pg_dump)
+DEFAULT_COLUMNS = {
+    'django_content_type': ['id', 'app_label', 'model'],
+    'auth_permission': ['id', 'name', 'content_type_id', 'codename'],
+}
+
+# the integer columns of the COPY data, which is only text
+INTEGER_COLUMNS = {'id', 'content_type_id'}
+
+# the escapes of the COPY text format
+COPY_ESCAPE_RE = re.compile(r'\\(x[0-9a-fA-F]{1,2}|[0-7]{1,3}|.)')
+COPY_ESCAPES = {
+    'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t', 'v': '\v'}
+
+INTEGER_TYPES = {
+    'INT', 'INTEGER', 'INT2', 'INT4', 'INT8', 'SMALLINT', 'BIGINT'}
+
+MANIFEST_QUERY = """
+SELECT m.app_label, m.model, NULL FROM (
+    SELECT * FROM unnest(%s::text[], %s::text[]) AS m(app_label, model)
+    EXCEPT
+    SELECT app_label, model FROM django_content_type
+) m
+UNION ALL
+SELECT m.app_label, m.model, m.codename FROM (
+    SELECT * FROM unnest(%s::text[], %s::text[], %s::text[])
+        AS m(app_label, model, codename)
+    EXCEPT
+    SELECT ct.app_label, ct.model, p.codename
+    FROM auth_permission p
+    JOIN django_content_type ct ON ct.id = p.content_type_id
+) m
+ORDER BY 1, 2, 3 NULLS FIRST
+"""
+
+FixturesDiff = namedtuple('FixturesDiff', [
+    'unknown_contenttypes',
+    'missing_contenttypes',
+    'missing_permissions',
+])
+
+
+def get_searched_permissions(ct, model):
+    """
+    Return all permissions that should exist for a model
+    """
+    return [
+        Permission(codename=codename, name=name, content_type=ct)
+        for codename, name in _get_all_permissions(model._meta)
+    ]
+
+
+def get_app_models(app_configs=None):
+    """
+    Return the models of each app config (all by default),
+    ignoring apps without models
+    """
+    if app_configs is None:
+        app_configs = apps.get_app_configs()
+
+    app_models = {}
+    for app_config in app_configs:
+        models = get_known_models_for_app_config(app_config)
+        if models:
+            app_models[app_config.label] = models
+    return app_models
+
+
+def compute_fixtures_diff(app_models, content_types, permissions):
+    """
+    Return the unknown contenttypes, the missing contenttypes and
+    the missing permissions, given the existing contenttypes
+    ({(app_label, model): contenttype}) and the existing permissions
+    ({(app_label, model, codename)}).
+    """
+    unknown_contenttypes = [
+        ct
+        for (app_label, model_name), ct in content_types.items()
+        if model_name not in app_models.get(app_label, {})
+    ]
+    missing_contenttypes = []
+    missing_permissions = []
+    for app_label, models in app_models.items():
+        for model_name, model in models.items():
+            ct = content_types.get((app_label, model_name))
+            if ct is None:
+                missing_contenttypes.append(
+                    ContentType(app_label=app_label, model=model_name))
+                # permissions can be created once the contenttype exists
+                continue
+            missing_permissions += [
+                perm
+                for perm in get_searched_permissions(ct, model)
+                if (app_label, model_name, perm.codename) not in permissions
+            ]
+
+    return FixturesDiff(
+        unknown_contenttypes, missing_contenttypes, missing_permissions)
+
+
+def get_fixtures_diff(app_configs=None, using=DEFAULT_DB_ALIAS):
+    """
+    Return the unknown contenttypes, the missing contenttypes and
+    the missing permissions for the given app configs (all by default).
+    Existing contenttypes and permissions are loaded in two queries.
+    """
+    app_models = get_app_models(app_configs)
+
+    # get existing contenttypes
+    content_types = {
+        (ct.app_label, ct.model): ct
+        for ct in ContentType.objects.using(using).filter(
+            app_label__in=app_models).order_by('pk')
+    }
+
+    # get existing permissions
+    permissions = set(Permission.objects.using(using).filter(
+        content_type__app_label__in=app_models,
+    ).values_list(
+        'content_type__app_label', 'content_type__model', 'codename'))
+
+    return compute_fixtures_diff(app_models, content_types, permissions)
+
+
+def get_offline_fixtures(connection):
+    """
+    Return the fixtures created by the SQL files, for a database
+    initialized with the schema and migrated to the target version:
+    the schema, the fixtures used to init the DB, and the
+    dml migrations of the next versions.
+    """
+    config = configuration.Settings(**septentrion_settings(connection))
+    schema_version = core.get_best_schema_version(settings=config)
+    paths = [
+        config.MIGRATIONS_ROOT / 'schemas' /
+        config.SCHEMA_TEMPLATE.format(schema_version.original_string)]
+    try:
+        fixtures_version = core.get_fixtures_version(
+            settings=config, target_version=schema_version)
+    except exceptions.SeptentrionException:
+        pass
+    else:
+        paths.append(
+            config.MIGRATIONS_ROOT / 'fixtures' /
+            config.FIXTURES_TEMPLATE.format(fixtures_version.original_string))
+
+    known_versions = files.get_known_versions(settings=config)
+    for version in utils.since(
+            utils.until(known_versions, config.TARGET_VERSION),
+            schema_version):
+        migrations = files.get_migrations_files_mapping(
+            settings=config, version=version)
+        paths += [
+            migrations[name] for name in sorted(migrations)
+            if name.endswith('dml.sql')]
+
+    offline_fixtures = OfflineFixtures()
+    for path in paths:
+        with io.open(str(path), 'r', encoding='utf8') as f:
+            try:
+                offline_fixtures.parse(f.read())
+            except FixturesParseError as e:
+                raise FixturesParseError("{}: {}".format(path, e)) from None
+    return offline_fixtures
+
+
+def get_offline_fixtures_diff(connection, app_configs=None):
+    """
+    Same as get_fixtures_diff, with the fixtures found in the SQL files
+    instead of the database.
+    """
+    app_models = get_app_models(app_configs)
+    offline_fixtures = get_offline_fixtures(connection)
+    content_types = {
+        (app_label, model): ContentType(app_label=app_label, model=model)
+        for app_label, model in sorted(offline_fixtures.content_types)
+        if app_label in app_models
+    }
+    return compute_fixtures_diff(
+        app_models, content_types, offline_fixtures.permissions)
+
+
+def apply_fixtures_diff(diff, using=DEFAULT_DB_ALIAS, remove_unknown=False):
+    """
+    Create the missing contenttypes and permissions (including the
+    permissions of the created contenttypes), and optionally remove the
+    unknown contenttypes, in a single transaction.
+    Return the number of removed contenttypes, created contenttypes and
+    created permissions.
+    """
+    permissions = list(diff.missing_permissions)
+    removed = 0
+    with transaction.atomic(using=using):
+        if remove_unknown and diff.unknown_contenttypes:
+            removed = len(diff.unknown_contenttypes)
+            ContentType.objects.using(using).filter(
+                pk__in=[ct.pk for ct in diff.unknown_contenttypes],
+            ).delete()
+
+        if diff.missing_contenttypes:
+            ContentType.objects.using(using).bulk_create(
+                diff.missing_contenttypes)
+            # get the ids of the created contenttypes
+            created = {
+                (ct.app_label, ct.model) for ct in diff.missing_contenttypes}
+            for ct in ContentType.objects.using(using).filter(
+                    app_label__in={app_label for app_label, _ in created},
+                    model__in={model for _, model in created}):
+                if (ct.app_label, ct.model) not in created:
+                    continue
+                model = apps.get_model(ct.app_label, ct.model)
+                permissions += get_searched_permissions(ct, model)
+
+        Permission.objects.using(using).bulk_create(permissions)
+
+    ContentType.objects.clear_cache()
+    return removed, len(diff.missing_contenttypes), len(permissions)
+
+
+def get_fixtures_manifest(app_configs=None):
+    """
+    Return the expected contenttypes and permissions of the given app
+    configs (all by default), as a JSON serializable dict:
+    {'version': 1, 'fixtures': {app_label: {model: [codename, ...]}}}
+    """
+    return {
+        'version': MANIFEST_VERSION,
+        'fixtures': {
+            app_label: {
+                model_name: sorted(
+                    codename
+                    for codename, _ in _get_all_permissions(model._meta))
+                for model_name, model in models.items()
+            }
+            for app_label, models in get_app_models(app_configs).items()
+        },
+    }
+
+
+def dump_fixtures_manifest(manifest):
+    return json.dumps(manifest, sort_keys=True, separators=(',', ':'))
+
+
+def write_fixtures_manifest(manifest, path):
+    with io.open(path, 'w', encoding='utf8') as f:
+        f.write(dump_fixtures_manifest(manifest))
+
+
+def read_fixtures_manifest(path):
+    """
+    Load a manifest written by the fixturesmanifest command
+    """
+    with io.open(path, 'r', encoding='utf8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ValueError(
+            "Unsupported fixtures manifest version: {}".format(
+                manifest.get('version')))
+    return manifest
+
+
+def get_manifest_missing_fixtures(manifest, using=DEFAULT_DB_ALIAS):
+    """
+    Return the contenttypes ([(app_label, model)]) and the permissions
+    ([(app_label, model, codename)]) of the manifest which are missing in
+    the database, in a single query and without loading the models.
+    """
+    content_types = []
+    permissions = []
+    for app_label, models in manifest['fixtures'].items():
+        for model_name, codenames in models.items():
+            content_types.append((app_label, model_name))
+            permissions += [
+                (app_label, model_name, codename) for codename in codenames]
+
+    # one array per column
+    params = [
+        [ct[0] for ct in content_types],
+        [ct[1] for ct in content_types],
+        [perm[0] for perm in permissions],
+        [perm[1] for perm in permissions],
+        [perm[2] for perm in permissions],
+    ]
+    with connections[using].cursor() as cursor:
+        cursor.execute(MANIFEST_QUERY, params)
+        rows = cursor.fetchall()
+
+    missing_contenttypes = [row[:2] for row in rows if row[2] is None]
+    missing_permissions = [row for row in rows if row[2] is not None]
+    return missing_contenttypes, missing_permissions
+
+
+class OfflineFixtures(object):
+    """
+    The contenttypes and permissions created by SQL files,
+    for a database initialized from these files.
+    """
+
+    def __init__(self):
+        # (app_label, model)
+        self.content_types = set()
+        # id: (app_label, model), for the INSERTs with an explicit id
+        self.content_type_ids = {}
+        # (app_label, model, codename)
+        self.permissions = set()
+
+    def parse(self, sql_text):
+        for statement in sql.iter_statements(sql_text.splitlines(True)):
+            tokens = statement.tokens
+            words = [token.value for token in tokens[:3]]
+            try:
+                if words[:2] == ['INSERT', 'INTO']:
+                    self.parse_insert(tokens)
+                elif words[:2] == ['DELETE', 'FROM']:
+                    self.parse_delete(tokens)
+                elif words[:1] == ['COPY']:
+                    self.parse_copy(tokens, statement.data)
+                elif words[:1] == ['TRUNCATE']:
+                    self.parse_truncate(tokens)
+                elif words[:1] == ['UPDATE']:
+                    self.parse_update(tokens)
+            except IndexError:
+                raise FixturesParseError(
+                    "Malformed statement: {}".format(
+                        statement.text.strip())) from None
+            except FixturesParseError as e:
+                raise FixturesParseError(
+                    "{}: {}".format(e, statement.text.strip())) from None
+
+    def parse_insert(self, tokens):
+        table, index = parse_table_name(tokens, 2)
+        if table not in DEFAULT_COLUMNS:
+            return
+        columns = None
+        if tokens[index].value == '(':
+            columns, index = parse_names(tokens, index)
+        try:
+            values_index = next(
+                i for i in range(index, len(tokens))
+                if tokens[i] == sql.Token('word', 'VALUES'))
+        except StopIteration:
+            return
+        rows, index = parse_rows(tokens, values_index + 1)
+        if tokens[index:index + 1] == [sql.Token('punctuation', ')')]:
+            # INSERT ... SELECT ... FROM (VALUES ...) AS v(columns)
+            index += 1
+            if tokens[index].value == 'AS':
+                index += 1
+            columns, index = parse_names(tokens, index + 1)
+        self.add_rows(table, columns, rows)
+
+    def parse_copy(self, tokens, data):
+        table, index = parse_table_name(tokens, 1)
+        if table not in DEFAULT_COLUMNS:
+            return
+        columns = None
+        if tokens[index].value == '(':
+            columns, index = parse_names(tokens, index)
+        if [token.value for token in tokens[index:]] not in (
+                ['FROM', 'STDIN'], ['FROM', 'STDIN', ';']):
+            # a file, or options such as the csv format
+            raise FixturesParseError("Unsupported COPY")
+        if columns is None:
+            columns = DEFAULT_COLUMNS[table]
+        try:
+            rows = [
+                tuple(
+                    int(value)
+                    if column in INTEGER_COLUMNS and value is not None
+                    else value
+                    for column, value in zip(columns, row))
+                for row in parse_copy_rows(data or '')]
+        except ValueError:
+            raise FixturesParseError("Malformed COPY data") from None
+        self.add_rows(table, columns, rows)
+
+    def parse_truncate(self, tokens):
+        index = 1
+        if tokens[index].value == 'TABLE':
+            index += 1
+        while True:
+            if tokens[index].value == 'ONLY':
+                index += 1
+            table, index = parse_table_name(tokens, index)
+            # the permissions of the contenttypes go with them (CASCADE)
+            if table == 'django_content_type':
+                self.delete_content_types({}, 'id')
+            elif table == 'auth_permission':
+                self.delete_permissions({}, 'id')
+            if tokens[index:index + 1] != [sql.Token('punctuation', ',')]:
+                break
+            index += 1
+
+    def parse_update(self, tokens):
+        index = 1
+        if tokens[index].value == 'ONLY':
+            index += 1
+        table, index = parse_table_name(tokens, index)
+        if table in DEFAULT_COLUMNS:
+            raise FixturesParseError("Unsupported UPDATE")
+
+    def add_rows(self, table, columns, rows):
+        if columns is None:
+            # pg_dump INSERT or COPY without column names
+            columns = DEFAULT_COLUMNS[table]
+        for row in rows:
+            values = dict(zip(columns, row))
+            if table == 'django_content_type':
+                self.add_content_type(values)
+            else:
+                self.add_permission(values)
+
+    def add_content_type(self, values):
+        key = (values.get('app_label'), values.get('model'))
+        self.content_types.add(key)
+        if values.get('id') is not None:
+            self.content_type_ids[values['id']] = key
+
+    def add_permission(self, values):
+        content_type = values.get('content_type_id')
+        if isinstance(content_type, tuple):
+            key = content_type
+        elif 'app_label' in values:
+            key = (values['app_label'], values.get('model'))
+        else:
+            key = self.content_type_ids.get(content_type)
+        if key is not None:
+            self.permissions.add(key + (values.get('codename'),))
+
+    def parse_delete(self, tokens):
+        table, index = parse_table_name(tokens, 2)
+        if table not in DELETE_COLUMNS:
+            return
+        if tokens[index:] in ([], [sql.Token('punctuation', ';')]):
+            # no WHERE: delete all
+            conditions = [{}]
+        elif tokens[index] == sql.Token('word', 'WHERE'):
+            conditions = parse_where(tokens[index + 1:])
+        else:
+            raise FixturesParseError("Unsupported DELETE")
+
+        id_column, columns = DELETE_COLUMNS[table]
+        for condition in conditions:
+            unknown = set(condition) - columns
+            if unknown:
+                raise FixturesParseError(
+                    "Unsupported DELETE condition on {}".format(
+                        ', '.join(sorted(unknown))))
+            if table == 'django_content_type':
+                self.delete_content_types(condition, id_column)
+            else:
+                self.delete_permissions(condition, id_column)
+
+    def matches(self, key, condition, id_column):
+        """
+        Return True if a contenttype or permission key matches the
+        "column = value" conditions of a DELETE
+        """
+        values = dict(zip(('app_label', 'model', 'codename'), key))
+        for column, value in condition.items():
+            if column == id_column:
+                if self.content_type_ids.get(value) != key[:2]:
+                    return False
+            elif values.get(column) != value:
+                return False
+        return True
+
+    def delete_content_types(self, condition, id_column):
+        deleted = {
+            key for key in self.content_types
+            if self.matches(key, condition, id_column)}
+        self.content_types -= deleted
+        self.content_type_ids = {
+            id: key for id, key in self.content_type_ids.items()
+            if key not in deleted}
+        # ON DELETE CASCADE
+        self.permissions = {
+            perm for perm in self.permissions if perm[:2] not in deleted}
+
+    def delete_permissions(self, condition, id_column):
+        self.permissions = {
+            perm for perm in self.permissions
+            if not self.matches(perm, condition, id_column)}
+
+
+class FixturesParseError(ValueError):
+    """
+    A statement on the fixtures tables can not be parsed
+    """
+
+
+def parse_where(tokens):
+    """
+    Return the conditions of a DELETE WHERE clause, as a list of
+    {column: value}, one per deleted key: either
+    "(column, ...) IN (VALUES ...)", or "column = value AND ...",
+    the value being a literal or a subselect on django_content_type
+    """
+    if tokens[0].value == '(':
+        columns, index = parse_names(tokens, 0)
+        if [token.value for token in tokens[index:index + 3]] != [
+                'IN', '(', 'VALUES']:
+            raise FixturesParseError("Unsupported DELETE condition")
+        rows, index = parse_rows(tokens, index + 3)
+        return [dict(zip(columns, row)) for row in rows]
+
+    for index, token in enumerate(tokens):
+        if token.kind != 'word':
+            continue
+        if token.value in ('OR', 'NOT', 'LIKE', 'ILIKE', 'SIMILAR') or (
+                token.value == 'IN' and
+                [t.value for t in tokens[index + 1:index + 3]] != [
+                    '(', 'SELECT']):
+            raise FixturesParseError("Unsupported DELETE condition")
+    conditions = get_conditions(tokens)
+    if not conditions:
+        raise FixturesParseError("Unsupported DELETE condition")
+    return [conditions]
+
+
+def parse_table_name(tokens, index):
+    """
+    Return the table name at index (without schema),
+    and the index of the next token
+    """
+    table = tokens[index].value
+    index += 1
+    while tokens[index:index + 1] == [sql.Token('punctuation', '.')]:
+        table = tokens[index + 1].value
+        index += 2
+    return table.lower(), index
+
+
+def parse_names(tokens, index):
+    """
+    Return the names in parenthesis at index,
+    and the index of the next token
+    """
+    names = []
+    index += 1
+    while tokens[index].value != ')':
+        if tokens[index].kind in ('word', 'identifier'):
+            names.append(tokens[index].value.lower())
+        index += 1
+    return names, index + 1
+
+
+def parse_rows(tokens, index):
+    """
+    Return the rows of a VALUES list starting at index,
+    and the index of the next token.
+    A subselect on django_content_type is returned as a
+    (app_label, model) tuple, the casts of the values are stripped.
+    """
+    rows = []
+    while tokens[index:index + 1] == [sql.Token('punctuation', '(')]:
+        row = []
+        index += 1
+        while tokens[index].value != ')':
+            token = tokens[index]
+            if token.value == ',':
+                index += 1
+                continue
+            if token.value == ':':
+                # 'value'::type
+                type_name, index = parse_cast(tokens, index)
+                if type_name in INTEGER_TYPES and isinstance(row[-1], str) \
+                        and row[-1].isdigit():
+                    row[-1] = int(row[-1])
+                continue
+            if token.value == '(':
+                # subselect
+                depth = 0
+                start = index
+                while True:
+                    depth += {'(': 1, ')': -1}.get(tokens[index].value, 0)
+                    index += 1
+                    if depth == 0:
+                        break
+                conditions = get_conditions(tokens[start:index])
+                row.append((conditions.get('app_label'),
+                            conditions.get('model')))
+                continue
+            if token.kind == 'string':
+                row.append(token.value)
+            elif token.kind == 'number':
+                row.append(int(token.value) if token.value.isdigit()
+                           else token.value)
+            elif token.kind == 'word':
+                row.append(None if token.value == 'NULL' else token.value)
+            index += 1
+        rows.append(tuple(row))
+        index += 1
+        if tokens[index:index + 1] == [sql.Token('punctuation', ',')]:
+            index += 1
+    return rows, index
+
+
+def parse_cast(tokens, index):
+    """
+    Return the upper cased type of the "::type" cast at index,
+    and the index of the next token
+    """
+    if tokens[index + 1].value != ':':
+        raise FixturesParseError("Unsupported value")
+    index += 2
+    type_name, index = parse_table_name(tokens, index)
+    # varchar(100), integer[], character varying
+    depth = 0
+    while depth or tokens[index].value not in (',', ')'):
+        depth += {'(': 1, ')': -1}.get(tokens[index].value, 0)
+        index += 1
+    return type_name.upper(), index
+
+
+def parse_copy_rows(data):
+    """
+    Return the rows of the data of a COPY ... FROM STDIN,
+    in the text format: tab separated, \\N being NULL
+    """
+    rows = []
+    for line in data.splitlines():
+        rows.append(tuple(
+            None if value == '\\N' else COPY_ESCAPE_RE.sub(unescape, value)
+            for value in line.split('\t')))
+    return rows
+
+
+def unescape(match):
+    escape = match.group(1)
+    if escape[0] == 'x':
+        return chr(int(escape[1:], 16))
+    if escape[0].isdigit():
+        return chr(int(escape, 8))
+    return COPY_ESCAPES.get(escape, escape)
+
+
+def get_conditions(tokens):
+    """
+    Return the "column = 'value'" and "column = number" conditions found
+    in the tokens
+    """
+    conditions = {}
+    for column, operator, value in zip(tokens, tokens[1:], tokens[2:]):
+        if column.kind not in ('word', 'identifier') or \
+                operator.value != '=':
+            continue
+        if value.kind == 'string':
+            conditions[column.value.lower()] = value.value
+        elif value.kind == 'number' and value.value.isdigit():
+            conditions[column.value.lower()] = int(value.value)
+    return conditions
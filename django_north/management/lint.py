@@ -0,0 +1,268 @@
+import io
+import json
+from collections import namedtuple
+
+from django_north.management import sql
+from django_north.management.explain import get_ddl_table
+
+STATS_VERSION = 1
+
+# rule: (description, lock, rewrite)
+# rewrite: the table is rewritten (with its indexes), else it is scanned
+RULES = {
+    'create-index': (
+        "CREATE INDEX without CONCURRENTLY", 'SHARE', False),
+    'reindex': (
+        "REINDEX without CONCURRENTLY", 'SHARE', False),
+    'add-column-default': (
+        "ADD COLUMN with a DEFAULT", 'ACCESS EXCLUSIVE', True),
+    'alter-column-type': (
+        "ALTER COLUMN TYPE", 'ACCESS EXCLUSIVE', True),
+    'set-not-null': (
+        "SET NOT NULL", 'ACCESS EXCLUSIVE', False),
+    'add-foreign-key': (
+        "ADD FOREIGN KEY without NOT VALID", 'SHARE ROW EXCLUSIVE', False),
+    'add-check': (
+        "ADD CHECK without NOT VALID", 'ACCESS EXCLUSIVE', False),
+    'add-unique': (
+        "ADD PRIMARY KEY or UNIQUE without USING INDEX", 'ACCESS EXCLUSIVE',
+        False),
+    'set-storage': (
+        "SET TABLESPACE, LOGGED or UNLOGGED", 'ACCESS EXCLUSIVE', True),
+    'vacuum-full': (
+        "VACUUM FULL", 'ACCESS EXCLUSIVE', True),
+    'cluster': (
+        "CLUSTER", 'ACCESS EXCLUSIVE', True),
+}
+
+# a rewrite copies the table and rebuilds its indexes
+REWRITE_FACTOR = 3
+
+# a DEFAULT calling these functions rewrites the table on any server
+VOLATILE_FUNCTIONS = (
+    'RANDOM', 'CLOCK_TIMESTAMP', 'TIMEOFDAY', 'NEXTVAL', 'GEN_RANDOM_UUID',
+    'UUID_GENERATE_V1', 'UUID_GENERATE_V4',
+)
+
+# a serial column has a nextval() default
+SERIAL_TYPES = ('SERIAL', 'BIGSERIAL', 'SMALLSERIAL')
+
+# size: bytes of the table and its indexes, None without statistics
+# seconds: estimated blocking time, None without statistics
+Finding = namedtuple('Finding', [
+    'name', 'statement', 'table', 'rule', 'size', 'seconds',
+])
+
+STATS_QUERY = """
+SELECT c.relname, c.reltuples::bigint, pg_total_relation_size(c.oid)
+FROM pg_class c
+WHERE c.relkind IN ('r', 'p') AND pg_table_is_visible(c.oid)
+"""
+
+
+def get_table_stats(connection):
+    """
+    Return a snapshot of the table sizes of the database, in one query
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(STATS_QUERY)
+        tables = {
+            name: {'rows': max(reltuples, 0), 'bytes': size}
+            for name, reltuples, size in cursor.fetchall()
+        }
+    return {'version': STATS_VERSION, 'tables': tables}
+
+
+def write_table_stats(stats, path):
+    with io.open(path, 'w', encoding='utf8') as f:
+        f.write(json.dumps(stats, indent=2, sort_keys=True))
+
+
+def read_table_stats(path):
+    """
+    Return the table sizes of a snapshot: {table: bytes}
+    """
+    with io.open(path, 'r', encoding='utf8') as f:
+        stats = json.load(f)
+    if stats.get('version') != STATS_VERSION:
+        raise ValueError(
+            "Unsupported stats version: {}".format(stats.get('version')))
+    return {
+        name: table['bytes'] for name, table in stats['tables'].items()}
+
+
+def split_actions(tokens):
+    """
+    Split the actions of an ALTER TABLE statement, on the commas outside
+    of parentheses
+    """
+    actions = [[]]
+    depth = 0
+    for token in tokens:
+        if token == sql.Token('punctuation', '('):
+            depth += 1
+        elif token == sql.Token('punctuation', ')'):
+            depth -= 1
+        elif token == sql.Token('punctuation', ',') and depth == 0:
+            actions.append([])
+            continue
+        actions[-1].append(token)
+    return [action for action in actions if action]
+
+
+def classify_action(words, server_version):
+    """
+    Return the rule matched by an ALTER TABLE action, None if the action
+    is fast
+    """
+    if words[:1] == ['ALTER']:
+        if 'TYPE' in words:
+            return 'alter-column-type'
+        if words[-3:] == ['SET', 'NOT', 'NULL']:
+            return 'set-not-null'
+    elif words[:1] == ['ADD']:
+        not_valid = 'NOT' in words and 'VALID' in words
+        if 'FOREIGN' in words or 'REFERENCES' in words:
+            return None if not_valid else 'add-foreign-key'
+        if 'CHECK' in words:
+            return None if not_valid else 'add-check'
+        if ('PRIMARY' in words or 'UNIQUE' in words) and \
+                'USING' not in words:
+            return 'add-unique'
+        if any(word in SERIAL_TYPES for word in words):
+            return 'add-column-default'
+        if 'DEFAULT' in words:
+            default = words[words.index('DEFAULT') + 1:]
+            # metadata only since PostgreSQL 11, for a non volatile default
+            if server_version is None or server_version < 110000 or \
+                    any(word in VOLATILE_FUNCTIONS for word in default):
+                return 'add-column-default'
+    elif words[:2] in (['SET', 'TABLESPACE'], ['SET', 'LOGGED'],
+                       ['SET', 'UNLOGGED']):
+        return 'set-storage'
+    return None
+
+
+def classify_statement(tokens, server_version=None):
+    """
+    Return the rules matched by a statement, as [(table, rule)].
+    server_version: PostgreSQL version number (110000 for 11),
+    None if unknown: the oldest behaviour is assumed.
+    """
+    words = [token.value for token in tokens if token.kind == 'word']
+    if not words:
+        return []
+    table = get_ddl_table(tokens)
+    if words[0] == 'CREATE' and 'INDEX' in words[:3]:
+        if 'CONCURRENTLY' not in words[:4]:
+            return [(table, 'create-index')]
+    elif words[0] == 'REINDEX':
+        if 'CONCURRENTLY' not in words[:4]:
+            return [(table, 'reindex')]
+    elif words[0] == 'VACUUM':
+        if 'FULL' in words[:3]:
+            return [(table, 'vacuum-full')]
+    elif words[0] == 'CLUSTER':
+        return [(table, 'cluster')]
+    elif words[:2] == ['ALTER', 'TABLE'] and table is not None:
+        # skip ALTER TABLE [IF EXISTS] [ONLY] name
+        start = 2
+        while tokens[start].kind == 'word' and \
+                tokens[start].value in ('IF', 'EXISTS', 'ONLY'):
+            start += 1
+        start += 1
+        while tokens[start:start + 1] == [sql.Token('punctuation', '.')]:
+            start += 2
+        rules = []
+        for action in split_actions(tokens[start:]):
+            rule = classify_action(
+                [token.value for token in action if token.kind == 'word'],
+                server_version)
+            if rule is not None and rule not in rules:
+                rules.append(rule)
+        return [(table, rule) for rule in rules]
+    return []
+
+
+def get_table_size(table, sizes):
+    if table is None:
+        return None
+    if table in sizes:
+        return sizes[table]
+    # schema qualified name
+    return sizes.get(table.rsplit('.', 1)[-1])
+
+
+def lint_file(name, path, sizes=None, server_version=None, throughput=None):
+    """
+    Return the findings of a migration file.
+    sizes: {table: bytes}, to estimate the blocking time with the
+    throughput (bytes per second)
+    """
+    findings = []
+    with io.open(str(path), 'r', encoding='utf8') as f:
+        for statement in sql.iter_statements(f):
+            for table, rule in classify_statement(
+                    statement.tokens, server_version):
+                size = get_table_size(table, sizes or {})
+                seconds = None
+                if size is not None and throughput:
+                    factor = REWRITE_FACTOR if RULES[rule][2] else 1
+                    seconds = size * factor / throughput
+                findings.append(Finding(
+                    name, statement.text.strip(), table, rule, size,
+                    seconds))
+    return findings
+
+
+def format_size(size):
+    for unit in ('bytes', 'kB', 'MB', 'GB'):
+        if size < 1024:
+            break
+        size /= 1024.
+    else:
+        unit = 'TB'
+    if unit == 'bytes':
+        return '{} bytes'.format(int(size))
+    return '{:.1f} {}'.format(size, unit)
+
+
+def format_finding(finding):
+    description, lock, rewrite = RULES[finding.rule]
+    line = "{}: {}".format(finding.name, description)
+    if finding.table is not None:
+        line += " on {}".format(finding.table)
+    line += ": {} lock, {} the table".format(
+        lock, 'rewrites' if rewrite else 'scans')
+    if finding.size is not None:
+        line += ", {}".format(format_size(finding.size))
+    if finding.seconds is not None:
+        line += ", ~{:.0f}s".format(finding.seconds)
+    return line
+
+
+def rank_findings(findings):
+    """
+    Sort the findings by expected blocking time: the estimated seconds,
+    then the rewrites before the scans, then the files order
+    """
+    def key(item):
+        index, finding = item
+        return (
+            -(finding.seconds or 0), not RULES[finding.rule][2], index)
+
+    return [finding for index, finding in sorted(
+        enumerate(findings), key=key)]
+
+
+def lint_migrations(paths, sizes=None, server_version=None, throughput=None):
+    """
+    Return the ranked findings of the migration files, paths being a list
+    of (name, path)
+    """
+    findings = []
+    for name, path in paths:
+        findings += lint_file(
+            name, path, sizes=sizes, server_version=server_version,
+            throughput=throughput)
+    return rank_findings(findings)
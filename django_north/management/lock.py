@@ -0,0 +1,124 @@
+import hashlib
+import logging
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.db.utils import ProgrammingError
+
+from septentrion import configuration
+from septentrion import files
+from septentrion import utils
+
+from django_north.management.commands import septentrion_settings
+
+logger = logging.getLogger(__name__)
+
+# key of the advisory lock taken by migrate, the locks are per database
+MIGRATE_LOCK_ID = int.from_bytes(
+    hashlib.sha256(b'django_north.migrate').digest()[:8], 'big',
+    signed=True)
+
+FINGERPRINT_CREATE = """
+CREATE TABLE IF NOT EXISTS north_migrate_fingerprint (
+    fingerprint varchar(64) NOT NULL,
+    target_version varchar(255) NOT NULL,
+    migrated timestamp with time zone NOT NULL DEFAULT now()
+);
+"""
+
+FINGERPRINT_STORE = """
+DELETE FROM north_migrate_fingerprint;
+INSERT INTO north_migrate_fingerprint (fingerprint, target_version)
+VALUES (%s, %s);
+"""
+
+
+def get_migrations_fingerprint(connection):
+    """
+    Return a hash of the target version and of the migrations up to the
+    target version, computed from the migration files only
+    """
+    septentrion_config = configuration.Settings(
+        **septentrion_settings(connection))
+    known_versions = files.get_known_versions(settings=septentrion_config)
+    fingerprint = hashlib.sha256(
+        septentrion_config.TARGET_VERSION.original_string.encode())
+    for version in utils.until(
+            known_versions, septentrion_config.TARGET_VERSION):
+        migrations = files.get_migrations_files_mapping(
+            settings=septentrion_config, version=version)
+        for name in sorted(migrations):
+            fingerprint.update('\n{}/{}'.format(
+                version.original_string, name).encode())
+    return fingerprint.hexdigest()
+
+
+def get_stored_fingerprint(connection):
+    """
+    Return the fingerprint stored by the last migrate, None if the
+    database was never migrated with the lock
+    """
+    try:
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT fingerprint FROM north_migrate_fingerprint;")
+                row = cursor.fetchone()
+    except ProgrammingError:
+        # table does not exist
+        return None
+    return row[0] if row else None
+
+
+def store_fingerprint(connection, fingerprint):
+    target_version = septentrion_settings(connection)['target_version']
+    with transaction.atomic(using=connection.alias):
+        with connection.cursor() as cursor:
+            cursor.execute(FINGERPRINT_CREATE)
+            cursor.execute(FINGERPRINT_STORE, [fingerprint, target_version])
+
+
+@contextmanager
+def advisory_lock(connection, lock_id=MIGRATE_LOCK_ID):
+    """
+    Hold a session advisory lock on the Django connection, waiting for
+    the other sessions holding it
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_lock(%s);", [lock_id])
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s);", [lock_id])
+
+
+@contextmanager
+def migrate_lock(connection):
+    """
+    Serialize the concurrent migrate calls on a database, if the
+    NORTH_MIGRATE_LOCK setting is enabled.
+    Yield True if the migrations must be run, False if the database is
+    already migrated, by this call or by another one: only the first
+    caller runs septentrion, the other ones wait for it and skip the
+    migrations.
+    """
+    if getattr(settings, 'NORTH_MIGRATE_LOCK', False) is not True:
+        yield True
+        return
+
+    fingerprint = get_migrations_fingerprint(connection)
+    if get_stored_fingerprint(connection) == fingerprint:
+        logger.info('Database already migrated')
+        yield False
+        return
+
+    with advisory_lock(connection):
+        # another caller may have migrated while we were waiting
+        if get_stored_fingerprint(connection) == fingerprint:
+            logger.info('Database migrated by another process')
+            yield False
+            return
+        yield True
+        store_fingerprint(connection, fingerprint)
@@ -3,16 +3,104 @@ from distutils.version import StrictVersion
 from importlib import import_module
 
 from django.conf import settings
+from django.db import transaction
 from django.db.migrations.recorder import MigrationRecorder
 from django.db.utils import ProgrammingError
 
 import septentrion
+from septentrion import configuration
+from septentrion import files
+from septentrion import utils
+from septentrion import versions
+
+from django_north.management import restore
+from django_north.management.commands import septentrion_settings
 
 
 fixtures_default_tpl = 'fixtures_{}.sql'
 schema_default_tpl = 'schema_{}.sql'
 
 
+LEDGER_TABLE = 'north_version_ledger'
+
+# one row per applied version:
+# sort_key: the numeric parts of the version, to sort the versions in SQL
+# applied: names of the applied migrations of the version, compared
+# with the migration files when the ledger is read
+# migration_id: greatest id of django_migrations when the ledger was
+# refreshed, to detect the migrations recorded since then
+# the ledger is rebuilt by each refresh: its table is recreated too
+LEDGER_CREATE = """
+DROP TABLE IF EXISTS north_version_ledger;
+CREATE TABLE north_version_ledger (
+    version varchar(255) PRIMARY KEY,
+    sort_key integer[] NOT NULL,
+    applied text[] NOT NULL,
+    migration_id integer NOT NULL
+);
+CREATE INDEX north_version_ledger_sort_key
+    ON north_version_ledger (sort_key, version);
+"""
+
+# rebuild the ledger from django_migrations in one aggregate query,
+# the migrations of a compacted version are read from the archive
+LEDGER_REFRESH = """
+WITH applied AS (
+    SELECT app, name FROM django_migrations WHERE name <> %(marker)s
+    UNION
+    SELECT a.app, a.name
+    FROM north_migrations_archive a
+    JOIN django_migrations m ON m.app = a.app AND m.name = %(marker)s
+)
+INSERT INTO north_version_ledger
+    (version, sort_key, applied, migration_id)
+SELECT v.version, v.sort_key::integer[],
+    array_agg(applied.name ORDER BY applied.name),
+    (SELECT max(id) FROM django_migrations)
+FROM unnest(%(versions)s::text[], %(sort_keys)s::text[])
+    AS v(version, sort_key)
+JOIN applied ON applied.app = v.version
+GROUP BY v.version, v.sort_key;
+"""
+
+# the ledger is stale if migrations were recorded since its refresh,
+# by septentrion without NORTH_MANAGE_DB for instance
+LEDGER_STALE = """
+SELECT (SELECT max(id) FROM django_migrations)
+    IS DISTINCT FROM (SELECT max(migration_id) FROM north_version_ledger);
+"""
+
+# name of the migration replacing all the migrations of a compacted version
+COMPACTED_MIGRATION = '__compacted__'
+
+ARCHIVE_CREATE = """
+CREATE TABLE IF NOT EXISTS north_migrations_archive (
+    id serial PRIMARY KEY,
+    app varchar(255) NOT NULL,
+    name varchar(255) NOT NULL,
+    applied timestamp with time zone NOT NULL
+);
+"""
+
+# move the rows of the versions to the archive, and replace them by one
+# marker per version, in one statement
+COMPACT_HISTORY = """
+WITH moved AS (
+    DELETE FROM django_migrations WHERE app = ANY(%s)
+    RETURNING app, name, applied
+), archived AS (
+    INSERT INTO north_migrations_archive (app, name, applied)
+    SELECT app, name, applied FROM moved
+)
+INSERT INTO django_migrations (app, name, applied)
+SELECT app, %s, max(applied) FROM moved GROUP BY app;
+"""
+
+ARCHIVED_MIGRATIONS = """
+SELECT name FROM north_migrations_archive WHERE app = %s;
+"""
+
+
 class DBException(Exception):
     pass
 
@@ -35,11 +123,74 @@ def list_files(root):
             if os.path.isfile(os.path.join(root, d))]
 
 
+def is_ledger_enabled():
+    return getattr(settings, 'NORTH_LEDGER', False) is True
+
+
+def refresh_ledger(connection):
+    """
+    Create the ledger table, and build it from the django_migrations
+    table
+    """
+    septentrion_config = configuration.Settings(
+        **septentrion_settings(connection))
+    names, sort_keys = [], []
+    for version in files.get_known_versions(settings=septentrion_config):
+        names.append(version.original_string)
+        sort_keys.append('{{{}}}'.format(
+            ','.join(str(part) for part in version.version_tuple)))
+
+    with transaction.atomic(using=connection.alias):
+        with connection.cursor() as cursor:
+            cursor.execute(LEDGER_CREATE)
+            cursor.execute(ARCHIVE_CREATE)
+            cursor.execute(LEDGER_REFRESH, {
+                'marker': COMPACTED_MIGRATION, 'versions': names,
+                'sort_keys': sort_keys})
+
+
+def query_ledger(connection, query, params=()):
+    """
+    Return the rows of a query on the ledger, None if the ledger is
+    disabled, does not exist, or is stale
+    """
+    if not is_ledger_enabled():
+        return None
+    try:
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(LEDGER_STALE)
+                if cursor.fetchone()[0]:
+                    return None
+                cursor.execute(query, params)
+                return cursor.fetchall()
+    except ProgrammingError:
+        # table does not exist
+        return None
+
+
+def is_complete(septentrion_config, version, applied):
+    """
+    Return True if all the migration files of the version are in the
+    applied names
+    """
+    migrations = files.get_migrations_files_mapping(
+        settings=septentrion_config,
+        version=versions.Version.from_string(version))
+    return set(migrations) <= set(applied)
+
+
 def get_applied_versions(connection):
     """
     Return the list of applied versions.
-    Reuse django migration table.
+    Read the ledger if enabled, else reuse django migration table.
     """
+    rows = query_ledger(
+        connection,
+        "SELECT version FROM north_version_ledger ORDER BY sort_key;")
+    if rows is not None:
+        return [row[0] for row in rows]
+
     recorder = MigrationRecorder(connection)
     applied_versions = list(recorder.migration_qs.filter(
         app__in=septentrion.get_known_versions(
@@ -97,6 +248,58 @@ def get_current_version_from_table(connection):
     return versions[-1]
 
 
+def get_current_version_from_ledger(connection):
+    """
+    Return the current version of the database, from the ledger: the
+    greatest version with all its migrations applied.
+    Compare the django migration table with the migration files if the
+    ledger is not available.
+    Return None if no version is fully applied.
+    """
+    rows = query_ledger(
+        connection,
+        "SELECT version, applied FROM north_version_ledger "
+        "ORDER BY sort_key DESC;")
+    if rows is None:
+        for version in reversed(get_applied_versions(connection)):
+            if is_version_applied(version, connection):
+                return version
+        return None
+
+    septentrion_config = configuration.Settings(
+        **septentrion_settings(connection))
+    known_versions = {
+        version.original_string
+        for version in files.get_known_versions(settings=septentrion_config)
+    }
+    for version, applied in rows:
+        if version in known_versions and \
+                is_complete(septentrion_config, version, applied):
+            return version
+    return None
+
+
+def is_version_applied(version, connection):
+    """
+    Return True if all the migrations of the version are applied.
+    Read the ledger if enabled, else compare the django migration table
+    with the migration files.
+    """
+    septentrion_config = configuration.Settings(
+        **septentrion_settings(connection))
+    rows = query_ledger(
+        connection,
+        "SELECT applied FROM north_version_ledger WHERE version = %s;",
+        [version])
+    if rows is not None:
+        return bool(rows) and is_complete(
+            septentrion_config, version, rows[0][0])
+
+    return is_complete(
+        septentrion_config, version,
+        get_applied_migrations(version, connection))
+
+
 def get_current_version_from_comment(connection):
     """
     Return the current version of the database, from django_site comment.
@@ -126,8 +329,119 @@ def get_current_version_from_comment(connection):
 def get_applied_migrations(version, connection):
     """
     Return the list of applied migrations for the given version.
-    Reuse django migration table.
+    Reuse django migration table, and the archive for a compacted version.
     """
     recorder = MigrationRecorder(connection)
-    return list(recorder.migration_qs.filter(app=version).values_list(
+    names = list(recorder.migration_qs.filter(app=version).values_list(
         'name', flat=True))
+    if COMPACTED_MIGRATION not in names:
+        return names
+    with connection.cursor() as cursor:
+        cursor.execute(ARCHIVED_MIGRATIONS, [version])
+        archived = [row[0] for row in cursor.fetchall()]
+    return expand_compacted_migrations(names, archived)
+
+
+def expand_compacted_migrations(names, archived):
+    """
+    Replace the marker of a compacted version by the names of its archived
+    migrations: a migration added to the version after the compaction is
+    not applied
+    """
+    if COMPACTED_MIGRATION not in names:
+        return names
+    return sorted(set(archived) | set(names) - {COMPACTED_MIGRATION})
+
+
+def compact_history(connection, before):
+    """
+    Replace the rows of the fully applied versions lower than before, in
+    the django_migrations table, by one marker per version.
+    The original rows are moved to the north_migrations_archive table.
+    Return the compacted versions.
+    """
+    septentrion_config = configuration.Settings(
+        **septentrion_settings(connection))
+    before = versions.Version.from_string(before)
+    known_versions = [
+        version
+        for version in files.get_known_versions(settings=septentrion_config)
+        if version < before
+    ]
+
+    recorder = MigrationRecorder(connection)
+    applied_migrations = {}
+    for app, name in recorder.migration_qs.filter(
+            app__in=[version.original_string for version in known_versions],
+    ).values_list('app', 'name'):
+        applied_migrations.setdefault(app, set()).add(name)
+
+    compacted = []
+    for version in known_versions:
+        names = applied_migrations.get(version.original_string, set())
+        if not names or COMPACTED_MIGRATION in names:
+            # not applied, or already compacted
+            continue
+        migrations = files.get_migrations_files_mapping(
+            settings=septentrion_config, version=version)
+        if set(migrations) <= names:
+            compacted.append(version.original_string)
+
+    if compacted:
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(ARCHIVE_CREATE)
+                cursor.execute(
+                    COMPACT_HISTORY, [compacted, COMPACTED_MIGRATION])
+    return compacted
+
+
+def get_unapplied_migrations(connection):
+    """
+    Return the list of (version, migration name) not applied yet,
+    from the version used to init the DB to the target version.
+    Reuse django migration table, in a single query.
+    """
+    return [
+        (version, name)
+        for version, name, path in get_unapplied_migration_paths(connection)
+    ]
+
+
+def get_unapplied_migration_paths(connection):
+    """
+    Same as get_unapplied_migrations, with the path of each migration:
+    return a list of (version, migration name, path).
+    """
+    septentrion_config = configuration.Settings(
+        **septentrion_settings(connection))
+    # the version a DB is initialized with, from a pg_dump archive or not
+    schema_version = restore.get_best_schema_version(septentrion_config)
+    known_versions = files.get_known_versions(settings=septentrion_config)
+    versions = list(utils.since(
+        utils.until(known_versions, septentrion_config.TARGET_VERSION),
+        schema_version))
+
+    recorder = MigrationRecorder(connection)
+    applied_migrations = set(recorder.migration_qs.filter(
+        app__in=[version.original_string for version in versions],
+    ).values_list('app', 'name'))
+    compacted = [
+        app for app, name in applied_migrations if name == COMPACTED_MIGRATION]
+    if compacted:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT app, name FROM north_migrations_archive "
+                "WHERE app = ANY(%s);", [compacted])
+            applied_migrations.update(cursor.fetchall())
+
+    unapplied_migrations = []
+    for version in versions:
+        migrations = files.get_migrations_files_mapping(
+            settings=septentrion_config, version=version)
+        unapplied_migrations += [
+            (version.original_string, name, migrations[name])
+            for name in sorted(migrations)
+            if (version.original_string, name) not in applied_migrations
+        ]
+    return unapplied_migrations
@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+from django.db import DEFAULT_DB_ALIAS
+
+# {using: {(app_label, model, codename): permission}}
+_permission_cache = {}
+
+
+def prewarm_contenttypes(using=DEFAULT_DB_ALIAS):
+    """
+    Load all the contenttypes in the ContentType manager cache,
+    in one query
+    """
+    for ct in ContentType.objects.using(using).all():
+        ContentType.objects._add_to_cache(using, ct)
+
+
+def prewarm_permissions(using=DEFAULT_DB_ALIAS):
+    """
+    Load all the permissions in the permission lookup table, in one query
+    """
+    _permission_cache[using] = {
+        (perm.content_type.app_label, perm.content_type.model,
+         perm.codename): perm
+        for perm in Permission.objects.using(using).select_related(
+            'content_type')
+    }
+
+
+def clear_permission_cache(using=None):
+    """
+    Clear the permission lookup table of a database (all by default)
+    """
+    if using is None:
+        _permission_cache.clear()
+    else:
+        _permission_cache.pop(using, None)
+
+
+def get_permission(app_label, model, codename, using=DEFAULT_DB_ALIAS):
+    """
+    Return a permission, from the permission lookup table if possible
+    """
+    cache = _permission_cache.setdefault(using, {})
+    key = (app_label, model, codename)
+    try:
+        return cache[key]
+    except KeyError:
+        perm = Permission.objects.using(using).select_related(
+            'content_type').get(
+            content_type__app_label=app_label, content_type__model=model,
+            codename=codename)
+        cache[key] = perm
+        return perm
+
+
+def prewarm_caches(using=DEFAULT_DB_ALIAS):
+    """
+    Reset the contenttype and permission caches of a database, and load
+    them if NORTH_PREWARM_CONTENTTYPES and NORTH_PREWARM_PERMISSIONS
+    are enabled
+    """
+    ContentType.objects.clear_cache()
+    clear_permission_cache(using)
+    if getattr(settings, 'NORTH_PREWARM_CONTENTTYPES', False) is True:
+        prewarm_contenttypes(using)
+    if getattr(settings, 'NORTH_PREWARM_PERMISSIONS', False) is True:
+        prewarm_permissions(using)
@@ -0,0 +1,289 @@
+import datetime
+import logging
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.db import connections
+from django.db import DatabaseError
+
+from septentrion import runner
+
+from django_north.management.connection import patch_environ
+
+logger = logging.getLogger(__name__)
+
+# application_name of the sessions opened by septentrion and psql, when not
+# set in the connection OPTIONS
+APPLICATION_NAME = 'django_north'
+
+# duration: seconds since the start of the query
+# command, phase, done, total, unit: from the pg_stat_progress_* views,
+# None if the statement does not report its progress
+Activity = namedtuple('Activity', [
+    'pid', 'duration', 'wait_event_type', 'wait_event', 'query',
+    'command', 'phase', 'done', 'total', 'unit',
+])
+
+# pg_stat_progress_create_index and pg_stat_progress_cluster: PostgreSQL 12+,
+# see get_activity_query
+ACTIVITY_QUERY = """
+SELECT a.pid, extract(epoch FROM now() - a.query_start)::float,
+    a.wait_event_type, a.wait_event, a.query,
+    COALESCE(i.command, c.command,
+             CASE WHEN v.pid IS NOT NULL THEN 'VACUUM' END),
+    COALESCE(i.phase, c.phase, v.phase),
+    CASE
+        WHEN i.blocks_total > 0 THEN i.blocks_done
+        WHEN i.pid IS NOT NULL THEN i.tuples_done
+        WHEN c.heap_blks_total > 0 THEN c.heap_blks_scanned
+        WHEN c.pid IS NOT NULL THEN c.heap_tuples_scanned
+        ELSE v.heap_blks_scanned
+    END,
+    CASE
+        WHEN i.blocks_total > 0 THEN i.blocks_total
+        WHEN i.pid IS NOT NULL THEN NULLIF(i.tuples_total, 0)
+        WHEN c.heap_blks_total > 0 THEN c.heap_blks_total
+        ELSE v.heap_blks_total
+    END,
+    CASE
+        WHEN i.blocks_total > 0 OR c.heap_blks_total > 0
+            OR v.pid IS NOT NULL THEN 'blocks'
+        WHEN i.pid IS NOT NULL OR c.pid IS NOT NULL THEN 'tuples'
+    END
+FROM pg_stat_activity a
+LEFT JOIN pg_stat_progress_create_index i ON i.pid = a.pid
+LEFT JOIN pg_stat_progress_cluster c ON c.pid = a.pid
+LEFT JOIN pg_stat_progress_vacuum v ON v.pid = a.pid
+WHERE a.state = 'active' AND a.pid <> pg_backend_pid()
+    AND (a.pid = ANY(%s) OR a.application_name = %s)
+ORDER BY a.pid
+"""
+
+# the wait events and pg_stat_progress_vacuum: PostgreSQL 9.6+
+VACUUM_ACTIVITY_QUERY = """
+SELECT a.pid, extract(epoch FROM now() - a.query_start)::float,
+    a.wait_event_type, a.wait_event, a.query,
+    CASE WHEN v.pid IS NOT NULL THEN 'VACUUM' END,
+    v.phase, v.heap_blks_scanned, v.heap_blks_total,
+    CASE WHEN v.pid IS NOT NULL THEN 'blocks' END
+FROM pg_stat_activity a
+LEFT JOIN pg_stat_progress_vacuum v ON v.pid = a.pid
+WHERE a.state = 'active' AND a.pid <> pg_backend_pid()
+    AND (a.pid = ANY(%s) OR a.application_name = %s)
+ORDER BY a.pid
+"""
+
+# command tags printed by psql for the write operations
+ROW_COUNT_RE = re.compile(r'^(?:INSERT \d+|UPDATE|DELETE) (\d+)$')
+
+
+def get_application_name(connection):
+    options = connection.settings_dict.get('OPTIONS', {})
+    return options.get('application_name') or \
+        os.environ.get('PGAPPNAME') or APPLICATION_NAME
+
+
+def get_activity_query(pg_version):
+    """
+    Return the activity query for a server version (connection.pg_version),
+    None before PostgreSQL 9.6
+    """
+    if pg_version >= 120000:
+        return ACTIVITY_QUERY
+    if pg_version >= 90600:
+        return VACUUM_ACTIVITY_QUERY
+    return None
+
+
+def get_activity(cursor, pids, application_name, query=ACTIVITY_QUERY):
+    """
+    Return the active statements of the migration sessions: the given
+    backend pids, and the sessions with the application_name
+    """
+    cursor.execute(query, [list(pids), application_name])
+    return [Activity(*row) for row in cursor.fetchall()]
+
+
+def format_duration(seconds):
+    return str(datetime.timedelta(seconds=int(seconds)))
+
+
+def format_query(query, length=60):
+    query = ' '.join(query.split())
+    if len(query) > length:
+        query = query[:length - 3] + '...'
+    return query
+
+
+def format_activity(activity, rate=None):
+    """
+    Return a progress line for an active statement. The rate (units per
+    second) gives the throughput and the ETA.
+    """
+    prefix = "[pid {}] ".format(activity.pid)
+    if activity.command is None:
+        line = prefix + "running for {}".format(
+            format_duration(activity.duration))
+        if activity.wait_event_type:
+            line += ", waiting for {}:{}".format(
+                activity.wait_event_type, activity.wait_event)
+        return line + ": " + format_query(activity.query)
+
+    line = prefix + "{}, {}: {}".format(
+        activity.command, activity.phase, activity.done)
+    if activity.total:
+        line += "/{} {} ({:.0%})".format(
+            activity.total, activity.unit, activity.done / activity.total)
+    else:
+        line += " {}".format(activity.unit)
+    if rate:
+        line += ", {:.0f} {}/s".format(rate, activity.unit)
+        if activity.total:
+            line += ", ETA {}".format(format_duration(
+                max(activity.total - activity.done, 0) / rate))
+    if activity.wait_event_type == 'Lock':
+        line += ", waiting for {}:{}".format(
+            activity.wait_event_type, activity.wait_event)
+    return line
+
+
+def get_row_count(output):
+    """
+    Return the number of rows written by a psql run, from its output
+    """
+    return sum(
+        int(match.group(1))
+        for match in map(ROW_COUNT_RE.match, output.splitlines()) if match)
+
+
+class ProgressReporter(object):
+    """
+    Poll the progress of the migration statements on a side connection
+    """
+
+    def __init__(self, connection, write, interval=5):
+        # the connection wrapper, not the default connection proxy
+        self.connection = connections[connection.alias]
+        self.write = write
+        self.interval = interval
+        self.application_name = get_application_name(connection)
+        # set by start, from the server version
+        self.query = ACTIVITY_QUERY
+        # {(pid, command, phase): (time, done)}
+        self.samples = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def get_side_connection(self):
+        # a Django connection can not be shared between threads
+        return self.connection.__class__(
+            dict(self.connection.settings_dict), self.connection.alias)
+
+    def poll(self, cursor, pids):
+        """
+        Return the progress lines of the active statements
+        """
+        now = time.monotonic()
+        samples = {}
+        lines = []
+        for activity in get_activity(
+                cursor, pids, self.application_name, self.query):
+            rate = None
+            if activity.command is not None:
+                key = (activity.pid, activity.command, activity.phase)
+                samples[key] = (now, activity.done)
+                if key in self.samples:
+                    previous_time, previous_done = self.samples[key]
+                    if now > previous_time and \
+                            activity.done > previous_done:
+                        rate = (activity.done - previous_done) / (
+                            now - previous_time)
+            lines.append(format_activity(activity, rate))
+        self.samples = samples
+        return lines
+
+    def run(self, pids):
+        side_connection = self.get_side_connection()
+        try:
+            with side_connection.cursor() as cursor:
+                while not self._stop.wait(self.interval):
+                    for line in self.poll(cursor, pids):
+                        self.write(line)
+        except DatabaseError as e:
+            # the report is a side feature, the migrations go on
+            logger.warning("Progress report stopped: %s", e)
+        finally:
+            side_connection.close()
+
+    def start(self):
+        # the Django connection runs the queries of septentrion, and the
+        # simple SQL files, see septentrion_connection
+        self.connection.ensure_connection()
+        self.query = get_activity_query(self.connection.pg_version)
+        if self.query is None:
+            logger.warning(
+                "Progress report disabled: PostgreSQL 9.6+ is required")
+            return
+        pids = [self.connection.connection.get_backend_pid()]
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self.run, args=(pids,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+
+@contextmanager
+def report_loops(write):
+    """
+    Report the rows written by each iteration of the manual migration
+    loops (--meta-psql:), run by septentrion with psql
+    """
+    original_run_simple = runner.Script._run_simple
+
+    def _run_simple(script):
+        start = time.monotonic()
+        output = original_run_simple(script)
+        if any('--meta-psql:' in line for line in script.file_lines):
+            script.north_iteration = getattr(script, 'north_iteration', 0) + 1
+            write("{}: iteration {}, {} row(s) in {:.1f}s".format(
+                os.path.basename(str(script.path)), script.north_iteration,
+                get_row_count(output), time.monotonic() - start))
+        return output
+
+    runner.Script._run_simple = _run_simple
+    try:
+        yield
+    finally:
+        runner.Script._run_simple = original_run_simple
+
+
+@contextmanager
+def report_progress(connection, write, interval=5):
+    """
+    Report the progress of the migrations: the pg_stat_progress_* views and
+    the wait events of the active statements, every interval seconds, and
+    the rows of the manual migration loops
+    """
+    options = connection.settings_dict.get('OPTIONS', {})
+    environ = {}
+    if not options.get('application_name'):
+        # identify the sessions of septentrion and psql
+        environ['PGAPPNAME'] = get_application_name(connection)
+
+    reporter = ProgressReporter(connection, write, interval)
+    with patch_environ(environ), report_loops(write):
+        reporter.start()
+        try:
+            yield reporter
+        finally:
+            reporter.stop()
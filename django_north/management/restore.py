@@ -0,0 +1,155 @@
+import logging
+import os
+import subprocess
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from septentrion import core
+from septentrion import exceptions
+from septentrion import files
+from septentrion import migration
+from septentrion import runner
+from septentrion import style
+
+logger = logging.getLogger(__name__)
+
+DUMP_SUFFIX = '.dump'
+
+# septentrion setting name: libpq env variable
+RESTORE_ENVIRON = {
+    'HOST': 'PGHOST',
+    'PORT': 'PGPORT',
+    'USERNAME': 'PGUSER',
+    'PASSWORD': 'PGPASSWORD',
+}
+
+
+def get_restore_jobs():
+    return int(getattr(
+        settings, 'NORTH_RESTORE_JOBS', min(os.cpu_count() or 1, 8)))
+
+
+def get_dump_path(schema_path):
+    """
+    Return the pg_dump archive of a schema file (schema_1.0.dump for
+    schema_1.0.sql): a file (custom format) or a directory (directory
+    format), None if there is none
+    """
+    name = schema_path.name
+    if name.endswith('.sql'):
+        name = name[:-len('.sql')]
+    dump_path = schema_path.parent / (name + DUMP_SUFFIX)
+    return dump_path if dump_path.exists() else None
+
+
+def get_best_schema_version(settings):
+    """
+    Same as core.get_best_schema_version, a pg_dump archive (see
+    get_dump_path) counting as a schema file: the SQL schema file of
+    the version is not required. septentrion only lists the files of
+    the schemas directory, not the directories of the directory format.
+    """
+    schemas = settings.MIGRATIONS_ROOT / 'schemas'
+    existing_files = files.get_special_files(
+        root=settings.MIGRATIONS_ROOT, folder='schemas')
+    for version in files.get_known_versions(settings=settings):
+        schema_file = settings.SCHEMA_TEMPLATE.format(version.original_string)
+        if get_dump_path(schemas / schema_file) is not None:
+            existing_files.append(schema_file)
+
+    version = core.get_closest_version(
+        settings=settings,
+        target_version=settings.TARGET_VERSION,
+        sql_tpl=settings.SCHEMA_TEMPLATE,
+        force_version=settings.SCHEMA_VERSION,
+        existing_files=existing_files,
+    )
+    if version is None:
+        raise exceptions.SeptentrionException(
+            "Cannot find a schema to init the DB.")
+    return version
+
+
+def restore_dump(config, path, jobs):
+    """
+    Restore a pg_dump archive in the DB of the septentrion settings,
+    with pg_restore and parallel jobs
+    """
+    environ = dict(os.environ)
+    environ.update({
+        env_name: str(getattr(config, name))
+        for name, env_name in RESTORE_ENVIRON.items()
+        if getattr(config, name)
+    })
+    command = [
+        'pg_restore', '--exit-on-error', '--no-owner',
+        '--jobs', str(jobs), '--dbname', config.DBNAME, str(path),
+    ]
+    try:
+        subprocess.run(
+            command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            check=True, env=environ)
+    except FileNotFoundError:
+        raise RuntimeError(
+            "Restoring {} requires the 'pg_restore' executable to be "
+            "present in the PATH.".format(path))
+    except subprocess.CalledProcessError as e:
+        raise runner.SQLRunnerException(
+            "Error during restore: {}".format(e.stderr.decode('utf-8'))
+        ) from e
+
+
+@contextmanager
+def schema_dumps():
+    """
+    Make septentrion init the DB from the pg_dump archive of the schema
+    (see get_dump_path) when there is one, instead of the schema file:
+    the archive holds the schema and the fixtures, the fixtures file is
+    not loaded. The before and after schema files are still run.
+    The version of the archive can be chosen to init the DB, even without
+    its SQL schema file, see get_best_schema_version.
+    """
+    original_init_schema = migration.init_schema
+    original_get_best_schema_version = core.get_best_schema_version
+
+    def init_schema(settings, init_version, stylist=style.noop_stylist):
+        schema_path = (
+            settings.MIGRATIONS_ROOT / 'schemas' /
+            settings.SCHEMA_TEMPLATE.format(init_version.original_string))
+        dump_path = get_dump_path(schema_path)
+        if dump_path is None:
+            return original_init_schema(
+                settings=settings, init_version=init_version,
+                stylist=stylist)
+
+        original_run_script = migration.run_script
+        original_load_fixtures = migration.load_fixtures
+
+        def run_script(settings, path):
+            if path != schema_path:
+                return original_run_script(settings=settings, path=path)
+            jobs = get_restore_jobs()
+            logger.info("Restoring %s with %s jobs", dump_path, jobs)
+            restore_dump(settings, dump_path, jobs)
+
+        def load_fixtures(settings, init_version, stylist=None):
+            logger.info("Fixtures restored from %s", dump_path)
+
+        migration.run_script = run_script
+        migration.load_fixtures = load_fixtures
+        try:
+            original_init_schema(
+                settings=settings, init_version=init_version,
+                stylist=stylist)
+        finally:
+            migration.run_script = original_run_script
+            migration.load_fixtures = original_load_fixtures
+
+    migration.init_schema = init_schema
+    core.get_best_schema_version = get_best_schema_version
+    try:
+        yield
+    finally:
+        migration.init_schema = original_init_schema
+        core.get_best_schema_version = original_get_best_schema_version
@@ -0,0 +1,263 @@
+import re
+from collections import namedtuple
+
+Token = namedtuple('Token', ['kind', 'value'])
+
+# tokens: the tokens of the statement, see tokenize
+# comments: the comments of the statement
+# kind: 'sql', 'copy' (COPY ... FROM STDIN) or 'meta' (psql meta command)
+# data: the data of a COPY ... FROM STDIN, without the \. line
+Statement = namedtuple(
+    'Statement', ['text', 'tokens', 'comments', 'kind', 'data'])
+
+TOKEN_RE = re.compile(r"""
+    (?P<whitespace>\s+)
+  | (?P<comment>--[^\n]*)
+  | (?P<comment_start>/\*)
+  | (?P<string_start>[eE]?')
+  | (?P<identifier_start>")
+  | (?P<dollar_start>\$(?:[A-Za-z_][A-Za-z0-9_]*)?\$)
+  | (?P<number>\d+(?:\.\d+)?)
+  | (?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+  | (?P<meta>\\[^\n]*)
+  | (?P<punctuation>.)
+""", re.VERBOSE | re.DOTALL)
+
+# end of a quoted token, from its start (excluded)
+STRING_END_RE = re.compile(r"(?:[^']|'')*'(?!')", re.DOTALL)
+ESCAPE_STRING_END_RE = re.compile(r"(?:[^'\\]|''|\\.)*'(?!')", re.DOTALL)
+IDENTIFIER_END_RE = re.compile(r'(?:[^"]|"")*"(?!")', re.DOTALL)
+COMMENT_RE = re.compile(r'/\*|\*/')
+
+COPY_END = '\\.'
+
+
+def quote_literal(value):
+    """
+    Quote a string as a SQL literal
+    """
+    return "'{}'".format(str(value).replace("'", "''"))
+
+
+def values_list(rows):
+    """
+    Format rows as a multi-row VALUES list
+    """
+    return ",\n".join(
+        "    ({})".format(", ".join(quote_literal(value) for value in row))
+        for row in rows)
+
+
+def is_copy_from_stdin(words):
+    """
+    Return True if the upper cased words are a COPY ... FROM STDIN,
+    followed by its data
+    """
+    return words[:1] == ['COPY'] and any(
+        words[index:index + 2] == ['FROM', 'STDIN']
+        for index in range(len(words)))
+
+
+class Lexer(object):
+    """
+    A streaming PostgreSQL lexer: feed it the lines of a SQL text, and get
+    the raw tokens (kind, text), whitespaces and comments included.
+    Knows the nested comments, the strings (with backslash escapes for
+    E'' strings), the quoted identifiers, the dollar quoted strings,
+    the psql meta commands, and the data of COPY ... FROM STDIN
+    (kind 'copy_data', up to the \\. line).
+    """
+
+    def __init__(self):
+        # unterminated token: [kind, text, end regex, comment depth or tag]
+        self.pending = None
+        self.copy = False
+        # words of the current statement, to detect COPY ... FROM STDIN
+        self.words = []
+
+    def feed(self, line):
+        tokens = []
+        if self.copy:
+            tokens.append(('copy_data', line))
+            if line.rstrip('\r\n') == COPY_END:
+                self.copy = False
+            return tokens
+
+        pos = 0
+        if self.pending is not None:
+            pos = self.resume(line, 0, tokens)
+        copy = False
+        while pos < len(line):
+            match = TOKEN_RE.match(line, pos)
+            kind = match.lastgroup
+            text = match.group()
+            pos = match.end()
+            if kind == 'comment_start':
+                self.pending = ['comment', text, None, 1]
+            elif kind == 'string_start':
+                self.pending = [
+                    'string', text,
+                    STRING_END_RE if text == "'" else ESCAPE_STRING_END_RE,
+                    None]
+            elif kind == 'identifier_start':
+                self.pending = ['identifier', text, IDENTIFIER_END_RE, None]
+            elif kind == 'dollar_start':
+                self.pending = ['dollar', text, None, text]
+            else:
+                tokens.append((kind, text))
+                if kind == 'word':
+                    self.words.append(text.upper())
+                elif kind == 'punctuation' and text == ';':
+                    copy = is_copy_from_stdin(self.words)
+                    self.words = []
+                continue
+            pos = self.resume(line, pos, tokens)
+        if copy:
+            # the data starts on the next line
+            self.copy = True
+        return tokens
+
+    def resume(self, line, pos, tokens):
+        """
+        Continue the pending token, return the position of its end
+        """
+        kind, text, end_re, state = self.pending
+        if kind == 'comment':
+            # nested comments
+            for match in COMMENT_RE.finditer(line, pos):
+                state += 1 if match.group() == '/*' else -1
+                if state == 0:
+                    end = match.end()
+                    break
+            else:
+                end = None
+        elif kind == 'dollar':
+            end = line.find(state, pos)
+            end = None if end == -1 else end + len(state)
+        else:
+            match = end_re.match(line, pos)
+            end = match.end() if match else None
+
+        if end is None:
+            self.pending = [kind, text + line[pos:], end_re, state]
+            return len(line)
+        self.pending = None
+        tokens.append((kind, text + line[pos:end]))
+        return end
+
+    def close(self):
+        """
+        Return the unterminated token, if any
+        """
+        tokens = []
+        if self.pending is not None:
+            tokens.append((self.pending[0], self.pending[1]))
+            self.pending = None
+        return tokens
+
+
+def iter_raw_tokens(lines):
+    lexer = Lexer()
+    for line in lines:
+        for token in lexer.feed(line):
+            yield token
+    for token in lexer.close():
+        yield token
+
+
+def normalize_token(kind, text):
+    """
+    Return the Token of a raw token, None for whitespaces, comments and
+    COPY data. Strings and quoted identifiers (kind 'identifier', never
+    a keyword) are unquoted, words are upper cased.
+    """
+    if kind in ('whitespace', 'comment', 'copy_data'):
+        return None
+    if kind == 'string':
+        text = text[text.index("'") + 1:-1].replace("''", "'")
+    elif kind == 'dollar':
+        tag_end = text.index('$', 1) + 1
+        kind = 'string'
+        text = text[tag_end:-tag_end]
+    elif kind == 'identifier':
+        text = text[1:-1].replace('""', '"')
+    elif kind == 'word':
+        text = text.upper()
+    return Token(kind, text)
+
+
+def tokenize(sql):
+    """
+    Return the tokens of a SQL text, without whitespaces and comments.
+    Strings and quoted identifiers are unquoted, words are upper cased,
+    see normalize_token.
+    """
+    tokens = []
+    for kind, text in iter_raw_tokens(sql.splitlines(True)):
+        token = normalize_token(kind, text)
+        if token is not None:
+            tokens.append(token)
+    return tokens
+
+
+def iter_statements(lines):
+    """
+    Split the lines of a SQL text in statements, ignoring the semicolons
+    in comments, strings and quoted identifiers.
+    A psql meta command is a statement, and the data of a COPY ... FROM
+    STDIN is given with its statement.
+    Read the lines lazily: a file object can be given.
+    """
+    text, tokens, comments, data = [], [], [], []
+    kind = 'sql'
+
+    def statement():
+        return Statement(
+            ''.join(text), tokens, comments, kind,
+            ''.join(data) if kind == 'copy' else None)
+
+    for raw_kind, raw_text in iter_raw_tokens(lines):
+        if raw_kind == 'copy_data':
+            if raw_text.rstrip('\r\n') != COPY_END:
+                data.append(raw_text)
+                continue
+            yield statement()
+            text, tokens, comments, data = [], [], [], []
+            kind = 'sql'
+            continue
+
+        text.append(raw_text)
+        if raw_kind == 'comment':
+            comments.append(raw_text)
+        token = normalize_token(raw_kind, raw_text)
+        if token is not None:
+            tokens.append(token)
+
+        if raw_kind == 'meta':
+            kind = 'meta'
+        elif token != Token('punctuation', ';'):
+            continue
+        elif is_copy_from_stdin(
+                [t.value for t in tokens if t.kind == 'word']):
+            # wait for the data
+            kind = 'copy'
+            continue
+        yield statement()
+        text, tokens, comments = [], [], []
+        kind = 'sql'
+
+    # the end of the text, the trailing comments included
+    if tokens or comments:
+        yield statement()
+
+
+def split_statements(sql):
+    """
+    Split a SQL text in statements, ignoring the semicolons
+    in comments, strings and quoted identifiers.
+    """
+    return [
+        statement.text.strip()
+        for statement in iter_statements(sql.splitlines(True))
+        if statement.tokens not in ([], [Token('punctuation', ';')])
+    ]
@@ -0,0 +1,385 @@
+"""
+pytest plugin for django-north, to use with pytest-django.
+
+The fixtures are opt-in, to use the north database setup, override the
+pytest-django ``django_db_setup`` fixture in your ``conftest.py``::
+
+    @pytest.fixture(scope='session')
+    def django_db_setup(north_db_setup):
+        pass
+"""
+import contextlib
+import json
+import os
+
+import pytest
+
+TEMPLATES_FILE = 'django_north_templates.json'
+LOCK_FILE = 'django_north.lock'
+
+FOREIGN_KEYS_QUERY = """
+SELECT c.relname, f.relname
+FROM pg_constraint k
+JOIN pg_class c ON c.oid = k.conrelid
+JOIN pg_class f ON f.oid = k.confrelid
+WHERE k.contype = 'f' AND pg_table_is_visible(c.oid)
+"""
+
+# {alias: {table: (count, max xmin)}}, see get_table_signatures
+_signatures = {}
+
+
+def get_worker_id(config):
+    """
+    Return the xdist worker id (gw0, gw1, ...), None without xdist
+    """
+    return getattr(config, 'workerinput', {}).get('workerid')
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """
+    Lock a file, to synchronize the xdist workers.
+    fcntl does not exist on Windows, where msvcrt is used: the plugin is
+    loaded on every platform.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        fcntl = None
+    with open(path, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            return
+
+        import msvcrt
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                break
+            except OSError:
+                # LK_LOCK gives up after 10 seconds
+                continue
+        try:
+            yield
+        finally:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def read_templates(shared_dir):
+    """
+    Return the shared state of the workers: the template databases
+    ([alias, name, first]) and the workers using them, None if there are
+    no templates
+    """
+    try:
+        with open(os.path.join(shared_dir, TEMPLATES_FILE)) as f:
+            return json.load(f)
+    except IOError:
+        return None
+
+
+def write_templates(shared_dir, state):
+    with open(os.path.join(shared_dir, TEMPLATES_FILE), 'w') as f:
+        json.dump(state, f)
+
+
+def use_test_databases(templates):
+    """
+    Point the connections to the test databases created by another
+    worker, without creating them.
+    Return the same configuration as setup_databases.
+    """
+    from django.conf import settings
+    from django.db import connections
+
+    old_config = []
+    for alias, test_name, first in templates:
+        connection = connections[alias]
+        old_config.append(
+            (connection, connection.settings_dict['NAME'], first))
+        if first:
+            connection.close()
+            settings.DATABASES[alias]['NAME'] = test_name
+            connection.settings_dict['NAME'] = test_name
+    return old_config
+
+
+def setup_template_databases(shared_dir, worker_id, verbosity,
+                             keepdb=False):
+    """
+    Create the test databases, migrated by septentrion and with the
+    fixtures, once for all the xdist workers: the first worker creates them,
+    the other ones wait for it.
+    Return the same configuration as setup_databases.
+    """
+    from django.db import connections
+    from django.test.utils import setup_databases
+
+    with file_lock(os.path.join(shared_dir, LOCK_FILE)):
+        state = read_templates(shared_dir)
+        if state is not None:
+            state['workers'].append(worker_id)
+            write_templates(shared_dir, state)
+            return use_test_databases(state['templates'])
+
+        old_config = setup_databases(
+            verbosity=verbosity, interactive=False, keepdb=keepdb)
+        templates = [
+            (connection.alias, connection.settings_dict['NAME'], first)
+            for connection, old_name, first in old_config
+        ]
+        write_templates(
+            shared_dir, {'templates': templates, 'workers': [worker_id]})
+        # CREATE DATABASE ... TEMPLATE requires no session on the template
+        for connection in connections.all():
+            connection.close()
+        return old_config
+
+
+def clone_template_databases(old_config, worker_id, verbosity, keepdb=False):
+    """
+    Clone the template databases for a worker, and point the connections
+    to the clones. The workers clone concurrently.
+    """
+    from django.conf import settings
+
+    first_connection = None
+    for connection, old_name, first in old_config:
+        if not first:
+            # same database as the previous first connection
+            connection.creation.set_as_test_mirror(
+                first_connection.settings_dict)
+            continue
+        first_connection = connection
+        connection.creation.clone_test_db(
+            suffix=worker_id, verbosity=verbosity, keepdb=keepdb)
+        clone_settings = connection.creation.get_test_db_clone_settings(
+            worker_id)
+        connection.close()
+        connection.settings_dict.update(clone_settings)
+        settings.DATABASES[connection.alias]['NAME'] = \
+            clone_settings['NAME']
+
+
+def release_template_databases(shared_dir, worker_id, verbosity):
+    """
+    Drop the template databases if no other worker uses them: the last
+    worker drops them. A worker setting up its databases later creates
+    them again.
+    """
+    from django.db import connections
+
+    with file_lock(os.path.join(shared_dir, LOCK_FILE)):
+        state = read_templates(shared_dir)
+        if state is None:
+            return
+        state['workers'].remove(worker_id)
+        if state['workers']:
+            write_templates(shared_dir, state)
+            return
+
+        for alias, name, first in state['templates']:
+            if first:
+                connections[alias].creation._destroy_test_db(
+                    name, verbosity=verbosity)
+        os.remove(os.path.join(shared_dir, TEMPLATES_FILE))
+
+
+def set_test_mirrors():
+    from django.db import connections
+    from django.test.utils import get_unique_databases_and_mirrors
+
+    test_databases, mirrored_aliases = get_unique_databases_and_mirrors()
+    for alias, mirror_alias in mirrored_aliases.items():
+        connections[alias].creation.set_as_test_mirror(
+            connections[mirror_alias].settings_dict)
+
+
+@pytest.fixture(scope='session')
+def north_db_setup(request, tmp_path_factory, django_test_environment,
+                   django_db_blocker, django_db_keepdb, django_db_createdb):
+    """
+    Create the test databases, migrated by septentrion and with the
+    fixtures.
+    With pytest-xdist, the databases are created once and used as
+    templates: each worker gets a clone (CREATE DATABASE ... TEMPLATE),
+    and no SQL file is run per worker. The last worker drops the
+    templates.
+    """
+    from django.test.utils import setup_databases
+    from django.test.utils import teardown_databases
+
+    verbosity = request.config.option.verbose
+    keepdb = django_db_keepdb and not django_db_createdb
+    worker_id = get_worker_id(request.config)
+
+    shared_dir = str(tmp_path_factory.getbasetemp().parent)
+    with django_db_blocker.unblock():
+        if worker_id is None:
+            old_config = setup_databases(
+                verbosity=verbosity, interactive=False, keepdb=keepdb)
+        else:
+            old_config = setup_template_databases(
+                shared_dir, worker_id, verbosity, keepdb=keepdb)
+            clone_template_databases(
+                old_config, worker_id, verbosity, keepdb=keepdb)
+            set_test_mirrors()
+
+    yield
+
+    if keepdb:
+        return
+    from django.db import connections
+    with django_db_blocker.unblock():
+        for connection in connections.all():
+            connection.close()
+        # drop the test databases, or the clones of the worker
+        teardown_databases(old_config, verbosity=verbosity)
+        if worker_id is not None:
+            release_template_databases(shared_dir, worker_id, verbosity)
+
+
+def get_table_signatures(connection, tables):
+    """
+    Return the signature of each table: the number of rows and the
+    greatest xmin, which changes when a row is inserted or updated.
+    Run a single query.
+    """
+    if not tables:
+        return {}
+    quote_name = connection.ops.quote_name
+    query = ' UNION ALL '.join(
+        "SELECT %s, count(*), max(xmin::text::bigint) FROM {}".format(
+            quote_name(table))
+        for table in tables)
+    with connection.cursor() as cursor:
+        cursor.execute(query, list(tables))
+        return {
+            table: (count, xmin)
+            for table, count, xmin in cursor.fetchall()
+        }
+
+
+def get_flushed_tables(connection):
+    from django_north.management.commands import get_north_settings
+
+    protected_tables = get_north_settings(connection).protected_tables
+    return sorted(
+        table
+        for table in connection.introspection.table_names(
+            include_views=False)
+        if table not in protected_tables)
+
+
+def get_referencing_tables(connection, tables):
+    """
+    Return the tables, and the tables referencing them with foreign keys
+    (recursively)
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(FOREIGN_KEYS_QUERY)
+        foreign_keys = cursor.fetchall()
+    result = set(tables)
+    while True:
+        referencing = {
+            table for table, referenced in foreign_keys
+            if referenced in result} - result
+        if not referencing:
+            return result
+        result |= referencing
+
+
+def take_snapshot(connection):
+    """
+    Store the signatures of the tables, for a database in the state of
+    a north flush
+    """
+    _signatures[connection.alias] = get_table_signatures(
+        connection, get_flushed_tables(connection))
+
+
+def flush_dirty_tables(connection, reset_sequences=False):
+    """
+    Bring the database back to its state after a north flush (empty tables
+    and SQL fixtures), touching only the tables changed since then:
+    - if no table changed, do nothing
+    - if only tables without fixtures changed, truncate them
+    - else run a north flush, which reloads the fixtures
+    """
+    from django.core.management import call_command
+    from django.core.management.color import no_style
+
+    tables = get_flushed_tables(connection)
+    signatures = get_table_signatures(connection, tables)
+    reference = _signatures.get(connection.alias)
+
+    if reference is not None and set(reference) == set(signatures):
+        dirty = [
+            table for table in tables
+            if signatures[table] != reference[table]]
+        if not dirty:
+            return
+        # a table can only be truncated with the tables referencing it
+        truncated = get_referencing_tables(connection, dirty)
+        # tables with fixtures are not empty after a north flush
+        if all(reference.get(table, (0,))[0] == 0 for table in truncated):
+            sequences = [
+                sequence
+                for sequence in connection.introspection.sequence_list()
+                if sequence['table'] in truncated
+            ] if reset_sequences else ()
+            statements = connection.ops.sql_flush(
+                no_style(), sorted(truncated), sequences)
+            with connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+            take_snapshot(connection)
+            return
+
+    call_command(
+        'flush', verbosity=0, interactive=False, database=connection.alias,
+        reset_sequences=reset_sequences)
+    take_snapshot(connection)
+
+
+def get_flushed_connections():
+    """
+    Return one connection per test database (no mirror)
+    """
+    from django.db import connections
+    from django.test.utils import get_unique_databases_and_mirrors
+
+    test_databases, mirrored_aliases = get_unique_databases_and_mirrors()
+    return [
+        connections[sorted(aliases)[0]]
+        for db_name, aliases in test_databases.values()
+    ]
+
+
+@pytest.fixture
+def north_transactional_db(request, django_db_setup, django_db_blocker):
+    """
+    Give access to the database outside of a transaction, like the
+    pytest-django transactional_db fixture. After the test, only the
+    tables changed by the test are flushed, and the fixtures are reloaded
+    only if a table with fixtures changed.
+    """
+    django_db_blocker.unblock()
+    try:
+        flushed_connections = get_flushed_connections()
+        for connection in flushed_connections:
+            if connection.alias not in _signatures:
+                # the test databases are clean after their setup
+                take_snapshot(connection)
+        yield
+        for connection in flushed_connections:
+            flush_dirty_tables(connection)
+    finally:
+        django_db_blocker.restore()
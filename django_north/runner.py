@@ -0,0 +1,114 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_databases
+from django.test.utils import teardown_databases
+
+
+def get_thread_connection(connection):
+    """
+    Return a new connection wrapper with the same settings, to be used in
+    another thread (a Django connection can not be shared between threads)
+    """
+    return connection.__class__(dict(connection.settings_dict),
+                                connection.alias)
+
+
+def clone_test_db(connection, suffix, verbosity=1, keepdb=False):
+    thread_connection = get_thread_connection(connection)
+    try:
+        thread_connection.creation._clone_test_db(suffix, verbosity, keepdb)
+    finally:
+        thread_connection.close()
+
+
+def destroy_test_db_clone(connection, suffix, verbosity=1, keepdb=False):
+    thread_connection = get_thread_connection(connection)
+    try:
+        thread_connection.creation.destroy_test_db(
+            verbosity=verbosity, keepdb=keepdb, suffix=suffix)
+    finally:
+        thread_connection.close()
+
+
+def clone_test_dbs(connection, parallel, verbosity=1, keepdb=False):
+    """
+    Clone the test database of a connection parallel times, concurrently
+    (CREATE DATABASE ... TEMPLATE on PostgreSQL).
+    The clones get the schema, the migrations and the fixtures of the
+    test database, without running any SQL file.
+    """
+    if connection.vendor != 'postgresql':
+        for index in range(parallel):
+            connection.creation.clone_test_db(
+                suffix=str(index + 1), verbosity=verbosity, keepdb=keepdb)
+        return
+
+    if verbosity >= 1:
+        connection.creation.log(
+            '{} {} test database(s) for alias {}...'.format(
+                'Using existing clones' if keepdb else 'Cloning', parallel,
+                connection.creation._get_database_display_str(
+                    verbosity, connection.settings_dict['NAME'])))
+    # CREATE DATABASE ... TEMPLATE requires no session on the template
+    connection.close()
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        futures = [
+            executor.submit(
+                clone_test_db, connection, str(index + 1), verbosity, keepdb)
+            for index in range(parallel)
+        ]
+    for future in futures:
+        future.result()
+
+
+def destroy_test_db_clones(connection, parallel, verbosity=1, keepdb=False):
+    """
+    Destroy the clones of the test database of a connection, concurrently
+    """
+    connection.close()
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        futures = [
+            executor.submit(
+                destroy_test_db_clone, connection, str(index + 1), verbosity,
+                keepdb)
+            for index in range(parallel)
+        ]
+    for future in futures:
+        future.result()
+
+
+class NorthTestRunner(DiscoverRunner):
+    """
+    A test runner which creates each test database once (migrated by
+    septentrion, with the fixtures), and clones it concurrently for
+    the parallel workers.
+    """
+
+    def setup_databases(self, **kwargs):
+        # create the test databases, without the clones
+        old_config = setup_databases(
+            self.verbosity, self.interactive, self.keepdb, self.debug_sql,
+            0, **kwargs)
+        if self.parallel > 1:
+            for connection, old_name, first in old_config:
+                if first:
+                    clone_test_dbs(
+                        connection, self.parallel, verbosity=self.verbosity,
+                        keepdb=self.keepdb)
+        return old_config
+
+    def teardown_databases(self, old_config, **kwargs):
+        if self.parallel > 1:
+            for connection, old_name, destroy in old_config:
+                if destroy and connection.vendor == 'postgresql':
+                    destroy_test_db_clones(
+                        connection, self.parallel, verbosity=self.verbosity,
+                        keepdb=self.keepdb)
+                elif destroy:
+                    for index in range(self.parallel):
+                        connection.creation.destroy_test_db(
+                            suffix=str(index + 1), verbosity=self.verbosity,
+                            keepdb=self.keepdb)
+        teardown_databases(old_config, verbosity=self.verbosity,
+                           keepdb=self.keepdb)
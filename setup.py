@@ -25,9 +25,15 @@ setup(
     include_package_data=True,
     install_requires=[
         "Django>=1.11",
-        "septentrion[psycopg2]>=0.6.1",
+        # django-north patches septentrion internals
+        "septentrion[psycopg2]>=0.6.1,<0.7",
     ],
     tests_require=["tox"],
+    entry_points={
+        "pytest11": [
+            "django_north = django_north.pytest_plugin",
+        ],
+    },
     license="MIT",
     zip_safe=False,
     keywords='django-north',
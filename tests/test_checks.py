@@ -0,0 +1,167 @@
+from django.core import checks as dj_checks
+from django.core.management import call_command
+from django.db import connection
+from django.db import OperationalError
+
+import pytest
+
+from django_north import checks
+from django_north.management import fixtures
+from django_north.management import migrations
+
+
+def test_check_version(mocker, settings):
+    mock_version = mocker.patch(
+        'django_north.management.migrations.get_current_version')
+
+    # schema not inited
+    mock_version.return_value = None
+    result = checks.check_version(connection)
+    assert [message.id for message in result] == ['north.W002']
+    assert result[0].msg == "Schema not inited on database 'default'."
+
+    # version mismatch
+    mock_version.return_value = '1.2'
+    result = checks.check_version(connection)
+    assert [message.id for message in result] == ['north.W006']
+    assert result[0].msg == (
+        "Database 'default' is in version 1.2, target version is 1.3.")
+
+    # ok
+    mock_version.return_value = '1.3'
+    assert checks.check_version(connection) == []
+
+    # no target version
+    del settings.NORTH_TARGET_VERSION
+    result = checks.check_version(connection)
+    assert [message.id for message in result] == ['north.E001']
+
+
+def test_check_migrations(mocker):
+    mock_unapplied = mocker.patch(
+        'django_north.management.migrations.get_unapplied_migrations')
+
+    mock_unapplied.return_value = [('1.3', 'a-ddl.sql'), ('1.3', 'b-ddl.sql')]
+    result = checks.check_migrations(connection)
+    assert [message.id for message in result] == ['north.W003']
+    assert result[0].msg == (
+        "You have 2 unapplied migration(s) on database 'default'.")
+
+    mock_unapplied.return_value = []
+    assert checks.check_migrations(connection) == []
+
+
+def test_check_fixtures(mocker, settings):
+    mock_diff = mocker.patch(
+        'django_north.management.fixtures.get_fixtures_diff',
+        return_value=fixtures.FixturesDiff([], ['ct'], ['perm1', 'perm2']))
+    result = checks.check_fixtures(connection)
+    assert [message.id for message in result] == ['north.W004']
+    assert result[0].msg == (
+        "You have 3 missing fixture(s) on database 'default'.")
+
+    mock_diff.return_value = fixtures.FixturesDiff([], [], [])
+    assert checks.check_fixtures(connection) == []
+
+
+def test_check_fixtures_manifest(mocker, settings, tmpdir):
+    mock_diff = mocker.patch(
+        'django_north.management.fixtures.get_fixtures_diff')
+    mock_missing = mocker.patch(
+        'django_north.management.fixtures.get_manifest_missing_fixtures',
+        return_value=([('app', 'model')], []))
+    settings.NORTH_FIXTURES_MANIFEST = str(tmpdir.join('manifest.json'))
+
+    # no manifest
+    result = checks.check_fixtures(connection)
+    assert [message.id for message in result] == ['north.W005']
+
+    fixtures.write_fixtures_manifest(
+        fixtures.get_fixtures_manifest(), settings.NORTH_FIXTURES_MANIFEST)
+    result = checks.check_fixtures(connection)
+    assert [message.id for message in result] == ['north.W004']
+    assert mock_missing.call_args[1] == {'using': 'default'}
+    assert mock_diff.called is False
+
+    mock_missing.return_value = ([], [])
+    assert checks.check_fixtures(connection) == []
+
+
+@pytest.mark.parametrize("manage", [True, False])
+def test_run_checks(mocker, settings, manage):
+    settings.NORTH_MANAGE_DB = manage
+    mock_version = mocker.patch(
+        'django_north.checks.check_version', return_value=[])
+    mock_migrations = mocker.patch(
+        'django_north.checks.check_migrations', return_value=[])
+    mock_fixtures = mocker.patch(
+        'django_north.checks.check_fixtures', return_value=[])
+
+    assert checks.run_checks(connection) == ([], True)
+    assert mock_migrations.called is manage
+    assert mock_fixtures.called is True
+
+    # version mismatch: no need to check further
+    mock_migrations.reset_mock()
+    mock_fixtures.reset_mock()
+    mock_version.return_value = [dj_checks.Warning('foo', id='north.W002')]
+    assert checks.run_checks(connection) == (mock_version.return_value, True)
+    assert mock_migrations.called is False
+    assert mock_fixtures.called is False
+
+    # DB error
+    mock_version.side_effect = OperationalError('boom')
+    result, cacheable = checks.run_checks(connection)
+    assert [message.id for message in result] == ['north.W001']
+    assert cacheable is False
+
+    # no version found by the detector
+    mock_version.side_effect = migrations.DBException('no comment')
+    result, cacheable = checks.run_checks(connection)
+    assert [message.id for message in result] == ['north.E002']
+    assert cacheable is True
+
+
+@pytest.mark.parametrize("timeout,cacheable,calls", [
+    (0, True, 2), (60, True, 1), (60, False, 2)])
+def test_check_database_cache(mocker, settings, timeout, cacheable, calls):
+    settings.NORTH_CHECKS_TIMEOUT = timeout
+    expected = [dj_checks.Warning('foo', hint='bar', id='north.W002')]
+    mock_run_checks = mocker.patch(
+        'django_north.checks.run_checks',
+        return_value=(expected, cacheable))
+
+    assert checks.check_database() == expected
+    assert checks.check_database() == expected
+    assert mock_run_checks.call_count == calls
+
+    checks.caches['default'].clear()
+
+
+def test_clear_checks_cache(mocker, settings):
+    settings.NORTH_CHECKS_TIMEOUT = 60
+    mock_run_checks = mocker.patch(
+        'django_north.checks.run_checks', return_value=([], True))
+
+    checks.check_database()
+    checks.clear_checks_cache('default')
+    checks.check_database()
+    assert mock_run_checks.call_count == 2
+
+    checks.caches['default'].clear()
+
+
+def test_migrate_clears_checks_cache(mocker, settings):
+    settings.NORTH_MANAGE_DB = True
+    mocker.patch('septentrion.migrate')
+    mocker.patch('django_north.management.commands.migrate.prewarm_caches')
+    mock_clear = mocker.patch(
+        'django_north.management.commands.migrate.clear_checks_cache')
+
+    call_command('migrate')
+    mock_clear.assert_called_once_with('default')
+
+
+@pytest.mark.django_db
+def test_check_database_for_real():
+    assert checks.check_database(databases=['default']) == []
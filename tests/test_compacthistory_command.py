@@ -0,0 +1,38 @@
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+
+import pytest
+
+from django_north.management import migrations
+
+
+def test_compacthistory_disabled(settings):
+    settings.NORTH_MANAGE_DB = False
+
+    with pytest.raises(CommandError):
+        call_command('compacthistory', before='1.2')
+
+
+def test_compacthistory_invalid_version():
+    with pytest.raises(CommandError):
+        call_command('compacthistory', before='foo')
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("ledger", [True, False])
+def test_compacthistory(capsys, mocker, settings, ledger):
+    settings.NORTH_LEDGER = ledger
+    mock_refresh = mocker.spy(migrations, 'refresh_ledger')
+
+    call_command('compacthistory', before='1.2')
+
+    captured = capsys.readouterr()
+    assert captured.out == "Version 1.0 compacted\nVersion 1.1 compacted\n"
+    assert mock_refresh.called is ledger
+    assert migrations.get_unapplied_migrations(connection) == []
+
+    call_command('compacthistory', before='1.2')
+
+    captured = capsys.readouterr()
+    assert captured.out == "No version to compact.\n"
@@ -0,0 +1,27 @@
+import json
+
+from django.core.management import call_command
+
+from django_north.management import fixtures
+
+
+def test_fixturesmanifest(capsys, settings, tmpdir):
+    call_command('fixturesmanifest')
+    captured = capsys.readouterr()
+    assert json.loads(captured.out) == fixtures.get_fixtures_manifest()
+
+    path = str(tmpdir.join('manifest.json'))
+    call_command('fixturesmanifest', path)
+    captured = capsys.readouterr()
+    assert captured.out == "Fixtures manifest written to {}\n".format(path)
+    assert fixtures.read_fixtures_manifest(path) == \
+        fixtures.get_fixtures_manifest()
+
+    # default path
+    settings.NORTH_FIXTURES_MANIFEST = str(tmpdir.join('default.json'))
+    call_command('fixturesmanifest')
+    captured = capsys.readouterr()
+    assert captured.out == "Fixtures manifest written to {}\n".format(
+        settings.NORTH_FIXTURES_MANIFEST)
+    assert fixtures.read_fixtures_manifest(
+        settings.NORTH_FIXTURES_MANIFEST) == fixtures.get_fixtures_manifest()
@@ -5,6 +5,7 @@ from django.db import connection
 
 import pytest
 
+from django_north.management.commands.flush import Command
 from django_north.management.commands.flush import sql_flush
 
 
@@ -35,3 +36,14 @@ def test_sql_flush(db):
     assert 'sql_version' in ' '.join(dj_sql_list)
     assert 'django_migrations' not in ' '.join(north_sql_list)
     assert 'sql_version' not in ' '.join(north_sql_list)
+
+
+def test_emit_post_migrate(mocker):
+    mock_load_fixtures = mocker.patch('septentrion.load_fixtures')
+    mock_prewarm = mocker.patch(
+        'django_north.management.commands.flush.prewarm_caches')
+
+    Command.emit_post_migrate(0, False, 'default', '1.3')
+
+    assert mock_load_fixtures.call_args[0] == ('1.3',)
+    mock_prewarm.assert_called_once_with('default')
@@ -0,0 +1,66 @@
+import json
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+import django_north
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# microseconds, far above the expected time: only the regressions
+# (a heavy import at module level) fail
+IMPORT_BUDGET = 50000
+
+
+def run_python(code, *options):
+    env = dict(os.environ)
+    env['DJANGO_SETTINGS_MODULE'] = 'tests.north_project.settings'
+    return subprocess.run(
+        [sys.executable] + list(options) + ['-c', code],
+        cwd=root, env=env, check=True, universal_newlines=True,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+def test_version():
+    assert re.match(r'^\d+\.\d+', django_north.__version__)
+    assert django_north.get_version() == django_north.__version__
+
+
+def test_startup_imports():
+    # what every manage.py call imports
+    code = (
+        "import json, sys, django\n"
+        "django.setup()\n"
+        "print(json.dumps(sorted(sys.modules)))\n"
+    )
+    modules = json.loads(run_python(code).stdout)
+
+    assert 'django_north.checks' in modules
+    assert [
+        module for module in modules
+        if module.startswith('septentrion') or
+        module.startswith('django_north.management')
+    ] == []
+
+
+@pytest.mark.skipif(
+    sys.version_info < (3, 8), reason="pkg_resources is used for __version__")
+def test_import_budget():
+    process = run_python(
+        "import json, sys, django_north\n"
+        "print(json.dumps(sorted(sys.modules)))\n",
+        '-X', 'importtime')
+    modules = set(json.loads(process.stdout))
+    assert 'pkg_resources' not in modules
+    assert 'importlib.metadata' not in modules
+
+    # import time:  self [us] | cumulative | imported package
+    times = dict(
+        (name.strip(), int(cumulative))
+        for self_time, cumulative, name in re.findall(
+            r'^import time:\s+(\d+) \|\s+(\d+) \|(.*)$', process.stderr,
+            re.MULTILINE))
+    assert times['django_north'] < IMPORT_BUDGET
@@ -0,0 +1,74 @@
+import json
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.migrations.recorder import MigrationRecorder
+
+import pytest
+
+from django_north.management import lint
+
+
+@pytest.mark.django_db
+def test_lintmigrations_pending(capsys):
+    call_command('lintmigrations')
+    captured = capsys.readouterr()
+    assert captured.out == "\n"
+
+    MigrationRecorder.Migration.objects.filter(app='1.3').delete()
+    call_command('lintmigrations')
+    captured = capsys.readouterr()
+    assert captured.out.splitlines() == [
+        "1.3/1.3-add-readers-ddl.sql: ADD FOREIGN KEY without NOT VALID "
+        "on north_app_book_readers: SHARE ROW EXCLUSIVE lock, "
+        "scans the table",
+    ] * 2 + [
+        "1.3/1.3-add-readers-ddl.sql: CREATE INDEX without CONCURRENTLY "
+        "on north_app_book_readers: SHARE lock, scans the table",
+    ] * 2
+
+
+def test_lintmigrations_paths(capsys, tmpdir):
+    path = tmpdir.join('foo-ddl.sql')
+    path.write(
+        "CREATE INDEX idx ON foo (bar);\n"
+        "ALTER TABLE foo ADD COLUMN baz integer DEFAULT 0;\n")
+    stats = tmpdir.join('stats.json')
+    stats.write(json.dumps({
+        'version': lint.STATS_VERSION,
+        'tables': {'foo': {'rows': 10, 'bytes': 1024 * 1024 * 1024}},
+    }))
+
+    call_command('lintmigrations', str(path), server_version=110000)
+    captured = capsys.readouterr()
+    assert captured.out == (
+        "foo-ddl.sql: CREATE INDEX without CONCURRENTLY on foo: "
+        "SHARE lock, scans the table\n")
+
+    call_command(
+        'lintmigrations', str(path), stats=str(stats), throughput=10)
+    captured = capsys.readouterr()
+    assert captured.out == (
+        "foo-ddl.sql: ADD COLUMN with a DEFAULT on foo: ACCESS EXCLUSIVE "
+        "lock, rewrites the table, 1.0 GB, ~307s\n"
+        "foo-ddl.sql: CREATE INDEX without CONCURRENTLY on foo: "
+        "SHARE lock, scans the table, 1.0 GB, ~102s\n")
+
+    with pytest.raises(CommandError) as excinfo:
+        call_command('lintmigrations', str(path), check=True)
+    assert str(excinfo.value) == "2 finding(s)."
+
+    with pytest.raises(CommandError):
+        call_command(
+            'lintmigrations', str(path), stats=str(tmpdir.join('foo.json')))
+
+
+@pytest.mark.django_db
+def test_lintmigrations_dump_stats(capsys, tmpdir):
+    path = str(tmpdir.join('stats.json'))
+
+    call_command('lintmigrations', dump_stats=path)
+
+    captured = capsys.readouterr()
+    assert captured.out == "Table stats written to {}\n".format(path)
+    assert 'north_app_book' in lint.read_table_stats(path)
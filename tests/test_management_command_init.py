@@ -26,3 +26,34 @@ def test_septentrion_settings(db):
 
     # we can't really test the db params because they depend on how
     # the tests are launched.
+
+
+def test_septentrion_settings_copy():
+    settings = commands.septentrion_settings(connection)
+    settings["target_version"] = "1.0"
+
+    assert commands.septentrion_settings(connection)["target_version"] == (
+        "1.3")
+
+
+def test_get_north_settings(settings):
+    north_settings = commands.get_north_settings(connection)
+    assert commands.get_north_settings(connection) is north_settings
+    assert north_settings.septentrion["target_version"] == "1.3"
+    assert north_settings.protected_tables == (
+        'django_migrations', 'sql_version', 'north_version_ledger',
+        'north_migrations_archive', 'north_migrate_fingerprint')
+
+    # cleared on setting_changed
+    settings.NORTH_TARGET_VERSION = '1.2'
+    north_settings = commands.get_north_settings(connection)
+    assert north_settings.septentrion["target_version"] == "1.2"
+
+
+def test_get_north_settings_connection(mocker):
+    north_settings = commands.get_north_settings(connection)
+
+    mocker.patch.dict(connection.settings_dict, {"NAME": "other"})
+    assert commands.get_north_settings(connection) is not north_settings
+    assert commands.get_north_settings(
+        connection).septentrion["dbname"] == "other"
@@ -0,0 +1,294 @@
+import os
+
+from django.db import connection
+
+import pytest
+from septentrion import configuration
+from septentrion import core
+from septentrion import db
+from septentrion import migration
+from septentrion import runner
+from septentrion import versions
+
+from django_north.management import connection as north_connection
+from django_north.management import migrations
+from django_north.management.commands import septentrion_settings
+
+root = os.path.join(
+    os.path.dirname(__file__), 'north_project', 'sql')
+
+
+def test_get_libpq_environ(mocker):
+    mock_connection = mocker.Mock(settings_dict={'OPTIONS': {
+        'sslmode': 'require',
+        'connect_timeout': 3,
+        'isolation_level': 1,
+    }})
+    assert north_connection.get_libpq_environ(mock_connection) == {
+        'PGSSLMODE': 'require',
+        'PGCONNECT_TIMEOUT': '3',
+    }
+
+
+@pytest.mark.parametrize("path,expected", [
+    ('1.0/1.0-author-1-ddl.sql', True),
+    # psql meta command
+    ('1.1/1.1-add-num-pages-2-dml.sql', False),
+    # non transactional keyword
+    ('1.1/1.1-index-ddl.sql', False),
+])
+def test_is_simple_script(path, expected):
+    keywords = ['CONCURRENTLY', 'ALTER TYPE', 'VACUUM']
+    assert north_connection.is_simple_script(
+        os.path.join(root, path), keywords) is expected
+
+
+@pytest.mark.parametrize("script,expected", [
+    ("CREATE TABLE foo (id integer);", 'simple'),
+    # the keywords in comments, strings and identifiers do not count
+    ("-- VACUUM later\n"
+     "/* CREATE INDEX CONCURRENTLY /* nested */ too */\n"
+     "COMMENT ON TABLE \"vacuum\" IS 'run VACUUM; after';\n"
+     "CREATE FUNCTION f() RETURNS void AS $$ VACUUM; $$ LANGUAGE sql;",
+     'simple'),
+    # a quoted identifier is not a keyword
+    ('CREATE TABLE "VACUUM" ("CONCURRENTLY" integer);', 'simple'),
+    ("ALTER TYPE foo ADD VALUE 'bar';", 'statements'),
+    ("ALTER TABLE foo ALTER COLUMN bar TYPE text;", 'simple'),
+    ("COPY foo (id) FROM stdin;\n1\n\\.\n", 'statements'),
+    ("COPY foo (id) FROM stdin;\n\\set in data\n\\.\n", 'statements'),
+    ("\\set ON_ERROR_STOP on\nVACUUM;", 'psql'),
+    ("UPDATE foo SET a = 1; --meta-psql:do-until-0", 'psql'),
+])
+def test_classify_script(tmpdir, script, expected):
+    path = tmpdir.join('foo.sql')
+    path.write(script)
+    keywords = ['CONCURRENTLY', 'ALTER TYPE', 'VACUUM']
+    assert north_connection.classify_script(str(path), keywords) == expected
+
+
+def test_septentrion_connection(mocker, settings):
+    settings.NORTH_REUSE_CONNECTION = True
+    mocker.patch.dict(
+        connection.settings_dict, {'OPTIONS': {'sslmode': 'prefer'}})
+    mocker.patch.dict(os.environ, {'PGSSLMODE': 'disable'})
+    get_connection = db.get_connection
+    run_script = migration.run_script
+
+    with north_connection.septentrion_connection(connection):
+        assert os.environ['PGSSLMODE'] == 'prefer'
+        assert db.get_connection is not get_connection
+        assert migration.run_script is not run_script
+
+    assert os.environ['PGSSLMODE'] == 'disable'
+    assert db.get_connection is get_connection
+    assert migration.run_script is run_script
+
+    # disabled
+    settings.NORTH_REUSE_CONNECTION = False
+    with north_connection.septentrion_connection(connection):
+        assert os.environ['PGSSLMODE'] == 'prefer'
+        assert db.get_connection is get_connection
+
+    # opt-in
+    del settings.NORTH_REUSE_CONNECTION
+    with north_connection.septentrion_connection(connection):
+        assert db.get_connection is get_connection
+
+
+def test_septentrion_connection_group(settings):
+    settings.NORTH_REUSE_CONNECTION = True
+    settings.NORTH_GROUP_MIGRATIONS = True
+    build_migration_plan = core.build_migration_plan
+
+    # showmigrations, runserver: the plan is not grouped
+    with north_connection.septentrion_connection(connection):
+        assert core.build_migration_plan is build_migration_plan
+
+    # migrate
+    with north_connection.septentrion_connection(connection, group=True):
+        assert core.build_migration_plan is not build_migration_plan
+    assert core.build_migration_plan is build_migration_plan
+
+
+@pytest.mark.django_db
+def test_septentrion_connection_in_transaction():
+    get_connection = db.get_connection
+
+    # septentrion can not use a connection in a transaction
+    assert connection.in_atomic_block
+    with north_connection.septentrion_connection(connection):
+        assert db.get_connection is get_connection
+
+
+@pytest.mark.django_db(transaction=True)
+def test_run_script(tmpdir):
+    path = tmpdir.join('foo-ddl.sql')
+    path.write(
+        'BEGIN;\n'
+        'CREATE TABLE north_foo (id integer);\n'
+        'COMMIT;\n')
+    north_connection.run_script(connection, str(path))
+    assert 'north_foo' in connection.introspection.table_names()
+
+    path.write(
+        'BEGIN;\n'
+        'DROP TABLE north_foo;\n'
+        'SELECT * FROM north_unknown;\n'
+        'COMMIT;\n')
+    with pytest.raises(runner.SQLRunnerException):
+        north_connection.run_script(connection, str(path))
+    # the transaction has been rolled back
+    assert 'north_foo' in connection.introspection.table_names()
+
+    with connection.cursor() as cursor:
+        cursor.execute('DROP TABLE north_foo')
+
+
+def test_compacted_migrations(mocker):
+    mocker.patch.object(
+        db, 'get_applied_migrations',
+        return_value=[
+            migrations.COMPACTED_MIGRATION, '1.2-rename-num-pages-ddl.sql'])
+    mock_query = mocker.patch.object(db, 'Query')
+    mock_query.return_value.__enter__.return_value = [
+        ('1.2-0-version-dml.sql',), ('1.2-remove-author-dob-ddl.sql',)]
+    get_applied_migrations = db.get_applied_migrations
+    config = configuration.Settings(**septentrion_settings(connection))
+    version = versions.Version.from_string('1.2')
+
+    with north_connection.compacted_migrations():
+        # the archived migrations, and the ones applied after the compaction
+        assert db.get_applied_migrations(
+            settings=config, version=version) == [
+            '1.2-0-version-dml.sql',
+            '1.2-remove-author-dob-ddl.sql',
+            '1.2-rename-num-pages-ddl.sql',
+        ]
+        assert mock_query.call_args[1] == {
+            'settings': config, 'query': migrations.ARCHIVED_MIGRATIONS,
+            'args': ('1.2',)}
+
+        mock_query.reset_mock()
+        get_applied_migrations.return_value = ['1.2-0-version-dml.sql']
+        assert db.get_applied_migrations(
+            settings=config, version=version) == ['1.2-0-version-dml.sql']
+        assert mock_query.called is False
+
+    assert db.get_applied_migrations is get_applied_migrations
+
+
+@pytest.mark.django_db(transaction=True)
+def test_run_statements(tmpdir):
+    path = tmpdir.join('foo-ddl.sql')
+    path.write(
+        'CREATE TABLE north_foo (id integer, name text);\n'
+        'COPY north_foo (id, name) FROM stdin;\n'
+        '1\tit\'s; a name\n'
+        '\\.\n'
+        '-- not in a transaction\n'
+        'CREATE INDEX CONCURRENTLY north_foo_id ON north_foo (id);\n'
+        '-- the end\n')
+    north_connection.run_statements(connection, str(path))
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT id, name FROM north_foo')
+        assert cursor.fetchall() == [(1, "it's; a name")]
+
+    path.write(
+        'BEGIN;\n'
+        'DROP TABLE north_foo;\n'
+        'SELECT * FROM north_unknown;\n'
+        'COMMIT;\n')
+    with pytest.raises(runner.SQLRunnerException):
+        north_connection.run_statements(connection, str(path))
+    # the transaction has been rolled back
+    assert 'north_foo' in connection.introspection.table_names()
+
+    with connection.cursor() as cursor:
+        cursor.execute('DROP TABLE north_foo')
+
+
+def test_get_group_script(tmpdir):
+    keywords = ['CONCURRENTLY', 'ALTER TYPE', 'VACUUM']
+    script = north_connection.get_group_script(
+        os.path.join(root, '1.0/1.0-author-1-ddl.sql'), keywords)
+    assert 'CREATE TABLE "north_app_author"' in script
+    assert 'BEGIN' not in script
+    assert 'COMMIT' not in script
+
+    # psql meta command, non transactional keyword
+    assert north_connection.get_group_script(
+        os.path.join(root, '1.1/1.1-add-num-pages-2-dml.sql'),
+        keywords) is None
+    assert north_connection.get_group_script(
+        os.path.join(root, '1.1/1.1-index-ddl.sql'), keywords) is None
+
+    # other transaction statements
+    path = tmpdir.join('foo-ddl.sql')
+    path.write('BEGIN;\nSAVEPOINT foo;\nCOMMIT;\n')
+    assert north_connection.get_group_script(str(path), keywords) is None
+    path.write('CREATE TABLE foo (id integer);\n-- COMMIT;\n')
+    assert north_connection.get_group_script(str(path), keywords) == (
+        'CREATE TABLE foo (id integer);')
+
+
+def test_group_migration_plan():
+    keywords = ['CONCURRENTLY', 'ALTER TYPE', 'VACUUM']
+    version = versions.Version.from_string('1.1')
+    plan = [
+        (name, applied, os.path.join(root, '1.1', name), False)
+        for name, applied in [
+            ('1.1-0-version-dml.sql', True),
+            ('1.1-add-num-pages-1-ddl.sql', False),
+            ('1.1-add-num-pages-2-dml.sql', False),
+            ('1.1-index-ddl.sql', False),
+        ]]
+    # a single groupable file is not grouped
+    assert north_connection.group_migration_plan(
+        version, plan, keywords) == plan
+
+    plan = [
+        (name, False, os.path.join(root, '1.0', name), False)
+        for name in [
+            '1.0-0-version-dml.sql',
+            '1.0-author-1-ddl.sql',
+            '1.0-author-2-dml.sql',
+        ]]
+    [(title, applied, group, is_manual)] = (
+        north_connection.group_migration_plan(version, plan, keywords))
+    assert title == '1.0-0-version-dml.sql (+2 grouped)'
+    assert (applied, is_manual) == (False, False)
+    assert group.names == tuple(mig for mig, _, _, _ in plan)
+    assert group.paths == tuple(path for _, _, path, _ in plan)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_run_group():
+    version = versions.Version.from_string('9.9')
+    group = north_connection.MigrationGroup(
+        version, ('9.9-a-ddl.sql', '9.9-b-dml.sql'), ('a', 'b'), (
+            'CREATE TABLE north_foo (id integer);',
+            'INSERT INTO north_foo VALUES (1);',
+        ))
+    try:
+        assert north_connection.run_group(connection, group) is True
+        assert sorted(migrations.get_applied_migrations(
+            version, connection)) == list(group.names)
+
+        group = group._replace(
+            names=('9.9-c-dml.sql', '9.9-d-dml.sql'),
+            scripts=(
+                'INSERT INTO north_foo VALUES (2);',
+                'SELECT * FROM north_unknown;',
+            ))
+        assert north_connection.run_group(connection, group) is False
+        # rolled back
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT id FROM north_foo')
+            assert cursor.fetchall() == [(1,)]
+        assert len(migrations.get_applied_migrations(
+            version, connection)) == 2
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TABLE IF EXISTS north_foo')
+            cursor.execute("DELETE FROM django_migrations WHERE app = '9.9'")
@@ -0,0 +1,102 @@
+from django.apps import apps
+from django.db import connection
+from django.db import models
+from django.test.utils import isolate_apps
+
+import pytest
+
+from django_north.management import drift
+from django_north.management.commands import sqlall
+
+
+@pytest.mark.django_db
+def test_get_expected_tables():
+    book = apps.get_model('north_app', 'Book')
+    readers = book._meta.get_field('readers').remote_field.through
+    tables = drift.get_expected_tables([book, readers], connection)
+
+    assert set(tables) == {'north_app_book', 'north_app_book_readers'}
+    assert tables['north_app_book'].columns == {
+        'id': ('integer', False),
+        'author_id': ('integer', False),
+        'title': ('character varying(100)', False),
+        'pages': ('integer', False),
+    }
+    assert tables['north_app_book'].primary_key == ('id',)
+    assert ('author_id',) in tables['north_app_book'].indexes
+    assert tables['north_app_book'].foreign_keys == {
+        'author_id': ('north_app_author', 'id')}
+    assert ('book_id', 'reader_id') in tables['north_app_book_readers'].unique
+
+    # the temporary tables are rolled back
+    assert drift.get_catalog_snapshot(connection, temporary=True) == {}
+
+
+@pytest.mark.django_db
+@isolate_apps('tests.north_app')
+def test_get_expected_tables_foreign_key_outside(mocker):
+    class Site(models.Model):
+        class Meta:
+            app_label = 'north_app'
+            managed = False
+            db_table = 'django_site'
+
+    class Page(models.Model):
+        site = models.ForeignKey(Site, on_delete=models.CASCADE)
+
+        class Meta:
+            app_label = 'north_app'
+
+    # the table of Site is a permanent table, missing from sqlall
+    [(output, final_output)] = sqlall.sql_create_models([[Page]], connection)
+    mocker.patch.object(
+        drift, 'sql_create_all', return_value=output + final_output)
+
+    tables = drift.get_expected_tables([Page], connection)
+
+    assert tables['north_app_page'].foreign_keys == {
+        'site_id': ('django_site', 'id')}
+    assert ('site_id',) in tables['north_app_page'].indexes
+
+
+@pytest.mark.django_db
+def test_get_catalog_snapshot(django_assert_num_queries):
+    with django_assert_num_queries(4):
+        snapshot = drift.get_catalog_snapshot(connection)
+
+    assert snapshot['north_app_book'].columns['title'] == (
+        'character varying(100)', False)
+    assert snapshot['north_app_book'].primary_key == ('id',)
+    assert ('author_id',) in snapshot['north_app_book'].indexes
+    assert snapshot['north_app_book'].foreign_keys == {
+        'author_id': ('north_app_author', 'id')}
+    assert 'sql_version' in snapshot
+
+
+@pytest.mark.django_db
+def test_get_schema_drift():
+    models = apps.get_app_config('north_app').get_models(
+        include_auto_created=True)
+    assert drift.get_schema_drift(connection, models=models) == []
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'ALTER TABLE north_app_book ALTER COLUMN title TYPE text, '
+            'ALTER COLUMN title DROP NOT NULL, '
+            'DROP COLUMN pages, ADD COLUMN foo integer, '
+            'DROP CONSTRAINT north_app_book_author_id_fkey')
+        cursor.execute('DROP INDEX north_app_book_author_id')
+        cursor.execute('DROP TABLE north_app_book_readers')
+
+    models = apps.get_app_config('north_app').get_models(
+        include_auto_created=True)
+    assert drift.get_schema_drift(connection, models=models) == [
+        'north_app_book: missing column pages',
+        'north_app_book.title: type is text, '
+        'expected character varying(100)',
+        'north_app_book.title: nullable, expected not nullable',
+        'north_app_book: unknown column foo',
+        'north_app_book: missing index on (author_id)',
+        'north_app_book.author_id: missing foreign key to north_app_author.id',
+        'north_app_book_readers: missing table',
+    ]
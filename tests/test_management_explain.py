@@ -0,0 +1,72 @@
+from django.db import connection
+from django.db.migrations.recorder import MigrationRecorder
+
+import pytest
+
+from django_north.management import explain
+from django_north.management import sql
+
+
+@pytest.mark.parametrize("statement,table", [
+    ('ALTER TABLE "north_app_book" ADD COLUMN foo integer', 'north_app_book'),
+    ('ALTER TABLE IF EXISTS ONLY public.foo DROP COLUMN bar', 'public.foo'),
+    ('ALTER TABLE "only" DROP COLUMN bar', 'only'),
+    ('CREATE INDEX "on" ON foo (bar)', 'foo'),
+    ('CREATE INDEX CONCURRENTLY IF NOT EXISTS idx ON ONLY foo (bar)', 'foo'),
+    ('CREATE UNIQUE INDEX ON Foo (bar)', 'foo'),
+    ('CREATE TABLE foo (id integer)', None),
+    ('DROP TABLE IF EXISTS foo', 'foo'),
+    ('DROP INDEX foo', None),
+    ('VACUUM FULL ANALYZE foo', 'foo'),
+    ('TRUNCATE TABLE foo', 'foo'),
+])
+def test_get_ddl_table(statement, table):
+    assert explain.get_ddl_table(sql.tokenize(statement)) == table
+
+
+@pytest.mark.django_db
+def test_explain_migrations():
+    assert explain.explain_migrations(connection) == []
+
+    MigrationRecorder.Migration.objects.filter(app='1.3').delete()
+    estimates = explain.explain_migrations(connection)
+
+    assert [
+        (estimate.version, estimate.name) for estimate in estimates
+    ] == [
+        ('1.3', '1.3-0-version-dml.sql'),
+        ('1.3', '1.3-add-readers-ddl.sql'),
+        ('1.3', '1.3-add-readers-dml.sql'),
+        ('1.3', '1.3-remove-author-dob-ddl.sql'),
+        ('1.3', '1.3-rename-num-pages-ddl.sql'),
+    ]
+    version, readers_ddl, readers_dml, author_ddl, book_ddl = estimates
+    assert version.rows == 1
+    assert version.tables == []
+    # the new tables are ignored
+    assert [table[0] for table in readers_ddl.tables] == [
+        'north_app_book_readers']
+    assert readers_dml.rows == 5
+    assert readers_dml.cost > 0
+    assert readers_dml.errors == []
+    assert [table[0] for table in author_ddl.tables] == ['north_app_author']
+    assert author_ddl.rows == 0
+
+    # nothing was written
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM sql_version")
+        assert cursor.fetchone() == (5,)
+
+
+@pytest.mark.django_db
+def test_explain_file_errors(tmpdir):
+    path = tmpdir.join('1.4-foo-dml.sql')
+    path.write(
+        "UPDATE north_app_book SET foo = 1;\n"
+        "UPDATE north_app_book SET pages = 1;\n")
+    estimate = explain.explain_file(connection, '1.4', path.basename, path)
+
+    assert estimate.rows > 0
+    assert [statement for statement, error in estimate.errors] == [
+        'UPDATE north_app_book SET foo = 1;']
+    assert 'foo' in estimate.errors[0][1]
@@ -0,0 +1,339 @@
+from django.apps import apps
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+
+import pytest
+
+from django_north.management import fixtures
+
+
+@pytest.mark.django_db
+def test_get_fixtures_diff(django_assert_num_queries):
+    # test DB has all the fixtures
+    with django_assert_num_queries(2):
+        diff = fixtures.get_fixtures_diff()
+    assert diff == ([], [], [])
+
+    # unknown contenttype
+    unknown = ContentType.objects.create(app_label='north_app', model='foo')
+    # unknown contenttype, for an app without models: ignored
+    ContentType.objects.create(app_label='unknown_app', model='foo')
+    # missing contenttype
+    ContentType.objects.filter(app_label='north_app', model='reader').delete()
+    # missing permissions
+    Permission.objects.filter(codename__in=['add_book', 'view_book']).delete()
+
+    diff = fixtures.get_fixtures_diff()
+    assert diff.unknown_contenttypes == [unknown]
+    assert [
+        (ct.app_label, ct.model) for ct in diff.missing_contenttypes
+    ] == [('north_app', 'reader')]
+    # no permission for the missing contenttype
+    assert [
+        (perm.content_type.model, perm.codename, perm.name)
+        for perm in diff.missing_permissions
+    ] == [
+        ('book', 'add_book', 'Can add book'),
+        ('book', 'view_book', 'Can view book'),
+    ]
+
+    # only for some apps
+    diff = fixtures.get_fixtures_diff(
+        app_configs=[apps.get_app_config('auth')])
+    assert diff == ([], [], [])
+
+
+@pytest.mark.django_db
+def test_apply_fixtures_diff(django_assert_num_queries):
+    unknown = ContentType.objects.create(app_label='north_app', model='foo')
+    ContentType.objects.filter(app_label='north_app', model='reader').delete()
+    Permission.objects.filter(codename__in=['add_book', 'view_book']).delete()
+    diff = fixtures.get_fixtures_diff()
+
+    # savepoint, create contenttypes, get their ids, create permissions,
+    # release savepoint
+    with django_assert_num_queries(5):
+        result = fixtures.apply_fixtures_diff(diff)
+    assert result == (0, 1, 6)
+    assert fixtures.get_fixtures_diff() == ([unknown], [], [])
+    assert Permission.objects.filter(
+        content_type__model='reader').count() == 4
+
+    result = fixtures.apply_fixtures_diff(
+        fixtures.get_fixtures_diff(), remove_unknown=True)
+    assert result == (1, 0, 0)
+    assert fixtures.get_fixtures_diff() == ([], [], [])
+
+
+def test_get_fixtures_manifest():
+    manifest = fixtures.get_fixtures_manifest(
+        app_configs=[apps.get_app_config('north_app')])
+    assert manifest == {
+        'version': 1,
+        'fixtures': {
+            'north_app': {
+                model: [
+                    'add_' + model, 'change_' + model, 'delete_' + model,
+                    'view_' + model]
+                for model in ['author', 'reader', 'book']
+            },
+        },
+    }
+
+
+def test_read_fixtures_manifest(tmpdir):
+    path = str(tmpdir.join('manifest.json'))
+    manifest = fixtures.get_fixtures_manifest()
+    fixtures.write_fixtures_manifest(manifest, path)
+    assert fixtures.read_fixtures_manifest(path) == manifest
+
+    tmpdir.join('manifest.json').write('{"version": 42}')
+    with pytest.raises(ValueError):
+        fixtures.read_fixtures_manifest(path)
+
+
+@pytest.mark.django_db
+def test_get_manifest_missing_fixtures(django_assert_num_queries):
+    manifest = fixtures.get_fixtures_manifest()
+
+    # test DB has all the fixtures
+    with django_assert_num_queries(1):
+        result = fixtures.get_manifest_missing_fixtures(manifest)
+    assert result == ([], [])
+
+    ContentType.objects.filter(app_label='north_app', model='reader').delete()
+    Permission.objects.filter(codename__in=['add_book', 'view_book']).delete()
+
+    with django_assert_num_queries(1):
+        result = fixtures.get_manifest_missing_fixtures(manifest)
+    assert result == (
+        [('north_app', 'reader')],
+        [
+            ('north_app', 'book', 'add_book'),
+            ('north_app', 'book', 'view_book'),
+            ('north_app', 'reader', 'add_reader'),
+            ('north_app', 'reader', 'change_reader'),
+            ('north_app', 'reader', 'delete_reader'),
+            ('north_app', 'reader', 'view_reader'),
+        ],
+    )
+
+
+def test_offline_fixtures_statements():
+    offline_fixtures = fixtures.OfflineFixtures()
+    offline_fixtures.parse(
+        "BEGIN;\n"
+        "INSERT INTO django_content_type(app_label, model) "
+        "VALUES('myapp', 'mymodel1');\n"
+        "INSERT INTO django_content_type(app_label, model) "
+        "VALUES('myapp', 'mymodel2');\n"
+        "INSERT INTO auth_permission(codename, name, content_type_id) "
+        "VALUES('perm1', 'Perm1', (SELECT id FROM django_content_type "
+        "WHERE app_label = 'myapp' AND model = 'mymodel1'));\n"
+        "INSERT INTO auth_permission(codename, name, content_type_id) "
+        "VALUES('perm2', 'Perm2', (SELECT id FROM django_content_type "
+        "WHERE app_label = 'myapp' AND model = 'mymodel2'));\n"
+        "INSERT INTO foo(app_label, model) VALUES('foo', 'bar');\n"
+        "DELETE FROM django_content_type "
+        "WHERE app_label = 'myapp' AND model = 'mymodel2';\n"
+        "COMMIT;\n")
+
+    assert offline_fixtures.content_types == {('myapp', 'mymodel1')}
+    assert offline_fixtures.permissions == {('myapp', 'mymodel1', 'perm1')}
+
+
+def test_offline_fixtures_set():
+    offline_fixtures = fixtures.OfflineFixtures()
+    offline_fixtures.parse(
+        "INSERT INTO django_content_type(app_label, model) VALUES\n"
+        "    ('myapp', 'mymodel1'),\n"
+        "    ('myapp', 'mymodel2'),\n"
+        "    ('myapp', 'o''model');\n"
+        "INSERT INTO auth_permission(codename, name, content_type_id)\n"
+        "SELECT v.codename, v.name, ct.id FROM (VALUES\n"
+        "    ('perm1', 'Perm1', 'myapp', 'mymodel1'),\n"
+        "    ('perm2', 'Perm2', 'myapp', 'o''model')\n"
+        ") AS v(codename, name, app_label, model)\n"
+        "JOIN django_content_type ct "
+        "ON ct.app_label = v.app_label AND ct.model = v.model;\n"
+        "DELETE FROM django_content_type WHERE (app_label, model) IN (VALUES\n"
+        "    ('myapp', 'mymodel2'));\n")
+
+    assert offline_fixtures.content_types == {
+        ('myapp', 'mymodel1'), ('myapp', "o'model")}
+    assert offline_fixtures.permissions == {
+        ('myapp', 'mymodel1', 'perm1'), ('myapp', "o'model", 'perm2')}
+
+
+def test_offline_fixtures_pg_dump():
+    offline_fixtures = fixtures.OfflineFixtures()
+    offline_fixtures.parse(
+        "INSERT INTO public.django_content_type VALUES (1, 'myapp', 'm1');\n"
+        "INSERT INTO public.django_content_type VALUES (2, 'myapp', 'm2');\n"
+        "INSERT INTO public.auth_permission VALUES (1, 'Perm1', 1, 'p1');\n"
+        "INSERT INTO public.auth_permission VALUES (2, 'Perm2', 2, 'p2');\n")
+
+    assert offline_fixtures.content_types == {
+        ('myapp', 'm1'), ('myapp', 'm2')}
+    assert offline_fixtures.permissions == {
+        ('myapp', 'm1', 'p1'), ('myapp', 'm2', 'p2')}
+
+
+def test_offline_fixtures_pg_dump_copy():
+    offline_fixtures = fixtures.OfflineFixtures()
+    offline_fixtures.parse(
+        "COPY public.django_content_type (id, app_label, model) FROM stdin;\n"
+        "1\tmyapp\tm1\n"
+        "2\tmyapp\tm\\\\2\n"
+        "\\.\n"
+        "COPY public.auth_permission (id, name, content_type_id, codename) "
+        "FROM stdin;\n"
+        "1\tPerm1\t1\tp1\n"
+        "2\tPerm\\t2\t2\tp2\n"
+        "\\.\n"
+        "COPY public.foo (id) FROM stdin;\n"
+        "1\n"
+        "\\.\n")
+
+    assert offline_fixtures.content_types == {
+        ('myapp', 'm1'), ('myapp', 'm\\2')}
+    assert offline_fixtures.permissions == {
+        ('myapp', 'm1', 'p1'), ('myapp', 'm\\2', 'p2')}
+
+
+def test_offline_fixtures_copy_error():
+    with pytest.raises(fixtures.FixturesParseError) as excinfo:
+        fixtures.OfflineFixtures().parse(
+            "COPY django_content_type (id, app_label, model) FROM stdin;\n"
+            "a\tmyapp\tm1\n"
+            "\\.\n")
+    assert str(excinfo.value) == (
+        "Malformed COPY data: "
+        "COPY django_content_type (id, app_label, model) FROM stdin;")
+
+
+def test_offline_fixtures_casts():
+    offline_fixtures = fixtures.OfflineFixtures()
+    offline_fixtures.parse(
+        "INSERT INTO django_content_type VALUES "
+        "('1'::integer, 'myapp'::character varying(100), 'm1'::text);\n"
+        "INSERT INTO auth_permission(content_type_id, codename) "
+        "VALUES (1::int, 'p1'::varchar);\n")
+
+    assert offline_fixtures.content_types == {('myapp', 'm1')}
+    assert offline_fixtures.permissions == {('myapp', 'm1', 'p1')}
+
+
+def test_offline_fixtures_truncate():
+    offline_fixtures = parse_offline_fixtures(
+        "TRUNCATE auth_permission RESTART IDENTITY;")
+    assert len(offline_fixtures.content_types) == 3
+    assert offline_fixtures.permissions == set()
+
+    offline_fixtures = parse_offline_fixtures(
+        "TRUNCATE TABLE ONLY public.django_content_type CASCADE;")
+    assert offline_fixtures.content_types == set()
+    assert offline_fixtures.permissions == set()
+
+
+def parse_offline_fixtures(sql_text):
+    offline_fixtures = fixtures.OfflineFixtures()
+    offline_fixtures.parse(
+        "INSERT INTO django_content_type VALUES (1, 'myapp', 'm1');\n"
+        "INSERT INTO django_content_type VALUES (2, 'myapp', 'm2');\n"
+        "INSERT INTO django_content_type VALUES (3, 'other', 'm1');\n"
+        "INSERT INTO auth_permission VALUES (1, 'Perm1', 1, 'p1');\n"
+        "INSERT INTO auth_permission VALUES (2, 'Perm2', 1, 'p2');\n"
+        "INSERT INTO auth_permission VALUES (3, 'Perm1', 2, 'p1');\n"
+        "INSERT INTO auth_permission VALUES (4, 'Perm1', 3, 'p1');\n")
+    offline_fixtures.parse(sql_text)
+    return offline_fixtures
+
+
+@pytest.mark.parametrize("sql_text,permissions", [
+    ("DELETE FROM auth_permission WHERE codename = 'p1' AND "
+     "content_type_id = (SELECT id FROM django_content_type "
+     "WHERE app_label = 'myapp' AND model = 'm1');",
+     {('myapp', 'm1', 'p2'), ('myapp', 'm2', 'p1'), ('other', 'm1', 'p1')}),
+    ("DELETE FROM auth_permission WHERE content_type_id = 1;",
+     {('myapp', 'm2', 'p1'), ('other', 'm1', 'p1')}),
+    ("DELETE FROM public.auth_permission WHERE codename = 'p1';",
+     {('myapp', 'm1', 'p2')}),
+    ("DELETE FROM auth_permission WHERE content_type_id IN ("
+     "SELECT id FROM django_content_type WHERE app_label = 'myapp');",
+     {('other', 'm1', 'p1')}),
+    ("DELETE FROM auth_permission "
+     "WHERE (codename, app_label, model) IN (VALUES "
+     "('p1', 'myapp', 'm2'), ('p1', 'other', 'm1'));",
+     {('myapp', 'm1', 'p1'), ('myapp', 'm1', 'p2')}),
+    ("DELETE FROM auth_permission;", set()),
+])
+def test_offline_fixtures_delete_permissions(sql_text, permissions):
+    offline_fixtures = parse_offline_fixtures(sql_text)
+    assert offline_fixtures.permissions == permissions
+    assert len(offline_fixtures.content_types) == 3
+
+
+def test_offline_fixtures_delete_content_types():
+    offline_fixtures = parse_offline_fixtures(
+        "DELETE FROM django_content_type WHERE app_label = 'myapp';")
+    assert offline_fixtures.content_types == {('other', 'm1')}
+    assert offline_fixtures.permissions == {('other', 'm1', 'p1')}
+
+    offline_fixtures = parse_offline_fixtures(
+        'DELETE FROM django_content_type WHERE "app_label" = \'myapp\';')
+    assert offline_fixtures.content_types == {('other', 'm1')}
+
+    offline_fixtures = parse_offline_fixtures(
+        "DELETE FROM django_content_type WHERE id = 2;")
+    assert offline_fixtures.content_types == {
+        ('myapp', 'm1'), ('other', 'm1')}
+
+    # no WHERE: all the contenttypes and their permissions
+    offline_fixtures = parse_offline_fixtures(
+        "DELETE FROM django_content_type;")
+    assert offline_fixtures.content_types == set()
+    assert offline_fixtures.permissions == set()
+
+
+@pytest.mark.parametrize("sql_text,error", [
+    ("INSERT INTO django_content_type", "Malformed statement"),
+    ("INSERT INTO django_content_type(app_label, model", "Malformed"),
+    ("INSERT INTO auth_permission VALUES (1, 'Perm1'", "Malformed"),
+    ("DELETE FROM auth_permission WHERE codename LIKE 'p%';",
+     "Unsupported DELETE condition"),
+    ("DELETE FROM django_content_type WHERE app_label = 'a' OR "
+     "model = 'b';", "Unsupported DELETE condition"),
+    ("DELETE FROM auth_permission WHERE name = 'Perm1';",
+     "Unsupported DELETE condition on name"),
+    ("DELETE FROM django_content_type USING foo WHERE foo.id = 1;",
+     "Unsupported DELETE"),
+    ("UPDATE django_content_type SET model = 'm2' WHERE model = 'm1';",
+     "Unsupported UPDATE"),
+    ("UPDATE public.auth_permission SET codename = 'p2';",
+     "Unsupported UPDATE"),
+    ("COPY django_content_type FROM '/tmp/contenttypes.csv';",
+     "Unsupported COPY"),
+    ("COPY django_content_type FROM stdin WITH (FORMAT csv);",
+     "Unsupported COPY"),
+])
+def test_offline_fixtures_parse_error(sql_text, error):
+    with pytest.raises(fixtures.FixturesParseError) as excinfo:
+        fixtures.OfflineFixtures().parse(sql_text)
+    assert error in str(excinfo.value)
+    assert sql_text.rstrip(';') in str(excinfo.value)
+
+
+def test_get_offline_fixtures_diff(mocker, settings):
+    # no DB access
+    assert fixtures.get_offline_fixtures_diff(connection) == ([], [], [])
+
+    # 1.3 adds the reader model
+    settings.NORTH_TARGET_VERSION = '1.2'
+    diff = fixtures.get_offline_fixtures_diff(connection)
+    assert diff.unknown_contenttypes == []
+    assert [
+        (ct.app_label, ct.model) for ct in diff.missing_contenttypes
+    ] == [('north_app', 'reader')]
+    assert diff.missing_permissions == []
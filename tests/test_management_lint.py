@@ -0,0 +1,120 @@
+from django.db import connection
+
+import pytest
+
+from django_north.management import lint
+from django_north.management import sql
+
+
+@pytest.mark.parametrize("statement,server_version,expected", [
+    ('CREATE INDEX idx ON north_app_book (title)', None,
+     [('north_app_book', 'create-index')]),
+    ('CREATE UNIQUE INDEX CONCURRENTLY idx ON foo (bar)', None, []),
+    ('REINDEX TABLE foo', None, [('foo', 'reindex')]),
+    ('REINDEX TABLE CONCURRENTLY foo', None, []),
+    ('VACUUM FULL foo', None, [('foo', 'vacuum-full')]),
+    ('VACUUM ANALYZE foo', None, []),
+    ('CLUSTER foo USING idx', None, [('foo', 'cluster')]),
+    ('ALTER TABLE foo ADD COLUMN bar integer DEFAULT 0', None,
+     [('foo', 'add-column-default')]),
+    ('ALTER TABLE foo ADD COLUMN bar integer DEFAULT 0', 90600,
+     [('foo', 'add-column-default')]),
+    ('ALTER TABLE foo ADD COLUMN bar integer DEFAULT 0', 110000, []),
+    ('ALTER TABLE foo ADD COLUMN bar float DEFAULT random()', 120000,
+     [('foo', 'add-column-default')]),
+    ('ALTER TABLE foo ADD COLUMN bar bigserial', 120000,
+     [('foo', 'add-column-default')]),
+    ('ALTER TABLE foo ADD COLUMN bar integer', None, []),
+    ('ALTER TABLE ONLY public.foo ALTER COLUMN bar TYPE bigint, '
+     'ALTER bar SET NOT NULL', None,
+     [('public.foo', 'alter-column-type'), ('public.foo', 'set-not-null')]),
+    ('ALTER TABLE foo ADD CONSTRAINT fk FOREIGN KEY (bar_id) '
+     'REFERENCES bar (id)', None, [('foo', 'add-foreign-key')]),
+    ('ALTER TABLE foo ADD CONSTRAINT fk FOREIGN KEY (bar_id) '
+     'REFERENCES bar (id) NOT VALID', None, []),
+    ('ALTER TABLE foo ADD CONSTRAINT ck CHECK (bar > 0)', None,
+     [('foo', 'add-check')]),
+    ('ALTER TABLE foo ADD PRIMARY KEY (id, bar)', None,
+     [('foo', 'add-unique')]),
+    ('ALTER TABLE foo ADD CONSTRAINT uniq UNIQUE USING INDEX idx', None, []),
+    ('ALTER TABLE foo SET TABLESPACE bar', None, [('foo', 'set-storage')]),
+    ('ALTER TABLE foo RENAME COLUMN bar TO baz', None, []),
+    ('ALTER TABLE "only" ALTER COLUMN "type" SET DEFAULT 1', None, []),
+    ('UPDATE foo SET bar = 1', None, []),
+])
+def test_classify_statement(statement, server_version, expected):
+    assert lint.classify_statement(
+        sql.tokenize(statement), server_version) == expected
+
+
+def test_lint_migrations(tmpdir):
+    path1 = tmpdir.join('1.0-ddl.sql')
+    path1.write(
+        "CREATE INDEX idx ON foo (bar);\n"
+        "ALTER TABLE bar ALTER COLUMN baz TYPE bigint;\n")
+    path2 = tmpdir.join('1.1-ddl.sql')
+    path2.write(
+        "VACUUM FULL baz;\n"
+        "CREATE INDEX CONCURRENTLY idx2 ON foo (baz);\n"
+        "REINDEX INDEX idx;\n")
+    paths = [('1.0-ddl.sql', str(path1)), ('1.1-ddl.sql', str(path2))]
+
+    # without stats: the rewrites first
+    findings = lint.lint_migrations(paths)
+    assert [
+        (finding.name, finding.table, finding.rule) for finding in findings
+    ] == [
+        ('1.0-ddl.sql', 'bar', 'alter-column-type'),
+        ('1.1-ddl.sql', 'baz', 'vacuum-full'),
+        ('1.0-ddl.sql', 'foo', 'create-index'),
+        ('1.1-ddl.sql', None, 'reindex'),
+    ]
+    assert findings[0].statement == (
+        "ALTER TABLE bar ALTER COLUMN baz TYPE bigint;")
+    assert findings[0].size is None and findings[0].seconds is None
+
+    # ranked by expected blocking time
+    sizes = {'foo': 1000 * 1024 * 1024, 'bar': 10 * 1024 * 1024}
+    findings = lint.lint_migrations(
+        paths, sizes=sizes, throughput=100 * 1024 * 1024)
+    assert [
+        (finding.table, finding.seconds) for finding in findings
+    ] == [
+        ('foo', 10.), ('bar', .3), ('baz', None), (None, None),
+    ]
+    assert lint.format_finding(findings[0]) == (
+        "1.0-ddl.sql: CREATE INDEX without CONCURRENTLY on foo: "
+        "SHARE lock, scans the table, 1000.0 MB, ~10s")
+    assert lint.format_finding(findings[2]) == (
+        "1.1-ddl.sql: VACUUM FULL on baz: "
+        "ACCESS EXCLUSIVE lock, rewrites the table")
+    assert lint.format_finding(findings[3]) == (
+        "1.1-ddl.sql: REINDEX without CONCURRENTLY: "
+        "SHARE lock, scans the table")
+
+
+@pytest.mark.parametrize("size,expected", [
+    (12, "12 bytes"),
+    (2048, "2.0 kB"),
+    (3 * 1024 ** 3, "3.0 GB"),
+    (2 * 1024 ** 4, "2.0 TB"),
+])
+def test_format_size(size, expected):
+    assert lint.format_size(size) == expected
+
+
+@pytest.mark.django_db
+def test_table_stats(tmpdir):
+    stats = lint.get_table_stats(connection)
+    assert stats['version'] == lint.STATS_VERSION
+    assert stats['tables']['north_app_book']['bytes'] > 0
+
+    path = str(tmpdir.join('stats.json'))
+    lint.write_table_stats(stats, path)
+    sizes = lint.read_table_stats(path)
+    assert sizes['north_app_book'] == stats['tables']['north_app_book'][
+        'bytes']
+
+    tmpdir.join('bad.json').write('{"version": 0}')
+    with pytest.raises(ValueError):
+        lint.read_table_stats(str(tmpdir.join('bad.json')))
@@ -0,0 +1,108 @@
+import threading
+
+from django.db import connection
+from django.db import connections
+
+import pytest
+
+from django_north.management import lock
+
+
+def get_other_connection():
+    wrapper = connections['default']
+    return wrapper.__class__(dict(wrapper.settings_dict), wrapper.alias)
+
+
+def try_lock(other):
+    with other.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_try_advisory_lock(%s)", [lock.MIGRATE_LOCK_ID])
+        locked = cursor.fetchone()[0]
+        if locked:
+            cursor.execute(
+                "SELECT pg_advisory_unlock(%s)", [lock.MIGRATE_LOCK_ID])
+    return locked
+
+
+def test_get_migrations_fingerprint(settings):
+    fingerprint = lock.get_migrations_fingerprint(connection)
+    assert len(fingerprint) == 64
+    assert lock.get_migrations_fingerprint(connection) == fingerprint
+
+    settings.NORTH_TARGET_VERSION = '1.2'
+    assert lock.get_migrations_fingerprint(connection) != fingerprint
+
+
+@pytest.mark.django_db
+def test_store_fingerprint():
+    assert lock.get_stored_fingerprint(connection) is None
+
+    lock.store_fingerprint(connection, 'foo')
+    assert lock.get_stored_fingerprint(connection) == 'foo'
+    lock.store_fingerprint(connection, 'bar')
+    assert lock.get_stored_fingerprint(connection) == 'bar'
+
+
+@pytest.mark.django_db
+def test_advisory_lock():
+    other = get_other_connection()
+    try:
+        with lock.advisory_lock(connection):
+            assert try_lock(other) is False
+        assert try_lock(other) is True
+    finally:
+        other.close()
+
+
+@pytest.mark.django_db
+def test_migrate_lock(settings):
+    # disabled
+    with lock.migrate_lock(connection) as run:
+        assert run is True
+    assert lock.get_stored_fingerprint(connection) is None
+
+    settings.NORTH_MIGRATE_LOCK = True
+    with lock.migrate_lock(connection) as run:
+        assert run is True
+    assert lock.get_stored_fingerprint(connection) == (
+        lock.get_migrations_fingerprint(connection))
+
+    with lock.migrate_lock(connection) as run:
+        assert run is False
+
+    # new migrations
+    settings.NORTH_TARGET_VERSION = '1.2'
+    with lock.migrate_lock(connection) as run:
+        assert run is True
+
+
+@pytest.mark.django_db(transaction=True)
+def test_migrate_lock_concurrent(settings):
+    settings.NORTH_MIGRATE_LOCK = True
+    results = []
+
+    def wait_migrate():
+        other = get_other_connection()
+        try:
+            with lock.migrate_lock(other) as run:
+                results.append(run)
+        finally:
+            other.close()
+            # transaction.atomic opens the connection of the thread
+            connections.close_all()
+
+    try:
+        with lock.migrate_lock(connection) as run:
+            assert run is True
+            thread = threading.Thread(target=wait_migrate)
+            thread.start()
+            # the other call waits for the lock
+            thread.join(0.5)
+            assert thread.is_alive()
+            assert results == []
+        thread.join()
+
+        assert results == [False]
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TABLE IF EXISTS north_migrate_fingerprint")
@@ -15,3 +15,189 @@ def test_get_applied_versions(mocker):
     recorder.record_applied('1.10', 'fake-ddl.sql')
     result = migrations.get_applied_versions(connection)
     assert result == ['1.0', '1.1', '1.2', '1.3', '1.10']
+
+
+@pytest.mark.django_db
+def test_get_unapplied_migrations():
+    # test DB is migrated to the target version
+    assert migrations.get_unapplied_migrations(connection) == []
+
+    recorder = migrations.MigrationRecorder(connection)
+    recorder.record_unapplied('1.3', '1.3-add-readers-dml.sql')
+    recorder.record_unapplied('1.3', '1.3-add-readers-ddl.sql')
+    assert migrations.get_unapplied_migrations(connection) == [
+        ('1.3', '1.3-add-readers-ddl.sql'),
+        ('1.3', '1.3-add-readers-dml.sql'),
+    ]
+
+
+@pytest.mark.django_db
+def test_refresh_ledger(mocker, settings):
+    settings.NORTH_LEDGER = True
+    # no septentrion initialization (connection, CREATE_TABLE)
+    spy_known_versions = mocker.spy(
+        migrations.septentrion, 'get_known_versions')
+    migrations.refresh_ledger(connection)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT version, sort_key, cardinality(applied), "
+            "migration_id = (SELECT max(id) FROM django_migrations) "
+            "FROM north_version_ledger ORDER BY sort_key")
+        rows = cursor.fetchall()
+    assert rows == [
+        ('1.0', [1, 0], 5, True), ('1.1', [1, 1], 4, True),
+        ('1.2', [1, 2], 3, True), ('1.3', [1, 3], 5, True)]
+
+    recorder = migrations.MigrationRecorder(connection)
+    recorder.record_unapplied('1.3', '1.3-add-readers-dml.sql')
+    recorder.record_unapplied('1.2', '1.2-0-version-dml.sql')
+    migrations.refresh_ledger(connection)
+
+    assert migrations.get_applied_versions(connection) == [
+        '1.0', '1.1', '1.2', '1.3']
+    assert migrations.get_current_version_from_ledger(connection) == '1.1'
+    assert spy_known_versions.called is False
+    assert migrations.is_version_applied('1.1', connection) is True
+    assert migrations.is_version_applied('1.3', connection) is False
+    assert migrations.is_version_applied('2.0', connection) is False
+
+
+@pytest.mark.django_db
+def test_ledger_obsolete_migration(settings):
+    settings.NORTH_LEDGER = True
+    recorder = migrations.MigrationRecorder(connection)
+    # a file renamed after being applied: same count, a file pending
+    recorder.record_unapplied('1.3', '1.3-add-readers-dml.sql')
+    recorder.record_applied('1.3', '1.3-add-readers-old-dml.sql')
+    migrations.refresh_ledger(connection)
+
+    assert migrations.is_version_applied('1.3', connection) is False
+    assert migrations.get_current_version_from_ledger(connection) == '1.2'
+
+
+@pytest.mark.django_db
+def test_ledger_stale(mocker, settings):
+    settings.NORTH_LEDGER = True
+    recorder = migrations.MigrationRecorder(connection)
+    recorder.record_unapplied('1.3', '1.3-add-readers-dml.sql')
+    migrations.refresh_ledger(connection)
+    mock_fetch = mocker.spy(migrations, 'get_applied_migrations')
+    assert migrations.get_current_version_from_ledger(connection) == '1.2'
+    assert mock_fetch.called is False
+
+    # applied without migrate: django_migrations is read
+    recorder.record_applied('1.3', '1.3-add-readers-dml.sql')
+    assert migrations.get_current_version_from_ledger(connection) == '1.3'
+    assert migrations.is_version_applied('1.3', connection) is True
+    assert mock_fetch.called is True
+
+    # a migration file added to an applied version
+    migrations.refresh_ledger(connection)
+    original_mapping = migrations.files.get_migrations_files_mapping
+
+    def add_migration(settings, version):
+        mapping = original_mapping(settings=settings, version=version)
+        if version.original_string == '1.3':
+            mapping['1.3-new-ddl.sql'] = None
+        return mapping
+
+    mocker.patch.object(
+        migrations.files, 'get_migrations_files_mapping',
+        side_effect=add_migration)
+    assert migrations.get_current_version_from_ledger(connection) == '1.2'
+    assert migrations.is_version_applied('1.3', connection) is False
+
+
+@pytest.mark.django_db
+def test_ledger_disabled(settings):
+    recorder = migrations.MigrationRecorder(connection)
+    recorder.record_unapplied('1.3', '1.3-add-readers-dml.sql')
+
+    # no ledger: read django_migrations
+    assert migrations.get_current_version_from_ledger(connection) == '1.2'
+    assert migrations.get_applied_versions(connection) == [
+        '1.0', '1.1', '1.2', '1.3']
+    assert migrations.is_version_applied('1.2', connection) is True
+    assert migrations.is_version_applied('1.3', connection) is False
+
+    # enabled, but not created yet
+    settings.NORTH_LEDGER = True
+    assert migrations.get_current_version_from_ledger(connection) == '1.2'
+    assert migrations.get_applied_versions(connection) == [
+        '1.0', '1.1', '1.2', '1.3']
+    assert migrations.is_version_applied('1.3', connection) is False
+
+
+@pytest.mark.django_db
+def test_compact_history(settings):
+    recorder = migrations.MigrationRecorder(connection)
+    recorder.record_unapplied('1.1', '1.1-0-version-dml.sql')
+    names = sorted(recorder.migration_qs.filter(
+        app='1.0').values_list('name', flat=True))
+
+    # 1.1 is not fully applied
+    assert migrations.compact_history(connection, '1.2') == ['1.0']
+
+    assert list(recorder.migration_qs.filter(app='1.0').values_list(
+        'name', flat=True)) == [migrations.COMPACTED_MIGRATION]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM north_migrations_archive WHERE app = '1.0' "
+            "ORDER BY name")
+        assert [row[0] for row in cursor.fetchall()] == names
+        # the marker keeps the date of the last migration
+        cursor.execute(
+            "SELECT m.applied = (SELECT max(applied) "
+            "FROM north_migrations_archive WHERE app = '1.0') "
+            "FROM django_migrations m WHERE m.app = '1.0'")
+        assert cursor.fetchone()[0] is True
+    assert migrations.get_applied_migrations('1.0', connection) == names
+    assert migrations.get_applied_versions(connection) == [
+        '1.0', '1.1', '1.2', '1.3']
+    assert migrations.is_version_applied('1.0', connection) is True
+    assert migrations.get_unapplied_migrations(connection) == [
+        ('1.1', '1.1-0-version-dml.sql')]
+
+    # already compacted
+    assert migrations.compact_history(connection, '1.2') == []
+
+    settings.NORTH_LEDGER = True
+    migrations.refresh_ledger(connection)
+    assert migrations.is_version_applied('1.0', connection) is True
+    assert migrations.is_version_applied('1.1', connection) is False
+
+
+@pytest.mark.django_db
+def test_compact_history_new_migration(mocker, settings):
+    migrations.compact_history(connection, '1.1')
+
+    # a hotfix added to the compacted version
+    original_mapping = migrations.files.get_migrations_files_mapping
+
+    def add_hotfix(settings, version):
+        mapping = original_mapping(
+            settings=settings, version=version)
+        if version.original_string == '1.0':
+            mapping['1.0-hotfix-ddl.sql'] = None
+        return mapping
+
+    mocker.patch.object(
+        migrations.files, 'get_migrations_files_mapping',
+        side_effect=add_hotfix)
+
+    assert '1.0-hotfix-ddl.sql' not in migrations.get_applied_migrations(
+        '1.0', connection)
+    assert migrations.is_version_applied('1.0', connection) is False
+    assert migrations.get_unapplied_migrations(connection) == [
+        ('1.0', '1.0-hotfix-ddl.sql')]
+
+    settings.NORTH_LEDGER = True
+    migrations.refresh_ledger(connection)
+    assert migrations.is_version_applied('1.0', connection) is False
+
+    recorder = migrations.MigrationRecorder(connection)
+    recorder.record_applied('1.0', '1.0-hotfix-ddl.sql')
+    assert migrations.get_unapplied_migrations(connection) == []
+    migrations.refresh_ledger(connection)
+    assert migrations.is_version_applied('1.0', connection) is True
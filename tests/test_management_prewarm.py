@@ -0,0 +1,70 @@
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+
+import pytest
+
+from django_north.management import prewarm
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    ContentType.objects.clear_cache()
+    prewarm.clear_permission_cache()
+    yield
+    ContentType.objects.clear_cache()
+    prewarm.clear_permission_cache()
+
+
+@pytest.mark.django_db
+def test_prewarm_contenttypes(django_assert_num_queries):
+    with django_assert_num_queries(1):
+        prewarm.prewarm_contenttypes()
+
+    with django_assert_num_queries(0):
+        ct = ContentType.objects.get_for_model(Permission)
+        assert ContentType.objects.get_for_id(ct.pk) == ct
+        ContentType.objects.get_by_natural_key('north_app', 'book')
+
+
+@pytest.mark.django_db
+def test_get_permission(django_assert_num_queries):
+    # not in the lookup table
+    with django_assert_num_queries(1):
+        perm = prewarm.get_permission('north_app', 'book', 'add_book')
+    assert perm.codename == 'add_book'
+    assert perm.content_type.model == 'book'
+    with django_assert_num_queries(0):
+        assert prewarm.get_permission(
+            'north_app', 'book', 'add_book') == perm
+
+    with pytest.raises(Permission.DoesNotExist):
+        prewarm.get_permission('north_app', 'book', 'foo')
+
+    prewarm.clear_permission_cache()
+    with django_assert_num_queries(1):
+        prewarm.prewarm_permissions()
+    with django_assert_num_queries(0):
+        assert prewarm.get_permission(
+            'north_app', 'book', 'add_book') == perm
+        prewarm.get_permission('auth', 'user', 'change_user')
+
+
+@pytest.mark.parametrize("contenttypes", [True, False])
+@pytest.mark.parametrize("permissions", [True, False])
+def test_prewarm_caches(mocker, settings, contenttypes, permissions):
+    settings.NORTH_PREWARM_CONTENTTYPES = contenttypes
+    settings.NORTH_PREWARM_PERMISSIONS = permissions
+    mock_clear = mocker.patch(
+        'django.contrib.contenttypes.models.ContentTypeManager.clear_cache')
+    mock_contenttypes = mocker.patch(
+        'django_north.management.prewarm.prewarm_contenttypes')
+    mock_permissions = mocker.patch(
+        'django_north.management.prewarm.prewarm_permissions')
+    prewarm._permission_cache['default'] = {'foo': 'bar'}
+
+    prewarm.prewarm_caches('default')
+
+    assert mock_clear.called is True
+    assert 'default' not in prewarm._permission_cache
+    assert mock_contenttypes.called is contenttypes
+    assert mock_permissions.called is permissions
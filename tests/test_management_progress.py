@@ -0,0 +1,199 @@
+import os
+import pathlib
+import threading
+
+from django.db import connection
+from django.db import connections
+from django.db import DatabaseError
+
+import pytest
+from septentrion import runner
+
+from django_north.management import progress
+
+
+def get_activity(**kwargs):
+    values = {
+        'pid': 42, 'duration': 62.5, 'wait_event_type': None,
+        'wait_event': None, 'query': 'UPDATE  foo\nSET bar = 1',
+        'command': None, 'phase': None, 'done': None, 'total': None,
+        'unit': None,
+    }
+    values.update(kwargs)
+    return progress.Activity(**values)
+
+
+@pytest.mark.parametrize("kwargs,rate,expected", [
+    ({}, None, "[pid 42] running for 0:01:02: UPDATE foo SET bar = 1"),
+    ({'wait_event_type': 'Lock', 'wait_event': 'relation'}, None,
+     "[pid 42] running for 0:01:02, waiting for Lock:relation: "
+     "UPDATE foo SET bar = 1"),
+    ({'command': 'CREATE INDEX', 'phase': 'building index', 'done': 250,
+      'total': 1000, 'unit': 'blocks'}, None,
+     "[pid 42] CREATE INDEX, building index: 250/1000 blocks (25%)"),
+    ({'command': 'CREATE INDEX', 'phase': 'building index', 'done': 250,
+      'total': 1000, 'unit': 'blocks'}, 50,
+     "[pid 42] CREATE INDEX, building index: 250/1000 blocks (25%), "
+     "50 blocks/s, ETA 0:00:15"),
+    ({'command': 'CLUSTER', 'phase': 'index scanning heap', 'done': 300,
+      'unit': 'tuples', 'wait_event_type': 'Lock',
+      'wait_event': 'relation'}, 10,
+     "[pid 42] CLUSTER, index scanning heap: 300 tuples, 10 tuples/s, "
+     "waiting for Lock:relation"),
+])
+def test_format_activity(kwargs, rate, expected):
+    assert progress.format_activity(get_activity(**kwargs), rate) == expected
+
+
+def test_get_row_count():
+    output = "BEGIN\nUPDATE 12\nINSERT 0 3\nDELETE 0\nCOMMIT\n"
+
+    assert progress.get_row_count(output) == 15
+    assert progress.get_row_count("") == 0
+
+
+def test_get_application_name(monkeypatch):
+    monkeypatch.delenv('PGAPPNAME', raising=False)
+
+    assert progress.get_application_name(connection) == 'django_north'
+
+
+@pytest.mark.django_db(transaction=True)
+def test_get_activity():
+    wrapper = connections['default']
+    other = wrapper.__class__(dict(wrapper.settings_dict), wrapper.alias)
+    other.ensure_connection()
+    other.inc_thread_sharing()
+    pid = other.connection.get_backend_pid()
+    thread = threading.Thread(
+        target=lambda: other.cursor().execute('SELECT pg_sleep(1)'))
+    thread.start()
+    try:
+        with connection.cursor() as cursor:
+            for i in range(50):
+                activity = progress.get_activity(cursor, [pid], 'foo')
+                if activity:
+                    break
+                threading.Event().wait(0.02)
+    finally:
+        thread.join()
+        other.dec_thread_sharing()
+        other.close()
+
+    assert len(activity) == 1
+    assert activity[0].pid == pid
+    assert activity[0].query == 'SELECT pg_sleep(1)'
+    assert activity[0].command is None
+
+
+@pytest.mark.parametrize("pg_version,query", [
+    (160002, progress.ACTIVITY_QUERY),
+    (120000, progress.ACTIVITY_QUERY),
+    (110005, progress.VACUUM_ACTIVITY_QUERY),
+    (90600, progress.VACUUM_ACTIVITY_QUERY),
+    (90500, None),
+])
+def test_get_activity_query(pg_version, query):
+    assert progress.get_activity_query(pg_version) == query
+
+
+@pytest.mark.django_db
+def test_get_activity_vacuum_query():
+    with connection.cursor() as cursor:
+        assert progress.get_activity(
+            cursor, [], 'foo', progress.VACUUM_ACTIVITY_QUERY) == []
+
+
+def test_progress_reporter_poll(mocker):
+    activity = get_activity(
+        command='CREATE INDEX', phase='building index', done=100,
+        total=1000, unit='blocks')
+    mock_get_activity = mocker.patch(
+        'django_north.management.progress.get_activity',
+        return_value=[activity])
+    mocker.patch(
+        'django_north.management.progress.time.monotonic',
+        side_effect=[10, 12, 14])
+    reporter = progress.ProgressReporter(connection, print)
+
+    assert reporter.poll(None, [1]) == [
+        "[pid 42] CREATE INDEX, building index: 100/1000 blocks (10%)"]
+    mock_get_activity.return_value = [activity._replace(done=300)]
+    assert reporter.poll(None, [1]) == [
+        "[pid 42] CREATE INDEX, building index: 300/1000 blocks (30%), "
+        "100 blocks/s, ETA 0:00:07"]
+    # new phase: no rate
+    mock_get_activity.return_value = [
+        activity._replace(done=400, phase='validating index')]
+    assert reporter.poll(None, [1]) == [
+        "[pid 42] CREATE INDEX, validating index: 400/1000 blocks (40%)"]
+
+
+def test_report_loops(mocker):
+    mocker.patch.object(
+        runner.Script, '_run_simple', return_value="UPDATE 10\n")
+    lines = []
+    script = runner.Script(
+        None, ['--meta-psql:do-until-0\n', 'UPDATE foo;\n'],
+        pathlib.Path('/tmp/loop-dml.sql'))
+    simple_script = runner.Script(
+        None, ['UPDATE foo;\n'], pathlib.Path('/tmp/dml.sql'))
+
+    with progress.report_loops(lines.append):
+        assert script._run_simple() == "UPDATE 10\n"
+        script._run_simple()
+        simple_script._run_simple()
+
+    assert [line.rsplit(' in ', 1)[0] for line in lines] == [
+        "loop-dml.sql: iteration 1, 10 row(s)",
+        "loop-dml.sql: iteration 2, 10 row(s)",
+    ]
+    # restored
+    lines[:] = []
+    script._run_simple()
+    assert lines == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_report_progress(mocker, monkeypatch):
+    monkeypatch.delenv('PGAPPNAME', raising=False)
+    lines = []
+    mocker.patch.object(
+        progress.ProgressReporter, 'poll', return_value=['foo'])
+
+    with progress.report_progress(connection, lines.append, interval=0.01):
+        assert os.environ['PGAPPNAME'] == 'django_north'
+        threading.Event().wait(0.1)
+
+    assert 'PGAPPNAME' not in os.environ
+    assert lines and set(lines) == {'foo'}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_report_progress_database_error(mocker, caplog):
+    lines = []
+    poll = mocker.patch.object(
+        progress.ProgressReporter, 'poll',
+        side_effect=DatabaseError('permission denied'))
+
+    with progress.report_progress(connection, lines.append, interval=0.01):
+        threading.Event().wait(0.1)
+
+    # logged once, and no more polling
+    assert poll.call_count == 1
+    assert [record.getMessage() for record in caplog.records] == [
+        "Progress report stopped: permission denied"]
+    assert lines == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_report_progress_old_server(mocker, caplog):
+    mocker.patch.object(connections['default'], 'pg_version', 90500)
+    poll = mocker.patch.object(progress.ProgressReporter, 'poll')
+
+    with progress.report_progress(connection, print, interval=0.01):
+        threading.Event().wait(0.05)
+
+    assert not poll.called
+    assert [record.getMessage() for record in caplog.records] == [
+        "Progress report disabled: PostgreSQL 9.6+ is required"]
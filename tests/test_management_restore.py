@@ -0,0 +1,80 @@
+import pathlib
+
+import pytest
+from septentrion import configuration
+from septentrion import exceptions
+from septentrion import runner
+
+from django_north.management import restore
+
+
+def test_get_dump_path(tmpdir):
+    schema_path = pathlib.Path(str(tmpdir.join('schema_1.0.sql')))
+    assert restore.get_dump_path(schema_path) is None
+
+    tmpdir.join('schema_1.0.dump').write('')
+    assert restore.get_dump_path(schema_path) == pathlib.Path(
+        str(tmpdir.join('schema_1.0.dump')))
+
+    # directory format
+    tmpdir.mkdir('schema_1.1.dump')
+    assert restore.get_dump_path(pathlib.Path(
+        str(tmpdir.join('schema_1.1.sql')))) == pathlib.Path(
+        str(tmpdir.join('schema_1.1.dump')))
+
+
+def test_get_best_schema_version(tmpdir):
+    for version in ['1.0', '1.1', '1.2']:
+        tmpdir.mkdir(version)
+    schemas = tmpdir.mkdir('schemas')
+    schemas.join('schema_1.0.sql').write('')
+    config = configuration.Settings(
+        migrations_root=str(tmpdir), target_version='1.2')
+    assert restore.get_best_schema_version(config).original_string == '1.0'
+
+    # a directory format archive, without SQL schema file
+    schemas.mkdir('schema_1.1.dump')
+    assert restore.get_best_schema_version(config).original_string == '1.1'
+
+    config = configuration.Settings(
+        migrations_root=str(tmpdir), target_version='1.2',
+        schema_version='1.1')
+    assert restore.get_best_schema_version(config).original_string == '1.1'
+
+    schemas.join('schema_1.0.sql').remove()
+    schemas.join('schema_1.1.dump').remove()
+    with pytest.raises(exceptions.SeptentrionException):
+        restore.get_best_schema_version(config)
+
+
+def test_get_restore_jobs(settings):
+    assert restore.get_restore_jobs() >= 1
+
+    settings.NORTH_RESTORE_JOBS = 3
+    assert restore.get_restore_jobs() == 3
+
+
+def test_restore_dump(mocker):
+    run = mocker.patch('subprocess.run')
+    config = configuration.Settings(
+        host='db', port=5433, dbname='north', username='north',
+        password='secret')
+
+    restore.restore_dump(config, pathlib.Path('schema_1.0.dump'), 4)
+
+    args, kwargs = run.call_args
+    assert args[0] == [
+        'pg_restore', '--exit-on-error', '--no-owner', '--jobs', '4',
+        '--dbname', 'north', 'schema_1.0.dump']
+    assert kwargs['env']['PGHOST'] == 'db'
+    assert kwargs['env']['PGPORT'] == '5433'
+    assert kwargs['env']['PGPASSWORD'] == 'secret'
+
+
+def test_restore_dump_error(tmpdir):
+    path = tmpdir.join('schema_1.0.dump')
+    path.write('not a dump')
+    config = configuration.Settings(dbname='north')
+
+    with pytest.raises(runner.SQLRunnerException):
+        restore.restore_dump(config, pathlib.Path(str(path)), 1)
@@ -0,0 +1,91 @@
+from django_north.management import sql
+from django_north.management.sql import Token
+
+
+def test_quote_literal():
+    assert sql.quote_literal("foo") == "'foo'"
+    assert sql.quote_literal("it's") == "'it''s'"
+
+
+def test_tokenize():
+    assert sql.tokenize(
+        "INSERT INTO \"Foo\"(a) VALUES('it''s', 42); -- comment ;\n"
+        "/* other; comment */ select") == [
+        Token('word', 'INSERT'),
+        Token('word', 'INTO'),
+        Token('identifier', 'Foo'),
+        Token('punctuation', '('),
+        Token('word', 'A'),
+        Token('punctuation', ')'),
+        Token('word', 'VALUES'),
+        Token('punctuation', '('),
+        Token('string', "it's"),
+        Token('punctuation', ','),
+        Token('number', '42'),
+        Token('punctuation', ')'),
+        Token('punctuation', ';'),
+        Token('word', 'SELECT'),
+    ]
+
+
+def test_split_statements():
+    assert sql.split_statements(
+        "BEGIN;\n"
+        "-- a comment; with a semicolon\n"
+        "INSERT INTO foo VALUES ('a;b');\n"
+        "UPDATE \"foo;\" SET a = 1\n"
+        ";\n"
+        "COMMIT;\n"
+        "-- end\n") == [
+        "BEGIN;",
+        "-- a comment; with a semicolon\n"
+        "INSERT INTO foo VALUES ('a;b');",
+        "UPDATE \"foo;\" SET a = 1\n;",
+        "COMMIT;",
+    ]
+
+
+def test_tokenize_quoting():
+    assert sql.tokenize(
+        "SELECT E'it\\'s', $$a 'b' $x$$, $tag$ $$ $tag$, $1, \"a\"\"b\"") == [
+        Token('word', 'SELECT'),
+        Token('string', "it\\'s"),
+        Token('punctuation', ','),
+        Token('string', "a 'b' $x"),
+        Token('punctuation', ','),
+        Token('string', " $$ "),
+        Token('punctuation', ','),
+        Token('punctuation', '$'),
+        Token('number', '1'),
+        Token('punctuation', ','),
+        Token('identifier', 'a"b'),
+    ]
+
+
+def test_iter_statements():
+    lines = [
+        "CREATE FUNCTION f() RETURNS int AS $body$\n",
+        "    SELECT 1; -- ;\n",
+        "$body$ LANGUAGE sql;\n",
+        "/* a /* nested ; */ comment; */\n",
+        "COPY foo (a) FROM stdin;\n",
+        "x;y\n",
+        "\\.\n",
+        "\\set ON_ERROR_STOP on\n",
+        "UPDATE foo SET a = 'multi\n",
+        "line; string';\n",
+        "-- end\n",
+    ]
+    statements = list(sql.iter_statements(iter(lines)))
+
+    assert [statement.kind for statement in statements] == [
+        'sql', 'copy', 'meta', 'sql', 'sql']
+    assert statements[0].text == ''.join(lines[:3]).rstrip('\n')
+    assert statements[1].comments == ['/* a /* nested ; */ comment; */']
+    assert statements[1].text.strip().endswith('FROM stdin;')
+    assert statements[1].data == 'x;y\n'
+    assert statements[2].tokens == [
+        Token('meta', '\\set ON_ERROR_STOP on')]
+    assert statements[3].tokens[-2] == Token('string', 'multi\nline; string')
+    # the trailing comment
+    assert statements[4].tokens == []
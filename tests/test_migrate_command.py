@@ -1,3 +1,7 @@
+import os
+import shutil
+import subprocess
+
 import dj_database_url
 import psycopg2
 
@@ -8,7 +12,10 @@ from django.db import DEFAULT_DB_ALIAS
 import pytest
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 
+from django_north.management import connection as north_connection
+from django_north.management import explain
 from django_north.management import migrations
+from django_north.management import restore
 
 import septentrion
 
@@ -19,11 +26,14 @@ def test_migrate_command_override(mocker):
     mock_django_handle = mocker.patch(
         'django.core.management.commands.migrate.Command.handle')
     mock_sept_migrate = mocker.patch('septentrion.migrate')
+    mock_prewarm = mocker.patch(
+        'django_north.management.commands.migrate.prewarm_caches')
 
     call_command('migrate')
 
     assert mock_django_handle.called is False
     assert mock_sept_migrate.called is True
+    mock_prewarm.assert_called_once_with('default')
 
 
 @pytest.mark.parametrize("manage", [True, False, None])
@@ -111,6 +121,118 @@ def test_migrate_command_for_real(django_db_setup_no_init, settings):
             settings.NORTH_TARGET_VERSION)
 
 
+@pytest.mark.django_db
+@pytest.mark.parametrize("fallback", [False, True])
+def test_migrate_command_grouped(
+        django_db_setup_no_init, settings, mocker, fallback):
+    settings.NORTH_REUSE_CONNECTION = True
+    settings.NORTH_GROUP_MIGRATIONS = True
+    run_group = mocker.patch.object(
+        north_connection, 'run_group',
+        side_effect=(lambda connection, group: False) if fallback else
+        north_connection.run_group)
+
+    call_command('migrate', '--database', 'no_init')
+
+    assert run_group.called
+    # every file is recorded, grouped or not
+    assert migrations.get_unapplied_migrations(connections['no_init']) == []
+    with connections['no_init'].cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*), count(DISTINCT (app, name)) "
+            "FROM django_migrations")
+        total, distinct = cursor.fetchone()
+    assert total == distinct
+    assert (migrations.get_applied_versions(connections['no_init'])[-1] ==
+            settings.NORTH_TARGET_VERSION)
+
+
+@pytest.fixture
+def schema_dump(request, tmpdir, settings):
+    """
+    A copy of the migrations root, with a pg_dump archive of the schema
+    and fixtures 0.1, and of a table which is not in the SQL files.
+    The archive format (custom by default) is the fixture param.
+    """
+    dump_format = getattr(request, 'param', 'custom')
+    root = tmpdir.join('sql')
+    shutil.copytree(settings.NORTH_MIGRATIONS_ROOT, str(root))
+    run_sql('DROP DATABASE IF EXISTS north_dump')
+    run_sql('CREATE DATABASE north_dump')
+    env = dict(os.environ, **pg_environ())
+    try:
+        for path in [
+                root.join('schemas', 'schema_0.1.sql'),
+                root.join('fixtures', 'fixtures_0.1.sql')]:
+            subprocess.run(
+                ['psql', '--set', 'ON_ERROR_STOP=on', '--quiet',
+                 '--dbname', 'north_dump', '--file', str(path)],
+                check=True, env=env)
+        subprocess.run(
+            ['psql', '--dbname', 'north_dump', '--command',
+             'CREATE TABLE north_dump_marker (id integer)'],
+            check=True, env=env)
+        subprocess.run(
+            ['pg_dump', '--format', dump_format, '--dbname', 'north_dump',
+             '--file', str(root.join('schemas', 'schema_0.1.dump'))],
+            check=True, env=env)
+    finally:
+        run_sql('DROP DATABASE north_dump')
+    settings.NORTH_MIGRATIONS_ROOT = str(root)
+    return root
+
+
+def pg_environ():
+    config = dj_database_url.config()
+    environ = {
+        'PGHOST': config['HOST'],
+        'PGPORT': str(config['PORT']),
+        'PGUSER': config['USER'],
+        'PGPASSWORD': config['PASSWORD'],
+    }
+    return {name: value for name, value in environ.items() if value}
+
+
+@pytest.mark.django_db
+def test_migrate_command_from_dump(
+        django_db_setup_no_init, schema_dump, settings, mocker):
+    settings.NORTH_RESTORE_JOBS = 2
+    restore_dump = mocker.spy(restore, 'restore_dump')
+
+    call_command('migrate', '--database', 'no_init')
+
+    assert restore_dump.call_count == 1
+    assert restore_dump.call_args[0][2] == 2
+    connection = connections['no_init']
+    tables = connection.introspection.table_names()
+    assert 'north_dump_marker' in tables
+    # the fixtures come from the dump, they are not loaded again
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT count(*) FROM django_site')
+        assert cursor.fetchone() == (1,)
+    assert migrations.get_unapplied_migrations(connection) == []
+    assert (migrations.get_applied_versions(connection)[-1] ==
+            settings.NORTH_TARGET_VERSION)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('schema_dump', ['directory'], indirect=True)
+def test_migrate_command_from_dump_only(
+        django_db_setup_no_init, schema_dump, settings, mocker):
+    # no SQL schema file: the archive is enough to init the DB
+    schema_dump.join('schemas', 'schema_0.1.sql').remove()
+    restore_dump = mocker.spy(restore, 'restore_dump')
+
+    call_command('migrate', '--database', 'no_init')
+
+    assert restore_dump.call_count == 1
+    connection = connections['no_init']
+    assert 'north_dump_marker' in connection.introspection.table_names()
+    assert migrations.get_unapplied_migrations(connection) == []
+    assert (migrations.get_applied_versions(connection)[-1] ==
+            settings.NORTH_TARGET_VERSION)
+
+
 @pytest.mark.django_db
 def test_migrate_command_with_django_table(django_db_setup_no_init, settings):
     """
@@ -143,3 +265,87 @@ def test_migrate_command_with_django_table(django_db_setup_no_init, settings):
     assert settings.NORTH_TARGET_VERSION != "1.0"
     assert (migrations.get_applied_versions(connections['no_init'])[-1] ==
             settings.NORTH_TARGET_VERSION)
+
+
+def test_migrate_explain(mocker, capsys, settings):
+    settings.NORTH_MANAGE_DB = False
+    mock_migrate = mocker.patch('septentrion.migrate')
+    mocker.patch(
+        'django_north.management.explain.explain_migrations',
+        return_value=[
+            explain.FileEstimate(
+                '1.3', 'a-ddl.sql', 0, 0, [('foo', 1000, '8192 bytes')], []),
+            explain.FileEstimate(
+                '1.3', 'b-dml.sql', 12, 3.5, [], [('UPDATE', 'error\nfoo')]),
+            explain.FileEstimate(
+                '1.4', 'c-dml.sql', 1, 0.01, [('bar', None, '8192 bytes')],
+                []),
+        ])
+
+    call_command('migrate', explain=True)
+
+    assert mock_migrate.called is False
+    captured = capsys.readouterr()
+    assert captured.out == (
+        "1.3\n"
+        "  a-ddl.sql: 0 row(s), cost 0.00\n"
+        "    DDL on foo: 1000 row(s), 8192 bytes\n"
+        "  b-dml.sql: 12 row(s), cost 3.50\n"
+        "    Not explained: error\n"
+        "  Total 1.3: 12 row(s), cost 3.50\n"
+        "1.4\n"
+        "  c-dml.sql: 1 row(s), cost 0.01\n"
+        "    DDL on bar: unknown row(s), 8192 bytes\n"
+        "  Total 1.4: 1 row(s), cost 0.01\n"
+    )
+
+
+def test_migrate_progress(mocker, settings):
+    settings.NORTH_MANAGE_DB = True
+    mocker.patch('septentrion.migrate')
+    mocker.patch('django_north.management.commands.migrate.prewarm_caches')
+    mock_progress = mocker.patch(
+        'django_north.management.commands.migrate.report_progress')
+
+    call_command('migrate')
+    assert mock_progress.called is False
+
+    call_command('migrate', progress=True, progress_interval=2)
+    assert mock_progress.call_count == 1
+    assert mock_progress.call_args[0][0] == connections['default']
+    assert mock_progress.call_args[1] == {'interval': 2}
+    assert mock_progress.return_value.__enter__.called is True
+
+
+@pytest.mark.parametrize("ledger", [True, False])
+def test_migrate_ledger(mocker, settings, ledger):
+    settings.NORTH_MANAGE_DB = True
+    settings.NORTH_LEDGER = ledger
+    mocker.patch('septentrion.migrate')
+    mocker.patch('django_north.management.commands.migrate.prewarm_caches')
+    mock_refresh = mocker.patch(
+        'django_north.management.migrations.refresh_ledger')
+
+    call_command('migrate')
+
+    if ledger:
+        mock_refresh.assert_called_once_with(connections['default'])
+    else:
+        assert mock_refresh.called is False
+
+
+@pytest.mark.django_db
+def test_migrate_lock(mocker, settings):
+    settings.NORTH_MANAGE_DB = True
+    settings.NORTH_MIGRATE_LOCK = True
+    mock_migrate = mocker.patch('septentrion.migrate')
+    mock_prewarm = mocker.patch(
+        'django_north.management.commands.migrate.prewarm_caches')
+
+    call_command('migrate')
+    assert mock_migrate.call_count == 1
+
+    # already migrated: septentrion is not called
+    call_command('migrate')
+    assert mock_migrate.call_count == 1
+    assert mock_prewarm.call_count == 2
@@ -0,0 +1,150 @@
+import os
+import subprocess
+import sys
+from urllib.parse import quote
+
+from django.contrib.contenttypes.models import ContentType
+from django.core import management
+from django.db import connection
+
+import pytest
+
+from django_north import pytest_plugin
+from tests.north_app.models import Author
+
+root = os.path.dirname(os.path.dirname(__file__))
+
+conftest = """
+import pytest
+
+
+@pytest.fixture(scope='session')
+def django_db_setup(north_db_setup):
+    pass
+"""
+
+test_module = """
+import pytest
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from tests.north_app.models import Author
+
+
+@pytest.mark.parametrize('i', range(4))
+def test_db(db, i):
+    assert connection.settings_dict['NAME'].startswith('test_north_plugin')
+    assert ContentType.objects.filter(model='book').exists()
+
+
+def test_transactional_1(north_transactional_db):
+    ContentType.objects.filter(model='book').delete()
+
+
+def test_transactional_2(north_transactional_db):
+    # fixtures reloaded
+    assert ContentType.objects.filter(model='book').exists()
+    Author.objects.create(name='foo')
+
+
+def test_transactional_3(north_transactional_db):
+    assert not Author.objects.exists()
+"""
+
+
+@pytest.fixture
+def clean_signatures():
+    pytest_plugin._signatures.clear()
+    yield
+    pytest_plugin._signatures.clear()
+
+
+@pytest.mark.django_db
+def test_get_table_signatures(django_assert_num_queries):
+    tables = ['north_app_author', 'django_content_type']
+    with django_assert_num_queries(1):
+        signatures = pytest_plugin.get_table_signatures(connection, tables)
+    assert signatures['north_app_author'] == (0, None)
+    assert signatures['django_content_type'][0] > 0
+
+    Author.objects.create(name='foo')
+    assert pytest_plugin.get_table_signatures(connection, tables) != \
+        signatures
+
+
+def test_flush_dirty_tables(mocker, transactional_db, clean_signatures):
+    pytest_plugin.take_snapshot(connection)
+    spy_flush = mocker.spy(management, 'call_command')
+
+    # nothing changed
+    pytest_plugin.flush_dirty_tables(connection)
+    assert spy_flush.called is False
+
+    # tables without fixtures: truncated
+    Author.objects.create(name='foo')
+    pytest_plugin.flush_dirty_tables(connection)
+    assert spy_flush.called is False
+    assert not Author.objects.exists()
+
+    # tables with fixtures: north flush
+    ContentType.objects.filter(model='book').delete()
+    pytest_plugin.flush_dirty_tables(connection)
+    assert [
+        call[0][0] for call in spy_flush.call_args_list
+        if call[0][0] == 'flush'] == ['flush']
+    assert ContentType.objects.filter(model='book').exists()
+
+
+def test_get_referencing_tables(db):
+    assert pytest_plugin.get_referencing_tables(
+        connection, ['north_app_author']) == {
+        'north_app_author', 'north_app_book', 'north_app_book_readers'}
+
+
+def test_release_template_databases(mocker, tmpdir):
+    mock_destroy = mocker.patch.object(
+        connection.creation.__class__, '_destroy_test_db')
+    shared_dir = str(tmpdir)
+    pytest_plugin.write_templates(shared_dir, {
+        'templates': [['default', 'test_foo', True], ['other', 'foo', False]],
+        'workers': ['gw0', 'gw1'],
+    })
+
+    pytest_plugin.release_template_databases(shared_dir, 'gw0', 0)
+    assert mock_destroy.called is False
+    assert pytest_plugin.read_templates(shared_dir)['workers'] == ['gw1']
+
+    # the last worker drops the templates
+    pytest_plugin.release_template_databases(shared_dir, 'gw1', 0)
+    mock_destroy.assert_called_once_with('test_foo', verbosity=0)
+    assert pytest_plugin.read_templates(shared_dir) is None
+
+
+@pytest.mark.parametrize("args", [[], ["-n", "3", "--dist", "loadfile"]])
+def test_north_db_setup(db, tmpdir, args):
+    if args:
+        pytest.importorskip('xdist')
+    tmpdir.join('conftest.py').write(conftest)
+    tmpdir.join('test_plugin.py').write(test_module)
+    settings_dict = connection.settings_dict
+    env = dict(
+        os.environ,
+        DATABASE_URL='postgres://{}:{}@{}:{}/north_plugin'.format(
+            quote(settings_dict['USER'] or '', safe=''),
+            quote(settings_dict['PASSWORD'] or '', safe=''),
+            settings_dict['HOST'] or '', settings_dict['PORT'] or ''),
+        PYTHONPATH=root)
+
+    result = subprocess.run(
+        [sys.executable, '-m', 'pytest', '-c',
+         os.path.join(root, 'pytest.ini'), '--rootdir', root,
+         '-p', 'no:cacheprovider', str(tmpdir)] + args,
+        cwd=root, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+    assert result.returncode == 0, result.stdout.decode()
+
+    # the test databases, the clones and the templates are dropped
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT datname FROM pg_database WHERE datname LIKE %s",
+            ['test\\_north\\_plugin%'])
+        assert cursor.fetchall() == []
@@ -0,0 +1,69 @@
+from django.db import connections
+
+import pytest
+
+from django_north import runner
+
+
+@pytest.fixture
+def close_connections(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        for conn in connections.all():
+            conn.close()
+        yield
+        for conn in connections.all():
+            conn.close()
+
+
+def test_clone_test_dbs(close_connections):
+    connection = connections['default']
+    runner.clone_test_dbs(connection, 3, verbosity=0)
+    try:
+        for index in range(3):
+            settings_dict = connection.creation.get_test_db_clone_settings(
+                str(index + 1))
+            clone = connection.__class__(settings_dict, 'clone')
+            try:
+                with clone.cursor() as cursor:
+                    # the migrations and the fixtures are in the clone
+                    cursor.execute('SELECT max(version_num) FROM sql_version')
+                    assert cursor.fetchone() == ('1.3',)
+                    cursor.execute('SELECT count(*) FROM django_content_type')
+                    assert cursor.fetchone()[0] > 0
+            finally:
+                clone.close()
+    finally:
+        runner.destroy_test_db_clones(connection, 3, verbosity=0)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM pg_database WHERE datname LIKE %s",
+            [connection.settings_dict['NAME'] + '\\_%'])
+        assert cursor.fetchone() == (0,)
+
+
+@pytest.mark.parametrize("parallel,clones", [(0, 0), (1, 0), (4, 1)])
+def test_north_test_runner(mocker, parallel, clones):
+    old_config = [
+        (mocker.Mock(vendor='postgresql'), 'foo', True),
+        (mocker.Mock(vendor='postgresql'), 'foo', False),
+    ]
+    mock_setup = mocker.patch(
+        'django_north.runner.setup_databases', return_value=old_config)
+    mock_clone = mocker.patch('django_north.runner.clone_test_dbs')
+    mock_teardown = mocker.patch('django_north.runner.teardown_databases')
+    mock_destroy = mocker.patch('django_north.runner.destroy_test_db_clones')
+
+    test_runner = runner.NorthTestRunner(parallel=parallel, verbosity=0)
+    assert test_runner.setup_databases() == old_config
+    # created without the clones
+    assert mock_setup.call_args[0][4] == 0
+    assert mock_clone.call_count == clones
+    if clones:
+        assert mock_clone.call_args == mocker.call(
+            old_config[0][0], 4, verbosity=0, keepdb=False)
+
+    test_runner.teardown_databases(old_config)
+    assert mock_destroy.call_count == clones
+    assert mock_teardown.call_args == mocker.call(
+        old_config, verbosity=0, keepdb=False)
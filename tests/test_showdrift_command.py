@@ -0,0 +1,43 @@
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+
+import pytest
+
+
+@pytest.mark.django_db
+def test_showdrift(capsys):
+    call_command('showdrift', 'north_app', check=True)
+    captured = capsys.readouterr()
+    assert captured.out == '\n'
+
+    with connection.cursor() as cursor:
+        cursor.execute('ALTER TABLE north_app_reader DROP COLUMN name')
+
+    with pytest.raises(CommandError) as excinfo:
+        call_command('showdrift', 'north_app', check=True)
+    assert str(excinfo.value) == "1 difference(s)."
+    captured = capsys.readouterr()
+    assert captured.out == 'north_app_reader: missing column name\n'
+
+
+@pytest.mark.django_db
+def test_showdrift_all_apps(mocker):
+    mock_drift = mocker.patch(
+        'django_north.management.drift.get_schema_drift', return_value=[])
+
+    call_command('showdrift')
+
+    assert mock_drift.call_args[1] == {'models': None}
+
+
+@pytest.mark.django_db
+def test_showdrift_database_error(mocker):
+    mocker.patch(
+        'django_north.management.drift.sql_create_all',
+        return_value=['CREATE TABLE foo (id unknown_type)'])
+
+    with pytest.raises(CommandError) as excinfo:
+        call_command('showdrift')
+    assert str(excinfo.value).startswith(
+        'Unable to build the expected schema: type "unknown_type"')
@@ -1,40 +1,23 @@
-from django.apps import AppConfig
 from django.contrib.auth.models import Permission
 from django.contrib.contenttypes.models import ContentType
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 
 import pytest
 
 from django_north.management.commands import showfixtures
 
 
-class CustomAppConfig(AppConfig):
-    path = 'some.path.to.somewhere'
-
-
-def test_unknown_contenttypes(mocker):
+def test_unknown_contenttypes():
     ct1 = ContentType(app_label='myapp1', model='mymodel1', id=1)
     ct2 = ContentType(app_label='myapp1', model='mymodel2', id=2)
     ct3 = ContentType(app_label='myapp2', model='mymodel3', id=3)
-    app_config1 = CustomAppConfig('myapp1', mocker.Mock())
-    app_config2 = CustomAppConfig('myapp2', mocker.Mock())
-    app_config3 = CustomAppConfig('myapp3', mocker.Mock())
-    mocker.patch(
-        'django_north.management.commands.showfixtures.apps'
-        '.get_app_configs',
-        return_value=[app_config1, app_config2, app_config3])
-    mock_get_contenttypes = mocker.patch(
-        'django_north.management.contenttypes'
-        '.get_unknown_contenttypes_for_app_config')
 
     command = showfixtures.Command()
 
     # unknown contenttypes
-    mock_get_contenttypes.side_effect = [
-        [ct1, ct2],
-        [ct3],
-        []]
-    assert command.unknown_contenttypes() == [
+    assert command.unknown_contenttypes([ct1, ct2, ct3]) == [
         "DELETE FROM django_content_type "
         "WHERE app_label = 'myapp1' AND model = 'mymodel1';",
         "DELETE FROM django_content_type "
@@ -44,33 +27,18 @@ def test_unknown_contenttypes(mocker):
     ]
 
     # no unknown contenttypes
-    mock_get_contenttypes.side_effect = [[], [], []]
-    assert command.unknown_contenttypes() == []
+    assert command.unknown_contenttypes([]) == []
 
 
-def test_missing_contenttypes(mocker):
+def test_missing_contenttypes():
     ct1 = ContentType(app_label='myapp1', model='mymodel1')
     ct2 = ContentType(app_label='myapp1', model='mymodel2')
     ct3 = ContentType(app_label='myapp2', model='mymodel3')
-    app_config1 = CustomAppConfig('myapp1', mocker.Mock())
-    app_config2 = CustomAppConfig('myapp2', mocker.Mock())
-    app_config3 = CustomAppConfig('myapp3', mocker.Mock())
-    mocker.patch(
-        'django_north.management.commands.showfixtures.apps'
-        '.get_app_configs',
-        return_value=[app_config1, app_config2, app_config3])
-    mock_get_contenttypes = mocker.patch(
-        'django_north.management.contenttypes'
-        '.get_missing_contenttypes_for_app_config')
 
     command = showfixtures.Command()
 
     # missing contenttypes
-    mock_get_contenttypes.side_effect = [
-        [ct1, ct2],
-        [ct3],
-        []]
-    assert command.missing_contenttypes() == [
+    assert command.missing_contenttypes([ct1, ct2, ct3]) == [
         "INSERT INTO django_content_type(app_label, model) "
         "VALUES('myapp1', 'mymodel1');",
         "INSERT INTO django_content_type(app_label, model) "
@@ -80,35 +48,20 @@ def test_missing_contenttypes(mocker):
     ]
 
     # no missing contenttypes
-    mock_get_contenttypes.side_effect = [[], [], []]
-    assert command.missing_contenttypes() == []
+    assert command.missing_contenttypes([]) == []
 
 
-def test_missing_permissions(mocker):
+def test_missing_permissions():
     ct1 = ContentType(app_label='myapp1', model='mymodel1', id=1)
     ct2 = ContentType(app_label='myapp1', model='mymodel2', id=2)
     p1 = Permission(codename='perm1', name='Perm1', content_type=ct1)
     p2 = Permission(codename='perm2', name='Perm2', content_type=ct1)
     p3 = Permission(codename='perm3', name='Perm3', content_type=ct2)
-    app_config1 = CustomAppConfig('myapp1', mocker.Mock())
-    app_config2 = CustomAppConfig('myapp2', mocker.Mock())
-    app_config3 = CustomAppConfig('myapp3', mocker.Mock())
-    mocker.patch(
-        'django_north.management.commands.showfixtures.apps'
-        '.get_app_configs',
-        return_value=[app_config1, app_config2, app_config3])
-    mock_get_permissions = mocker.patch(
-        'django_north.management.permissions'
-        '.get_missing_permissions_for_app_config')
 
     command = showfixtures.Command()
 
     # missing permissions
-    mock_get_permissions.side_effect = [
-        [p1, p2],
-        [p3],
-        []]
-    assert command.missing_permissions() == [
+    assert command.missing_permissions([p1, p2, p3]) == [
         "INSERT INTO auth_permission(codename, name, content_type_id) "
         "VALUES('perm1', 'Perm1', (SELECT id FROM django_content_type "
         "WHERE app_label = 'myapp1' AND model = 'mymodel1'));",
@@ -121,11 +74,12 @@ def test_missing_permissions(mocker):
     ]
 
     # no missing permissions
-    mock_get_permissions.side_effect = [[], [], []]
-    assert command.missing_permissions() == []
+    assert command.missing_permissions([]) == []
 
 
 def test_showfixtures(capsys, mocker):
+    mock_diff = mocker.patch(
+        'django_north.management.fixtures.get_fixtures_diff')
     mocker.patch(
         'django_north.management.commands.showfixtures.Command'
         '.unknown_contenttypes',
@@ -144,9 +98,12 @@ def test_showfixtures(capsys, mocker):
     assert captured.out == (
         'INSERT 1\nINSERT 2\nINSERT 3\n'
         'INSERT 4\nINSERT 5\nINSERT 6\n')
+    assert mock_diff.call_args == mocker.call(using='default')
 
-    call_command('showfixtures', unknown_contenttypes=True)
+    call_command(
+        'showfixtures', unknown_contenttypes=True, database='foo')
     captured = capsys.readouterr()
+    assert mock_diff.call_args == mocker.call(using='foo')
     assert captured.out == (
         'DELETE 1\nDELETE 2\nDELETE 3\n'
         'INSERT 1\nINSERT 2\nINSERT 3\n'
@@ -158,3 +115,132 @@ def test_showfixtures_for_real(capsys, mocker):
     call_command('showfixtures', unknown_contenttypes=True)
     captured = capsys.readouterr()
     assert captured.out == '\n'
+
+
+def test_showfixtures_apply_disabled(settings):
+    settings.NORTH_MANAGE_DB = False
+
+    with pytest.raises(CommandError):
+        call_command('showfixtures', apply=True)
+
+
+@pytest.mark.parametrize("options", [
+    {'offline': True}, {'format': 'set'}, {'check': True}])
+def test_showfixtures_apply_incompatible(options):
+    with pytest.raises(CommandError) as excinfo:
+        call_command('showfixtures', apply=True, **options)
+    assert 'incompatible' in str(excinfo.value)
+
+
+@pytest.mark.django_db
+def test_showfixtures_apply(capsys):
+    ContentType.objects.create(app_label='north_app', model='foo')
+    ContentType.objects.filter(app_label='north_app', model='reader').delete()
+
+    call_command('showfixtures', apply=True)
+    captured = capsys.readouterr()
+    assert captured.out == (
+        '1 contenttype(s) created\n'
+        '4 permission(s) created\n')
+
+    call_command('showfixtures', apply=True, unknown_contenttypes=True)
+    captured = capsys.readouterr()
+    assert captured.out == (
+        '1 contenttype(s) removed\n'
+        '0 contenttype(s) created\n'
+        '0 permission(s) created\n')
+
+    call_command('showfixtures', unknown_contenttypes=True)
+    captured = capsys.readouterr()
+    assert captured.out == '\n'
+
+
+def test_quoting():
+    ct = ContentType(app_label='myapp', model="o'model", id=1)
+    perm = Permission(codename="can't", name="Can't", content_type=ct)
+
+    command = showfixtures.Command()
+    assert command.missing_permissions([perm]) == [
+        "INSERT INTO auth_permission(codename, name, content_type_id) "
+        "VALUES('can''t', 'Can''t', (SELECT id FROM django_content_type "
+        "WHERE app_label = 'myapp' AND model = 'o''model'));",
+    ]
+
+
+def test_set_format():
+    ct1 = ContentType(app_label='myapp1', model='mymodel1', id=1)
+    ct2 = ContentType(app_label='myapp1', model="o'model", id=2)
+    p1 = Permission(codename='perm1', name='Perm1', content_type=ct1)
+    p2 = Permission(codename='perm2', name='Perm2', content_type=ct2)
+
+    command = showfixtures.Command()
+    assert command.unknown_contenttypes_set([ct1, ct2]) == [
+        "DELETE FROM django_content_type WHERE (app_label, model) IN (VALUES\n"
+        "    ('myapp1', 'mymodel1'),\n"
+        "    ('myapp1', 'o''model'));"
+    ]
+    assert command.missing_contenttypes_set([ct1, ct2]) == [
+        "INSERT INTO django_content_type(app_label, model) VALUES\n"
+        "    ('myapp1', 'mymodel1'),\n"
+        "    ('myapp1', 'o''model');"
+    ]
+    assert command.missing_permissions_set([p1, p2]) == [
+        "INSERT INTO auth_permission(codename, name, content_type_id)\n"
+        "SELECT v.codename, v.name, ct.id FROM (VALUES\n"
+        "    ('perm1', 'Perm1', 'myapp1', 'mymodel1'),\n"
+        "    ('perm2', 'Perm2', 'myapp1', 'o''model')\n"
+        ") AS v(codename, name, app_label, model)\n"
+        "JOIN django_content_type ct "
+        "ON ct.app_label = v.app_label AND ct.model = v.model;"
+    ]
+
+    assert command.unknown_contenttypes_set([]) == []
+    assert command.missing_contenttypes_set([]) == []
+    assert command.missing_permissions_set([]) == []
+
+
+@pytest.mark.django_db
+def test_showfixtures_set_format_for_real(capsys):
+    ContentType.objects.create(app_label='north_app', model='foo')
+    Permission.objects.filter(codename__in=['add_book', 'view_book']).delete()
+
+    call_command(
+        'showfixtures', unknown_contenttypes=True, format='set')
+    captured = capsys.readouterr()
+    with connection.cursor() as cursor:
+        cursor.execute(captured.out)
+
+    call_command('showfixtures', unknown_contenttypes=True)
+    captured = capsys.readouterr()
+    assert captured.out == '\n'
+
+
+def test_showfixtures_offline(capsys, settings):
+    call_command('showfixtures', offline=True, check=True)
+    captured = capsys.readouterr()
+    assert captured.out == '\n'
+
+    settings.NORTH_TARGET_VERSION = '1.2'
+    with pytest.raises(CommandError) as excinfo:
+        call_command('showfixtures', offline=True, check=True)
+    assert str(excinfo.value) == "1 fixture(s) to fix."
+    captured = capsys.readouterr()
+    assert captured.out == (
+        "INSERT INTO django_content_type(app_label, model) "
+        "VALUES('north_app', 'reader');\n")
+
+    with pytest.raises(CommandError):
+        call_command('showfixtures', offline=True, apply=True)
+
+
+def test_showfixtures_offline_parse_error(settings, tmpdir):
+    root = tmpdir.mkdir('sql')
+    root.mkdir('schemas').join('schema_1.0.sql').write(
+        "INSERT INTO django_content_type(app_label, model;\n")
+    root.mkdir('1.0').join('1.0-0-version-dml.sql').write('')
+    settings.NORTH_MIGRATIONS_ROOT = str(root)
+    settings.NORTH_TARGET_VERSION = '1.0'
+
+    with pytest.raises(CommandError) as excinfo:
+        call_command('showfixtures', offline=True)
+    assert 'schema_1.0.sql: Malformed statement' in str(excinfo.value)
@@ -30,7 +30,7 @@ def test_north_manage_migrations(mocker, settings, manage):
     assert mock.called == bool(manage)
 
 
-def test_showmigrations_schema_not_inited(capsys, mocker):
+def test_showmigrations_schema_not_inited(capsys, mocker, db):
 
     mock_version = mocker.patch(
         'septentrion.db.get_current_schema_version')
@@ -1,8 +1,13 @@
+from django.apps import apps
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.utils.version import get_docs_version
 
 import pytest
 
+from django_north.management.commands import sqlall
+
 
 @pytest.mark.django_db
 def test_sqlall(capsys, mocker, settings):
@@ -48,3 +53,82 @@ def test_sqlall(capsys, mocker, settings):
         'CREATE INDEX "INDEX_NAME" ON "north_app_book" ("author_id")\n'
         + 'COMMIT;\n'
     )
+
+
+def test_sqlall_all(capsys, mocker):
+    call_command('sqlall', all=True)
+    captured = capsys.readouterr()
+    statements = captured.out.splitlines()
+    assert statements[0] == 'BEGIN;'
+    assert statements[-1] == 'COMMIT;'
+
+    # all the tables, then the deferred statements
+    tables = [
+        statement for statement in statements
+        if statement.startswith('CREATE TABLE')]
+    assert statements[1:len(tables) + 1] == tables
+    for table in ['auth_user', 'django_content_type', 'north_app_book']:
+        assert 'CREATE TABLE "{}" '.format(table) in captured.out
+    assert 'FOREIGN KEY ("author_id") REFERENCES "north_app_author"' \
+        in captured.out
+
+    # same output with several processes
+    call_command('sqlall', all=True, jobs=3)
+    assert capsys.readouterr().out == captured.out
+
+    # one schema editor
+    mock_editor = mocker.spy(connection, 'schema_editor')
+    call_command('sqlall', all=True)
+    assert mock_editor.call_count == 1
+
+
+def test_sqlall_arguments():
+    with pytest.raises(CommandError):
+        call_command('sqlall')
+    with pytest.raises(CommandError):
+        call_command('sqlall', 'north_app', all=True)
+
+
+def test_sqlall_cache(capsys, mocker, tmpdir):
+    cache_dir = str(tmpdir.join('cache'))
+    call_command('sqlall', all=True)
+    expected = capsys.readouterr().out
+
+    spy_generate = mocker.spy(sqlall, 'sql_create_models')
+    call_command('sqlall', all=True, cache_dir=cache_dir)
+    assert capsys.readouterr().out == expected
+    assert spy_generate.call_count == 1
+    nb_apps = len(tmpdir.join('cache').listdir())
+    assert nb_apps > 1
+
+    # from the cache
+    spy_generate.reset_mock()
+    call_command('sqlall', all=True, cache_dir=cache_dir)
+    assert capsys.readouterr().out == expected
+    call_command('sqlall', 'north_app', cache_dir=cache_dir)
+    assert 'CREATE TABLE "north_app_book"' in capsys.readouterr().out
+    assert spy_generate.call_count == 0
+
+    # a model changed: only its app is generated again
+    field = apps.get_model('north_app', 'Book')._meta.get_field('title')
+    mocker.patch.object(field, 'max_length', 200)
+    call_command('sqlall', all=True, cache_dir=cache_dir)
+    output = capsys.readouterr().out
+    assert '"title" varchar(200) NOT NULL' in output
+    assert spy_generate.call_count == 1
+    [model_groups, _] = spy_generate.call_args[0]
+    assert {model._meta.app_label for model in model_groups[0]} == {
+        'north_app'}
+    assert len(tmpdir.join('cache').listdir()) == nb_apps + 1
+
+
+def test_get_cache_key():
+    models = list(apps.get_app_config('north_app').get_models(
+        include_auto_created=True))
+    key = sqlall.get_cache_key('north_app', models, connection)
+    assert key.startswith('north_app-')
+    assert sqlall.get_cache_key('north_app', models, connection) == key
+
+    author_models = [apps.get_model('north_app', 'Author')]
+    assert sqlall.get_cache_key(
+        'north_app', author_models, connection) != key